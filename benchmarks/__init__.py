@@ -0,0 +1,5 @@
+"""
+Benchmarks for spud, run against a local stand-in for the Spiget API.
+
+Run a benchmark with e.g. `python -m benchmarks.bench_session` from the repository root.
+"""
@@ -0,0 +1,139 @@
+"""
+Benchmark the throughput of `spud install` and `spud update` against a synthetic Spiget server.
+
+For each plugin count, every plugin is installed into an empty directory, a new version is published,
+then the whole directory is updated. Wall time, peak Python memory and requests per endpoint
+are recorded for both runs and written as JSON, so regressions can be tracked.
+
+A one-plugin warm-up run is done first, so one-time costs like compiling regexes aren't counted in the results.
+Peak memory is measured with tracemalloc, which slows the run down, and includes the stub server's
+allocations as it runs in the same process.
+
+Usage: python -m benchmarks.bench_cli [--counts 10 100 1000] [--latency SECONDS] [--jar-size BYTES]
+                                      [--jobs N] [--output results.json]
+"""
+from __future__ import annotations
+
+import argparse
+import collections
+import contextlib
+import functools
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Dict, List
+from unittest import mock
+
+from spud import api, cli, settings
+from tests.stub_server import SyntheticSpigetServer
+
+# Endpoint name for each kind of request path, checked in order
+ENDPOINTS = (
+    ("search", "/search/"),
+    ("author", "/authors/"),
+    ("download", "/download"),
+    ("update", "/updates/"),
+    ("resource", "/resources/"),
+)
+
+
+def endpoint_counts(paths: List[str]) -> Dict[str, int]:
+    """Count requested paths by endpoint"""
+    counts: Dict[str, int] = collections.Counter()
+    for path in paths:
+        for name, fragment in ENDPOINTS:
+            if fragment in path:
+                counts[name] += 1
+                break
+    return dict(counts)
+
+
+def run_cli(server: SyntheticSpigetServer, directory: str, argv: List[str]) -> dict:
+    """Run the CLI once and measure it"""
+    api_class = functools.partial(api.SpigetAPI, base_api_url=server.url)
+    server.reset_counters()
+    cwd = os.getcwd()
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        with open(os.devnull, "w", encoding="UTF-8") as devnull:
+            with contextlib.redirect_stdout(devnull), mock.patch(
+                "sys.argv",
+                [
+                    "spud",
+                    "--no-cache",
+                    "--no-catalog",
+                    "--rate-limit",
+                    "0",
+                    "-d",
+                    directory,
+                    *argv,
+                ],
+            ):
+                cli.CLI(api_class)
+        seconds = time.perf_counter() - start
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        os.chdir(cwd)
+
+    return {
+        "seconds": round(seconds, 4),
+        "peak_memory_bytes": peak_memory,
+        "requests": server.request_count,
+        "requests_per_endpoint": endpoint_counts(server.requests),
+    }
+
+
+def bench(count: int, latency: float, jar_size: int, jobs: int) -> dict:
+    """Install then update `count` plugins"""
+    with SyntheticSpigetServer(
+        count, jar_size=jar_size, latency=latency
+    ) as server, tempfile.TemporaryDirectory() as directory:
+        jobs_args = ["-n", "-j", str(jobs)]
+        names = [f"Plugin{plugin_id}" for plugin_id in range(count)]
+
+        install = run_cli(server, directory, [*jobs_args, "install", *names])
+        server.version_id += 1
+        update = run_cli(server, directory, [*jobs_args, "update"])
+
+    for result in (install, update):
+        result["plugins_per_second"] = round(count / result["seconds"], 2)
+
+    return {"plugins": count, "install": install, "update": update}
+
+
+def main(argv=None) -> None:
+    """Run the benchmarks and write the results"""
+    parser = argparse.ArgumentParser(description="Benchmark spud install and update")
+    parser.add_argument("--counts", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jar-size", type=int, default=64 * 1024)
+    parser.add_argument("--jobs", type=int, default=8)
+    parser.add_argument("--output", type=argparse.FileType("w"), default=sys.stdout)
+    args = parser.parse_args(argv)
+
+    bench(1, 0, args.jar_size, args.jobs)
+
+    results = {
+        "version": settings.VERSION,
+        "python": sys.version.split()[0],
+        "latency": args.latency,
+        "jar_size": args.jar_size,
+        "jobs": args.jobs,
+        "results": [
+            bench(count, args.latency, args.jar_size, args.jobs)
+            for count in args.counts
+        ],
+    }
+
+    json.dump(results, args.output, indent=2)
+    args.output.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+Benchmark the bytes transferred per update check, fetching whole resources versus only the fields used.
+
+Usage: python -m benchmarks.bench_fields [plugins]
+"""
+from __future__ import annotations
+
+import sys
+
+from spud.api import SpigetAPI
+from spud.ratelimit import RateLimiter
+from tests.stub_server import SyntheticSpigetServer
+
+
+def bench_full(spiget: SpigetAPI, plugin_ids: range) -> None:
+    """Check for updates with whole resources, as get_plugin_info_if_update used to"""
+    for plugin_id in plugin_ids:
+        spiget.get_plugin_by_id(plugin_id)
+
+
+def bench_projected(spiget: SpigetAPI, plugin_ids: range) -> None:
+    """Check for updates with only the fields in UPDATE_CHECK_FIELDS"""
+    for plugin_id in plugin_ids:
+        spiget.get_plugin_info_if_update(
+            {"search_name": "", "plugin_id": plugin_id, "plugin_version_id": 0}
+        )
+
+
+def main(plugins: int = 100) -> None:
+    """Run both benchmarks and print the results"""
+    with SyntheticSpigetServer(plugins) as server, SpigetAPI(
+        base_api_url=server.url, rate_limiter=RateLimiter(0)
+    ) as spiget:
+        for name, bench in (("full", bench_full), ("projected", bench_projected)):
+            server.reset_counters()
+            bench(spiget, range(plugins))
+            print(
+                f"{name:>9}: {server.bytes_sent / plugins:.0f} bytes/check, "
+                f"{server.request_count} requests"
+            )
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
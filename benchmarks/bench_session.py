@@ -0,0 +1,52 @@
+"""
+Benchmark the latency per API call with and without a pooled keep-alive session.
+
+Usage: python -m benchmarks.bench_session [calls]
+"""
+from __future__ import annotations
+
+import sys
+import time
+
+import requests
+
+from spud.api import SpigetAPI
+from spud.ratelimit import RateLimiter
+from tests.stub_server import StubSpigetServer
+
+ENDPOINT = "/resources/1"
+
+
+def bench_unpooled(server: StubSpigetServer, calls: int) -> float:
+    """Call the API with a fresh connection every time, as call_api used to"""
+    start = time.perf_counter()
+    for _ in range(calls):
+        requests.get(f"{server.url}{ENDPOINT}", timeout=5)
+    return (time.perf_counter() - start) / calls
+
+
+def bench_pooled(server: StubSpigetServer, calls: int) -> float:
+    """Call the API through SpigetAPI's pooled session, without rate limiting"""
+    with SpigetAPI(base_api_url=server.url, rate_limiter=RateLimiter(0)) as spiget:
+        start = time.perf_counter()
+        for _ in range(calls):
+            spiget.call_api(ENDPOINT)
+        return (time.perf_counter() - start) / calls
+
+
+def main(calls: int = 500) -> None:
+    """Run both benchmarks and print the results"""
+    with StubSpigetServer() as server:
+        server.json_route(r"/resources/\d+", {"id": 1, "version": {"id": 1}})
+
+        for name, bench in (("unpooled", bench_unpooled), ("pooled", bench_pooled)):
+            server.reset_counters()
+            per_call = bench(server, calls)
+            print(
+                f"{name:>8}: {per_call * 1000:.3f} ms/call, "
+                f"{server.connection_count} connections for {server.request_count} requests"
+            )
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
@@ -0,0 +1,83 @@
+"""
+Benchmark how long spud takes to start, in the style of `python -X importtime`.
+
+Reports the median cumulative import time of spud.cli and the median wall time of `spud --version`,
+plus the slowest modules imported. Exits with status 1 if the import time is over --max-ms,
+so it can guard against regressions in CI.
+
+Usage: python -m benchmarks.bench_startup [--runs N] [--max-ms MILLISECONDS]
+"""
+from __future__ import annotations
+
+import argparse
+import re
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+VERSION_SCRIPT = """
+import sys
+from spud.cli import CLI
+sys.argv = ["spud", "--version"]
+try:
+    CLI()
+except SystemExit:
+    pass
+"""
+
+IMPORT_TIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s+)(\S+)")
+
+
+def import_times() -> Dict[str, int]:
+    """Import spud.cli in a fresh interpreter, and get the cumulative microseconds of each module"""
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import spud.cli"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in process.stderr.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if match:
+            times[match[4]] = int(match[2])
+    return times
+
+
+def version_time() -> float:
+    """Get the wall time in seconds of running `spud --version` in a fresh interpreter"""
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "-c", VERSION_SCRIPT], capture_output=True, check=True
+    )
+    return time.perf_counter() - start
+
+
+def main(argv=None) -> None:
+    """Run the benchmark and print the results"""
+    parser = argparse.ArgumentParser(description="Benchmark spud startup time")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--max-ms", type=float, default=None)
+    args = parser.parse_args(argv)
+
+    runs: List[Dict[str, int]] = [import_times() for _ in range(args.runs)]
+    import_ms = statistics.median(run["spud.cli"] for run in runs) / 1000
+    version_ms = statistics.median(version_time() for _ in range(args.runs)) * 1000
+
+    print(f"import spud.cli: {import_ms:.1f} ms")
+    print(f"spud --version: {version_ms:.1f} ms (including interpreter startup)")
+
+    print("Slowest imports, including the modules they import:")
+    slowest = sorted(runs[-1].items(), key=lambda item: -item[1])[:10]
+    for module, microseconds in slowest:
+        print(f"  {microseconds / 1000:7.1f} ms  {module}")
+
+    if args.max_ms is not None and import_ms > args.max_ms:
+        print(f"Importing spud.cli took longer than {args.max_ms} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
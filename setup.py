@@ -38,5 +38,6 @@ setuptools.setup(
     package_dir={"spud": "spud"},
     packages=["spud"],
     install_requires=requirements,
+    extras_require={"async": ["aiohttp"]},
     python_requires=">=3.8",
 )
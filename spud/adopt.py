@@ -0,0 +1,276 @@
+"""
+Adoption of jars that weren't installed with spud, by identifying them from their plugin.yml.
+
+Classes:
+    Adopter - Matches unmanaged jars to Spiget resources and saves metadata in them, so spud can update them
+"""
+from __future__ import annotations
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Tuple, Union
+
+import requests
+
+from .api import STRONG_MATCH_SCORE, SpigetAPI
+from .index import MetadataIndex
+from .type import Author, FileMetadata, Plugin, PluginDescription
+from .utils import Color, Utils
+
+# How sure a match is, from most to least. Only high and medium confidence matches are adopted.
+HIGH_CONFIDENCE = "high"
+MEDIUM_CONFIDENCE = "medium"
+LOW_CONFIDENCE = "low"
+
+# The resource a jar was matched to (None if there were no candidates), the confidence, and why
+Match = Tuple[Union[Plugin, None], str, str]
+# Whether a jar was adopted, and the messages to print about it
+AdoptResult = Tuple[bool, List[Tuple[str, Color]]]
+
+
+class Adopter:
+    """
+    Identifies the jars of a plugin directory that have no spud metadata from the name, version and authors
+    in their plugin.yml, and saves metadata in the ones matched with enough confidence.
+
+    Every jar is read in parallel, each distinct plugin name is only searched for once (from the catalog
+    if there is one, otherwise through the response cache), and the authors of every candidate are
+    looked up together.
+    """
+
+    def __init__(
+        self,
+        api: SpigetAPI,
+        directory: Union[str, Path] = ".",
+        jobs: int = 1,
+        index: Union[MetadataIndex, None] = None,
+    ) -> None:
+        """
+        :param api: The SpigetAPI to search with
+        :param directory: The plugin directory, default: the working directory
+        :param jobs: How many jars to read and plugins to look up in parallel, default: 1
+        :param index: The MetadataIndex of the directory, default: a new one
+        """
+        self.api = api
+        self.directory = Path(directory)
+        self.jobs = jobs
+        self.index = index if index is not None else MetadataIndex(self.directory)
+
+    def adopt(self) -> Tuple[int, List[Tuple[str, Color]]]:
+        """
+        Adopt every jar in the directory without metadata
+
+        :returns: How many jars were adopted, and the messages to print
+        """
+        filenames = sorted(
+            name for name in os.listdir(self.directory) if name.endswith(".jar")
+        )
+        self.index.prune(filenames)
+
+        with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+            metadata_list = list(executor.map(self.index.load_metadata, filenames))
+            unmanaged = [
+                filename
+                for filename, metadata in zip(filenames, metadata_list)
+                if not metadata
+            ]
+
+            descriptions: Dict[str, Union[PluginDescription, None]] = dict(
+                zip(
+                    unmanaged,
+                    executor.map(
+                        Utils.load_plugin_description,
+                        (str(self.directory / filename) for filename in unmanaged),
+                    ),
+                )
+            )
+
+            # Jars of the same plugin share one search
+            names = list(
+                dict.fromkeys(
+                    description["name"]
+                    for description in descriptions.values()
+                    if description
+                )
+            )
+            candidates: Dict[str, List[Plugin]] = dict(
+                zip(names, executor.map(self.search, names))
+            )
+
+            authors = self.api.get_authors(
+                plugin["author"]["id"]
+                for plugin_list in candidates.values()
+                for plugin in plugin_list
+            )
+
+            results = list(
+                executor.map(
+                    lambda filename: self.adopt_jar(
+                        filename, descriptions[filename], candidates, authors
+                    ),
+                    unmanaged,
+                )
+            )
+
+        self.index.save()
+
+        messages = [message for _, jar_messages in results for message in jar_messages]
+        return sum(adopted for adopted, _ in results), messages
+
+    def search(self, name: str) -> List[Plugin]:
+        """Search for a plugin name, without failing the other searches if it errors"""
+        try:
+            return self.api.search_plugins(name, resolve_authors=False)
+        except requests.RequestException:
+            return []
+
+    def adopt_jar(
+        self,
+        filename: str,
+        description: Union[PluginDescription, None],
+        candidates: Dict[str, List[Plugin]],
+        authors: Dict[int, Author],
+    ) -> AdoptResult:
+        """
+        Match a jar to a resource, and save metadata in it if the match is confident enough.
+        Safe to call from worker threads, as nothing is printed.
+
+        :param filename: The jar filename, in the plugin directory
+        :param description: The jar's plugin.yml, or None if it doesn't have one
+        :param candidates: Plugin names to their search results
+        :param authors: Author IDs to Author dicts, for every search result
+        :returns: Whether the jar was adopted, and the messages to print
+        """
+        if not description:
+            return False, [
+                (
+                    f"{filename} has no valid plugin.yml, so it wasn't adopted",
+                    Color.WARNING,
+                )
+            ]
+
+        plugin, confidence, reason = self.identify(
+            description, candidates.get(description["name"], []), authors
+        )
+        if plugin is None:
+            return False, [
+                (f"{filename}: no resource named {description['name']}", Color.WARNING)
+            ]
+        if confidence == LOW_CONFIDENCE:
+            return False, [
+                (
+                    f"{filename}: best guess is {plugin['name']} (ID {plugin['id']}), "
+                    f"{confidence} confidence: {reason}. Not adopted",
+                    Color.WARNING,
+                )
+            ]
+
+        path = str(self.directory / filename)
+        messages = [
+            (
+                f"Adopted {filename} as {plugin['name']} (ID {plugin['id']}), "
+                f"{confidence} confidence: {reason}",
+                Color.SUCCESS,
+            )
+        ]
+
+        version_id = self.find_version_id(plugin, description["version"])
+        if version_id is None:
+            version_id = 0
+            messages.append(
+                (
+                    f"Version {description['version']} of {plugin['name']} isn't on Spiget, "
+                    "so it will be replaced by the latest version when updating",
+                    Color.WARNING,
+                )
+            )
+
+        # What the jar was before the metadata was added, so an identical download is recognised
+        file_metadata: FileMetadata = {
+            "file_size": os.path.getsize(path),
+            "file_hash": Utils.hash_file(path),
+        }
+        adopted: Plugin = {  # type: ignore
+            **plugin,
+            "version": {**plugin["version"], "id": version_id},
+        }
+        Utils.replace_metadata_file(adopted, path, file_metadata)
+
+        return True, messages
+
+    def find_version_id(self, plugin: Plugin, version: str) -> Union[int, None]:
+        """
+        Find the ID of the Spiget version with the same name as a plugin.yml version
+
+        :returns: The version ID, or None if there is no version with that name
+        """
+        try:
+            versions = self.api.get_plugin_versions(plugin["id"])
+        except requests.RequestException:
+            return None
+
+        key = Utils.normalise_name(version).lstrip("v")
+        for spiget_version in versions:
+            if key and Utils.normalise_name(spiget_version["name"]).lstrip("v") == key:
+                return spiget_version["id"]
+        return None
+
+    @staticmethod
+    def identify(
+        description: PluginDescription,
+        candidates: List[Plugin],
+        authors: Dict[int, Author],
+    ) -> Match:
+        """
+        Choose the search result that a plugin.yml most likely belongs to
+
+        A result with the same name and an author in plugin.yml is a high confidence match.
+        One with the same name when plugin.yml lists no authors, or a similar name by an author in plugin.yml,
+        is medium confidence. Anything else is low confidence, including the same name by an author
+        plugin.yml doesn't list, as many unrelated resources share names.
+
+        :param description: The jar's plugin.yml
+        :param candidates: The search results for its name, most relevant first
+        :param authors: Author IDs to Author dicts, for every search result
+        :returns: The best result (None if there are none), the confidence, and why
+        """
+        if not candidates:
+            return None, LOW_CONFIDENCE, "no search results"
+
+        author_keys = {
+            Utils.normalise_name(author) for author in description["authors"]
+        }
+
+        def author_matches(plugin: Plugin) -> bool:
+            author = authors.get(plugin["author"]["id"], {})
+            return Utils.normalise_name(author.get("name", "")) in author_keys
+
+        name_key = Utils.normalise_name(description["name"])
+        same_name = [
+            plugin
+            for plugin in candidates
+            if Utils.normalise_name(plugin["name"]) == name_key
+        ]
+
+        for plugin in same_name:
+            if author_matches(plugin):
+                return plugin, HIGH_CONFIDENCE, "same name and author"
+
+        if same_name and not author_keys:
+            return (
+                same_name[0],
+                MEDIUM_CONFIDENCE,
+                "same name, plugin.yml lists no authors",
+            )
+
+        for plugin in candidates:
+            if SpigetAPI.score_plugin(
+                description["name"], plugin
+            ) >= STRONG_MATCH_SCORE and author_matches(plugin):
+                return plugin, MEDIUM_CONFIDENCE, "similar name, same author"
+
+        if same_name:
+            return same_name[0], LOW_CONFIDENCE, "same name, different author"
+
+        return candidates[0], LOW_CONFIDENCE, "different name"
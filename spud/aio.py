@@ -0,0 +1,355 @@
+"""
+An asyncio client for the Spiget API. Requires the optional aiohttp dependency,
+install it with `python -m pip install spud-mc[async]`.
+
+classes:
+    AsyncSpigetAPI - Helps interacting with the Spiget API from asyncio code
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import os
+import zipfile
+from typing import Dict, Iterable, Tuple, Union
+
+import aiohttp
+
+from . import settings
+from .api import (
+    AUTHOR_FIELDS,
+    SEARCH_PARAMS,
+    UPDATE_CHECK_FIELDS,
+    UPDATE_FIELDS,
+    SpigetAPI,
+)
+from .ratelimit import RateLimiter
+from .timings import TIMINGS
+from .type import Author, FileMetadata, Metadata, Plugin, StatusDict, Update
+from .utils import Utils
+
+
+class AsyncSpigetAPI:
+    """
+    An asyncio counterpart of SpigetAPI, with the same methods as coroutines.
+
+    Use it as an async context manager, or call close() when finished with it.
+    Cancelling a call stops its request, and never leaves a partial jar behind.
+    """
+
+    def __init__(
+        self,
+        base_api_url: str = settings.BASE_API_URL,
+        user_agent: str = settings.USER_AGENT,
+        connector: Union[aiohttp.BaseConnector, None] = None,
+        limit: int = settings.POOL_SIZE,
+        timeout: Tuple[float, float] = settings.TIMEOUT,
+        retries: int = settings.RETRIES,
+        backoff_factor: float = settings.BACKOFF_FACTOR,
+        rate_limiter: Union[RateLimiter, None] = None,
+    ) -> None:
+        """
+        Initialise an instance of the Spiget API
+
+        :param base_api_url: The root API http URL, default: settings.BASE_API_URL
+        :param user_agent: The user-agent header to send with requests, default: settings.USER_AGENT
+        :param connector: A connector to share connections and their limit between several clients.
+            It isn't closed with the client. default: a new connector with `limit` connections
+        :param limit: Maximum number of connections when no connector is given, default: settings.POOL_SIZE
+        :param timeout: (connect, read) timeout in seconds, default: settings.TIMEOUT
+        :param retries: Retries on connection errors and 5xx responses, default: settings.RETRIES
+        :param backoff_factor: Exponential backoff factor between retries, default: settings.BACKOFF_FACTOR
+        :param rate_limiter: A RateLimiter to schedule requests with, which can be shared with other instances
+            and with SpigetAPI, default: a RateLimiter for this instance with the settings' limits
+        """
+        self.base_api_url = base_api_url
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.rate_limiter = rate_limiter or RateLimiter(backoff_factor=backoff_factor)
+
+        self.headers: dict = {
+            "user-agent": user_agent,
+        }
+
+        self.connector = connector
+        self.limit = limit
+        self.timeout = aiohttp.ClientTimeout(connect=timeout[0], sock_read=timeout[1])
+        # Created on first use, as it needs a running event loop
+        self.session: Union[aiohttp.ClientSession, None] = None
+
+        self.authors: Dict[int, asyncio.Future] = {}
+
+    async def __aenter__(self) -> AsyncSpigetAPI:
+        return self
+
+    async def __aexit__(self, *_) -> None:
+        await self.close()
+
+    def get_session(self) -> aiohttp.ClientSession:
+        """Get the session, creating it if needed"""
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                connector=self.connector or aiohttp.TCPConnector(limit=self.limit),
+                connector_owner=self.connector is None,
+                headers=self.headers,
+                timeout=self.timeout,
+            )
+        return self.session
+
+    async def close(self) -> None:
+        """Close the session, and its connections unless they are shared"""
+        if self.session is not None:
+            await self.session.close()
+
+    def build_api_url(self, endpoint: str) -> str:
+        """Append an endpoint to the base API url and return it"""
+        return f"{self.base_api_url}{endpoint}"
+
+    async def acquire(self) -> None:
+        """Wait until the rate limiter allows a request, without blocking the event loop"""
+        wait = self.rate_limiter.reserve()
+        if wait:
+            await asyncio.sleep(wait)
+            TIMINGS.add_throttle(wait)
+
+    async def call_api(self, endpoint: str, params=None) -> aiohttp.ClientResponse:
+        """
+        Call an API endpoint and read the whole response
+
+        :param endpoint: The endpoint to call
+        :param params: Request body as a dict (optional)
+        :returns: A released ClientResponse, its body can still be read with json() or read()
+        :raises aiohttp.ClientResponseError: If the server still errors or rate limits after retrying
+        :raises aiohttp.ClientConnectionError: If the server is still unreachable after retrying
+        :raises asyncio.TimeoutError: If the server is still too slow after retrying
+        """
+        attempt = 0
+        rate_limited = 0
+        while True:
+            await self.acquire()
+            try:
+                async with self.get_session().get(
+                    self.build_api_url(endpoint), params=params
+                ) as response:
+                    await response.read()
+
+                    if response.status == 429:
+                        # The next reservation waits for Retry-After
+                        self.rate_limiter.throttle(
+                            RateLimiter.parse_retry_after(
+                                response.headers.get("Retry-After")
+                            )
+                        )
+                        if rate_limited >= settings.RATE_LIMIT_RETRIES:
+                            response.raise_for_status()
+                        rate_limited += 1
+                        continue
+
+                    self.rate_limiter.succeed()
+                    if response.status < 500:
+                        return response
+                    # Server errors that persisted through every retry
+                    if attempt >= self.retries:
+                        response.raise_for_status()
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if attempt >= self.retries:
+                    raise
+
+            await asyncio.sleep(self.backoff_factor * 2**attempt)
+            attempt += 1
+
+    async def get_plugin_by_id(
+        self, plugin_id: int, fields: Union[str, None] = None
+    ) -> Plugin:
+        """
+        Get a Plugin using an ID.
+
+        :param fields: The comma separated fields to get, default: the whole resource
+        :returns: A dict of type Plugin
+        """
+        response = await self.call_api(
+            f"/resources/{plugin_id}", {"fields": fields} if fields else None
+        )
+        response.raise_for_status()
+        return await response.json()
+
+    async def get_latest_version(self, plugin_id: int) -> Plugin:
+        """
+        Get the fields of a plugin needed to check for and download its latest version
+
+        :returns: A Plugin dict with only the fields in UPDATE_CHECK_FIELDS
+        """
+        return await self.get_plugin_by_id(plugin_id, UPDATE_CHECK_FIELDS)
+
+    async def search_plugins(
+        self, query: str, resolve_authors: bool = True
+    ) -> list[Plugin]:
+        """
+        Search for plugins using a query
+
+        :param resolve_authors: Look up the author names of the results, default: True.
+            If False, the Author dicts of the results only have an ID.
+        :returns: A list of Plugin dicts, sorted by relevance to the query
+        """
+        plugin_list: list[Plugin] = []
+        for name in SpigetAPI.search_queries(query):
+            response = await self.call_api(f"/search/resources/{name}", SEARCH_PARAMS)
+            if response.status == 200:
+                results = await response.json()
+                if isinstance(results, list):
+                    plugin_list += results
+            # The other names are only searched for if this one found nothing good
+            if SpigetAPI.is_strong_match(query, plugin_list):
+                break
+
+        truncated_list = SpigetAPI.rank_plugins(query, plugin_list)
+
+        if resolve_authors:
+            authors = await self.get_authors(
+                plugin["author"]["id"] for plugin in truncated_list
+            )
+            for plugin in truncated_list:
+                plugin["author"]["name"] = authors[plugin["author"]["id"]]["name"]
+
+        return truncated_list
+
+    async def download_plugin(self, plugin: Plugin, filename: str = "") -> StatusDict:
+        """
+        Download a plugin
+
+        :param plugin: Plugin dict
+        :param filename: Force a filename for the plugin instead of inferring it
+        :return: StatusDict
+        """
+        plugin_jar_name = filename or Utils.create_jar_name(plugin["name"])
+        tmp_jar_name = Utils.create_temp_jar_name(plugin_jar_name)
+
+        try:
+            await self.acquire()
+            async with self.get_session().get(
+                self.build_api_url(f"/resources/{plugin['id']}/download")
+            ) as response:
+                if response.status != 200:
+                    return {
+                        "status": False,
+                        "message": "Could not download resource due to an unknown error. "
+                        "This can sometimes happen with external resources.",
+                    }
+
+                digest = hashlib.sha256()
+                size = 0
+                with open(tmp_jar_name, "xb") as file:
+                    async for chunk in response.content.iter_chunked(
+                        settings.DOWNLOAD_CHUNK_SIZE
+                    ):
+                        file.write(chunk)
+                        digest.update(chunk)
+                        size += len(chunk)
+
+                file_metadata: FileMetadata = {
+                    "file_size": size,
+                    "file_hash": digest.hexdigest(),
+                }
+                if "ETag" in response.headers:
+                    file_metadata["file_etag"] = response.headers["ETag"]
+
+            await asyncio.get_running_loop().run_in_executor(
+                None,
+                SpigetAPI.finalise_download,
+                plugin,
+                tmp_jar_name,
+                plugin_jar_name,
+                file_metadata,
+            )
+        except (aiohttp.ClientError, asyncio.TimeoutError, zipfile.BadZipFile) as error:
+            if os.path.exists(tmp_jar_name):
+                os.remove(tmp_jar_name)
+            return {
+                "status": False,
+                "message": f"Could not download {plugin_jar_name}: {error}",
+            }
+        except BaseException:
+            # Including cancellation
+            if os.path.exists(tmp_jar_name):
+                os.remove(tmp_jar_name)
+            raise
+
+        return {"status": True, "message": f"Downloaded {plugin_jar_name}"}
+
+    async def get_plugin_info_if_update(
+        self, metadata: Metadata
+    ) -> Union[Plugin, None]:
+        """
+        Get a Plugin dict for a plugin if it has been updated.
+
+        :param metadata: A Metadata dict
+        :returns: A Plugin dict if there was an update, otherwise None
+        """
+        plugin = await self.get_latest_version(metadata["plugin_id"])
+
+        if metadata["plugin_version_id"] >= plugin["version"]["id"]:
+            return None
+
+        return plugin
+
+    async def get_author(self, author_id: int) -> Author:
+        """
+        Gets an Author dict from an ID. Concurrent and later calls for the same author share one request.
+
+        :param author_id: The ID of an author
+        :return: A dict representing the author
+        """
+        if author_id in self.authors:
+            # Move to the end, as the most recently used
+            future = self.authors[author_id] = self.authors.pop(author_id)
+        else:
+            future = self.authors[author_id] = asyncio.ensure_future(
+                self.fetch_author(author_id)
+            )
+            if len(self.authors) > settings.AUTHOR_CACHE_SIZE:
+                del self.authors[next(iter(self.authors))]
+
+        try:
+            # Shielded, so cancelling one caller doesn't fail the others
+            return await asyncio.shield(future)
+        except BaseException:
+            if future.done() and self.authors.get(author_id) is future:
+                # Don't remember failures
+                del self.authors[author_id]
+            raise
+
+    async def fetch_author(self, author_id: int) -> Author:
+        """Request an Author dict from the API"""
+        response = await self.call_api(
+            f"/authors/{author_id}", {"fields": AUTHOR_FIELDS}
+        )
+        return await response.json()
+
+    async def get_authors(self, author_ids: Iterable[int]) -> Dict[int, Author]:
+        """
+        Get several Author dicts at once
+
+        :param author_ids: Author IDs, duplicates are only looked up once
+        :return: A dict of author IDs to Author dicts
+        """
+        unique_ids = list(dict.fromkeys(author_ids))
+        authors = await asyncio.gather(*map(self.get_author, unique_ids))
+        return dict(zip(unique_ids, authors))
+
+    async def get_latest_update_info(self, plugin: Plugin) -> Update:
+        """
+        Get information about the latest update of a plugin
+
+        :param plugin: A Plugin dict
+        :return: An Update dict
+        """
+        response = await self.call_api(
+            f"/resources/{plugin['id']}/updates/latest", {"fields": UPDATE_FIELDS}
+        )
+        response.raise_for_status()
+        update: Update = await response.json()
+
+        # Parsing large changelogs would block the event loop
+        return await asyncio.get_running_loop().run_in_executor(
+            None, SpigetAPI.render_update, update
+        )
@@ -6,20 +6,51 @@ classes:
 """
 from __future__ import annotations
 
-import base64
-import itertools
-import operator
-from typing import Union
-
-from bs4 import BeautifulSoup
+import math
+import os
+import re
+import threading
+import time
+import zipfile
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Set, Tuple, Union
 
 import requests
-from requests import HTTPError
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from . import settings
-from .type import Plugin, StatusDict, Author, Metadata, Update
+from .changelog import ChangelogRenderer
+from .cache import CACHED_HEADER, CacheEntry, ResponseCache
+from .catalog import ResourceCatalog
+from .ratelimit import RateLimiter
+from .store import JarStore
+from .timings import TIMINGS
+from .type import Plugin, StatusDict, Author, FileMetadata, Metadata, Update
 from .utils import Utils
 
+# Parameters sent with every search
+SEARCH_PARAMS = {
+    "field": "name",
+    "sort": "-downloads",
+    "size": 5,
+    "fields": "file,name,tag,version,downloads,id,author",
+}
+
+# The fields of each document that are used, so the rest (like base64 descriptions) isn't transferred
+UPDATE_CHECK_FIELDS = "id,name,version,file"
+AUTHOR_FIELDS = "id,name"
+UPDATE_FIELDS = "id,title,description,date"
+VERSION_FIELDS = "id,name"
+
+# The relevance score of a search result that is good enough not to search again
+STRONG_MATCH_SCORE = 50.0
+
+# Bytes in each unit Spiget gives file sizes in
+SIZE_UNITS = {"B": 1, "KB": 1024, "MB": 1024**2, "GB": 1024**3}
+
 
 class SpigetAPI:
     """
@@ -30,145 +61,736 @@ class SpigetAPI:
         self,
         base_api_url: str = settings.BASE_API_URL,
         user_agent: str = settings.USER_AGENT,
+        pool_size: int = settings.POOL_SIZE,
+        timeout: Tuple[float, float] = settings.TIMEOUT,
+        retries: int = settings.RETRIES,
+        backoff_factor: float = settings.BACKOFF_FACTOR,
+        cache: Union[ResponseCache, None] = None,
+        store: Union[JarStore, None] = None,
+        rate_limiter: Union[RateLimiter, None] = None,
+        catalog: Union[ResourceCatalog, None] = None,
     ) -> None:
         """
         Initialise an instance of the Spiget API
 
         :param base_api_url: The root API http URL, default: settings.BASE_API_URL
         :param user_agent: The user-agent header to send with requests, default: settings.USER_AGENT
+        :param pool_size: Maximum number of keep-alive connections, default: settings.POOL_SIZE
+        :param timeout: (connect, read) timeout in seconds, default: settings.TIMEOUT
+        :param retries: Retries on connection errors and 5xx responses, default: settings.RETRIES
+        :param backoff_factor: Exponential backoff factor between retries, default: settings.BACKOFF_FACTOR
+        :param cache: A ResponseCache to cache responses in, default: no caching
+        :param store: A JarStore to share downloaded jars with other plugin directories, default: no sharing
+        :param rate_limiter: A RateLimiter to schedule requests with, which can be shared with other instances,
+            default: a RateLimiter for this instance with the settings' limits
+        :param catalog: A ResourceCatalog to search before searching with the API, default: always use the API
         """
         self.base_api_url = base_api_url
+        self.timeout = timeout
+        self.backoff_factor = backoff_factor
+        self.cache = cache
+        self.store = store
+        self.catalog = catalog
+        self.pool_size = pool_size
+        self.rate_limiter = rate_limiter or RateLimiter(backoff_factor=backoff_factor)
+
+        # Authors already looked up, least recently used first
+        self.authors: OrderedDict[int, Author] = OrderedDict()
+        self.authors_lock = threading.Lock()
+
+        # Search results whose versions may be out of date, so they are refreshed before they are downloaded
+        self.stale_plugin_ids: Set[int] = set()
+
+        # Locks of the jars being downloaded, so threads downloading the same jar don't share its partial file
+        self.jar_locks: Dict[str, threading.Lock] = {}
+        self.jar_locks_lock = threading.Lock()
 
         self.headers: dict = {
             "user-agent": user_agent,
         }
 
+        self.session: requests.Session = self.create_session(
+            pool_size, retries, backoff_factor
+        )
+        self.session.headers.update(self.headers)
+
+    def __enter__(self) -> SpigetAPI:
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    @staticmethod
+    def create_session(
+        pool_size: int, retries: int, backoff_factor: float
+    ) -> requests.Session:
+        """
+        Create a Session that keeps connections alive and retries failed requests
+
+        :param pool_size: Maximum number of connections kept open per host
+        :param retries: How many times to retry connection errors and 5xx responses
+        :param backoff_factor: Sleep backoff_factor * 2^(retry - 1) seconds between retries
+        :returns: A Session with a pooled, retrying adapter mounted
+        """
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=retries,
+            status=retries,
+            status_forcelist=frozenset(range(500, 600)),
+            allowed_methods=frozenset({"GET"}),
+            backoff_factor=backoff_factor,
+            # Return the last response instead of raising so call_api can handle it
+            raise_on_status=False,
+            # Rate limited responses are retried by call_api, which pauses every thread
+            respect_retry_after_header=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry
+        )
+
+        session = requests.Session()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def close(self) -> None:
+        """Close all pooled connections"""
+        self.session.close()
+
     def build_api_url(self, endpoint: str) -> str:
         """Append an endpoint to the base API url and return it"""
         return f"{self.base_api_url}{endpoint}"
 
-    def call_api(self, endpoint: str, params=None) -> requests.Response:
+    @TIMINGS.timed("request")
+    def call_api(
+        self,
+        endpoint: str,
+        params=None,
+        stream: bool = False,
+        headers: Union[dict, None] = None,
+    ) -> requests.Response:
         """
         Call an API endpoint
 
         :param endpoint: The endpoint to call
         :param params: Request body as a dict (optional)
+        :param stream: Don't read the body until it is accessed, and never cache it, default: False
+        :param headers: Extra request headers (optional)
         :returns: A Response object
+        :raises requests.HTTPError: If the server still errors or rate limits after retrying
+        :raises requests.ConnectionError: If the server is still unreachable after retrying
         """
         if params is None:
             params = {}
 
-        response = requests.get(
-            self.build_api_url(endpoint),
-            params=params,
-            headers=self.headers,
-        )
-        if str(response.status_code).startswith("5"):
-            raise HTTPError
+        url = self.build_api_url(endpoint)
+
+        cache_url = ""
+        entry: Union[CacheEntry, None] = None
+        headers = dict(headers or {})
+        if not stream and self.cache is not None and (ttl := self.cache.ttl(endpoint)):
+            cache_url = requests.Request("GET", url, params=params).prepare().url or ""
+            entry = self.cache.load(cache_url)
+            if entry:
+                if self.cache.is_fresh(entry, ttl):
+                    TIMINGS.add_request(endpoint, 0, 0, cached=True)
+                    response = ResponseCache.to_response(entry)
+                    response.headers[CACHED_HEADER] = "1"
+                    return response
+                headers.update(ResponseCache.conditional_headers(entry))
+
+        for retry in range(settings.RATE_LIMIT_RETRIES + 1):
+            self.rate_limiter.acquire()
+
+            start = time.perf_counter()
+            response = self.session.get(
+                url,
+                params=params,
+                headers=headers,
+                timeout=self.timeout,
+                stream=stream,
+            )
+            # Streamed bodies are counted as they are read
+            TIMINGS.add_request(
+                endpoint,
+                time.perf_counter() - start,
+                0 if stream else len(response.content),
+            )
+
+            if response.status_code != 429:
+                self.rate_limiter.succeed()
+                break
+
+            self.rate_limiter.throttle(
+                RateLimiter.parse_retry_after(response.headers.get("Retry-After"))
+            )
+            if retry < settings.RATE_LIMIT_RETRIES:
+                response.close()
+
+        # Server errors and rate limiting that persisted through every retry
+        if response.status_code == 429 or str(response.status_code).startswith("5"):
+            response.raise_for_status()
+
+        if self.cache is not None and cache_url:
+            # Not modified since it was cached
+            if response.status_code == 304 and entry:
+                return ResponseCache.to_response(self.cache.revalidate(entry))
+            if response.status_code == 200:
+                self.cache.store(cache_url, response)
 
         return response
 
-    def get_plugin_by_id(self, plugin_id: int) -> Plugin:
+    def get_plugin_by_id(
+        self, plugin_id: int, fields: Union[str, None] = None
+    ) -> Plugin:
         """
         Get a Plugin using an ID.
 
+        :param fields: The comma separated fields to get, default: the whole resource
         :returns: A dict of type Plugin
+        :raises requests.HTTPError: If the plugin couldn't be got, e.g. it was deleted
+        """
+        response = self.call_api(
+            f"/resources/{plugin_id}", {"fields": fields} if fields else None
+        )
+        if response.status_code != 200:
+            raise requests.HTTPError(
+                f"{response.status_code} error getting plugin {plugin_id}",
+                response=response,
+            )
+        return response.json()
+
+    def get_latest_version(self, plugin_id: int) -> Plugin:
+        """
+        Get the fields of a plugin needed to check for and download its latest version
+
+        :returns: A Plugin dict with only the fields in UPDATE_CHECK_FIELDS
+        :raises requests.HTTPError: If the plugin couldn't be got, e.g. it was deleted
+        """
+        return self.get_plugin_by_id(plugin_id, UPDATE_CHECK_FIELDS)
+
+    def refresh_plugin(self, plugin: Plugin) -> Plugin:
+        """
+        Get a search result with its latest version and file, before downloading it.
+        Catalog hits have the version from when the catalog was refreshed and no file,
+        and search results served from the response cache can be out of date too,
+        but the latest jar is always downloaded. Other search results are already up to date.
+
+        :param plugin: A Plugin dict from search_plugins
+        :returns: The Plugin dict, or a copy of it with the latest version and file if it was out of date,
+            keeping its sanitised name
+        :raises requests.HTTPError: If the plugin couldn't be got, e.g. it was deleted
+        """
+        if plugin["id"] not in self.stale_plugin_ids:
+            return plugin
+
+        latest = self.get_latest_version(plugin["id"])
+        return {
+            **plugin,
+            "version": latest["version"],
+            "file": latest.get("file", {}),
+        }
+
+    def get_plugin_versions(self, plugin_id: int, size: int = 100) -> list[dict]:
         """
-        response = self.call_api(f"/resources/{plugin_id}")
+        Get the IDs and names of a plugin's versions, newest first
+
+        :param size: How many versions to get
+        :returns: A list of version dicts, with the fields in VERSION_FIELDS
+        :raises requests.HTTPError: If the versions couldn't be got
+        """
+        response = self.call_api(
+            f"/resources/{plugin_id}/versions",
+            {"size": size, "sort": "-releaseDate", "fields": VERSION_FIELDS},
+        )
+        response.raise_for_status()
         return response.json()
 
-    def search_plugins(self, query: str) -> list[Plugin]:
+    @TIMINGS.timed("search")
+    def search_plugins(self, query: str, resolve_authors: bool = True) -> list[Plugin]:
         """
-        Search for plugins using a query
+        Search for plugins using a query, in the catalog if there is one, otherwise or if it has no matches with the API
 
+        :param resolve_authors: Look up the author names of the results, default: True.
+            If False, the Author dicts of the results only have an ID.
         :returns: A list of Plugin dicts, sorted by relevance to the query
         """
+        plugin_list: list[Plugin] = []
+        if self.catalog is not None:
+            plugin_list = self.catalog.search(query)
+            self.stale_plugin_ids.update(plugin["id"] for plugin in plugin_list)
+
+        # Not in the catalog, or there isn't one
+        if not plugin_list:
+            for name in self.search_queries(query):
+                plugin_list += self.search_api(name)
+                # The other names are only searched for if this one found nothing good
+                if self.is_strong_match(query, plugin_list):
+                    break
+
+        truncated_list = self.rank_plugins(query, plugin_list)
+
+        if resolve_authors:
+            authors = self.get_authors(
+                plugin["author"]["id"] for plugin in truncated_list
+            )
+            for plugin in truncated_list:
+                plugin["author"]["name"] = authors[plugin["author"]["id"]]["name"]
+
+        return truncated_list
+
+    def search_api(self, name: str) -> list[Plugin]:
+        """
+        Search the API for plugins with a name
+
+        :returns: Every Plugin dict found, or an empty list if there were none
+        """
+        response = self.call_api(f"/search/resources/{name}", SEARCH_PARAMS)
+        if response.status_code != 200:
+            return []
+        plugin_list = response.json()
+        if not isinstance(plugin_list, list):
+            return []
+
+        if CACHED_HEADER in response.headers:
+            self.stale_plugin_ids.update(plugin["id"] for plugin in plugin_list)
+        return plugin_list
+
+    def get_resources_page(self, page: int, size: int, fields: str) -> list[dict]:
+        """
+        Get a page of every resource, most recently updated first
+
+        :param page: The page number, starting from 1
+        :param size: How many resources are on each page
+        :param fields: The comma separated fields to get of each resource
+        :returns: A list of resource dicts with the fields
+        :raises requests.HTTPError: If the page couldn't be got
+        """
+        response = self.call_api(
+            "/resources",
+            {"size": size, "page": page, "sort": "-updateDate", "fields": fields},
+        )
+        response.raise_for_status()
+        return response.json()
+
+    @staticmethod
+    def search_queries(query: str) -> list[str]:
+        """Get the names to search for to find a query, e.g. 'FooBar' -> ['FooBar', 'Foo Bar']"""
         names = [query]
         split_name: str = Utils.split_title_case(query)
-        if split_name:
+        if split_name and split_name != query:
             names.append(split_name)
+        return names
 
-        plugin_list: list[Plugin] = []
+    @staticmethod
+    def score_plugin(query: str, plugin: Plugin) -> float:
+        """
+        Score how relevant a search result is to the query.
 
-        for name in names:
-            response = self.call_api(
-                f"/search/resources/{name}",
-                {
-                    "field": "name",
-                    "sort": "-downloads",
-                    "size": 5,
-                    "fields": "file,name,tag,version,downloads,id,author",
-                },
-            )
-            if response.status_code == 200:
-                plugin: Plugin = response.json()[0]
-                plugin_list.append(plugin)
+        An exact name scores 100, a name starting with the query 50 and a name containing it 30,
+        ignoring case, spaces and punctuation. Up to 20 more is for the share of the query's words in the name,
+        and the log10 of downloads breaks ties between similar names.
 
-        if len(plugin_list) == 0:
-            return []
-
-        # Sort the list by highest downloads, then IDs
-        plugin_list.sort(key=operator.itemgetter("downloads", "id"), reverse=True)
+        :param query: The search query
+        :param plugin: A sanitised Plugin dict
+        :returns: The score, higher is more relevant
+        """
+        query_key = Utils.normalise_name(query)
+        name_key = Utils.normalise_name(plugin["name"])
+
+        score = 0.0
+        if query_key and name_key == query_key:
+            score += 100
+        elif query_key and name_key.startswith(query_key):
+            score += 50
+        elif query_key and query_key in name_key:
+            score += 30
+
+        query_tokens = Utils.tokenize_name(query)
+        if query_tokens:
+            shared_tokens = query_tokens & Utils.tokenize_name(plugin["name"])
+            score += 20 * len(shared_tokens) / len(query_tokens)
+
+        return score + math.log10(max(plugin.get("downloads", 0), 0) + 1)
+
+    @staticmethod
+    def is_strong_match(query: str, plugin_list: list[Plugin]) -> bool:
+        """Check if the best of some search results scores at least STRONG_MATCH_SCORE"""
+        ranked = SpigetAPI.rank_plugins(query, plugin_list)
+        return bool(ranked) and (
+            SpigetAPI.score_plugin(query, ranked[0]) >= STRONG_MATCH_SCORE
+        )
 
-        # Remove duplicate ids from list
-        plugin_list = [id_field[0] for id_field in itertools.groupby(plugin_list)]
+    @staticmethod
+    def rank_plugins(query: str, plugin_list: list[Plugin]) -> list[Plugin]:
+        """
+        Sort search results by relevance to the query, removing duplicates, and sanitise them
 
-        sorted_list: list[Plugin] = []
+        :param query: The search query
+        :param plugin_list: Plugin dicts returned by the searches for the query, which aren't changed
+        :returns: Up to 10 sanitised copies of the Plugin dicts, most relevant first
+        """
+        # The first result with each ID is kept
+        unique_plugins: Dict[int, Plugin] = {}
         for plugin in plugin_list:
-            # Exact match goes to first index
-            if query.upper() == plugin["name"].upper():
-                sorted_list.insert(0, plugin)
+            unique_plugins.setdefault(plugin["id"], plugin)
+
+        sanitised_list = [
+            Utils.sanitise_api_plugin({**plugin})  # type: ignore
+            for plugin in unique_plugins.values()
+        ]
+        sanitised_list.sort(
+            key=lambda plugin: (
+                SpigetAPI.score_plugin(query, plugin),
+                plugin.get("downloads", 0),
+                plugin["id"],
+            ),
+            reverse=True,
+        )
 
-            # Fuzzy match goes to second index
-            elif query.upper() in plugin["name"].upper():
-                sorted_list.insert(1, plugin)
+        return sanitised_list[:10]
 
-            # Everything else just gets appended to the end
-            else:
-                sorted_list.append(plugin)
+    @TIMINGS.timed("download")
+    def download_plugin(
+        self,
+        plugin: Plugin,
+        filename: str = "",
+        metadata: Union[Metadata, None] = None,
+        locked: Union[Metadata, None] = None,
+    ) -> StatusDict:
+        """
+        Download a plugin, unless the jar it replaces already has the same file
 
-        truncated_list: list[Plugin] = sorted_list[:10]
+        :param plugin: Plugin dict
+        :param filename: Force a filename for the plugin instead of inferring it
+        :param metadata: The Metadata dict of the jar being replaced, loaded from the jar if not given
+        :param locked: A Metadata dict from a lockfile. If given, exactly the plugin's version is downloaded,
+            and it must have the locked hash.
+        :return: StatusDict
+        """
+        plugin_jar_name = filename or Utils.create_jar_name(plugin["name"])
 
-        for plugin in truncated_list:
-            Utils.sanitise_api_plugin(plugin)
-            # Author's name ==
-            plugin["author"]["name"] = self.get_author(
-                # Author's ID
-                plugin["author"]["id"]
-            )["name"]
+        with self.jar_lock(plugin_jar_name):
+            return self.download_jar(plugin, plugin_jar_name, metadata, locked)
 
-        return truncated_list
+    def jar_lock(self, plugin_jar_name: str) -> threading.Lock:
+        """Get the lock that downloads of a jar hold, as they write to the same partial file"""
+        key = os.path.realpath(plugin_jar_name)
+        with self.jar_locks_lock:
+            return self.jar_locks.setdefault(key, threading.Lock())
 
-    def download_plugin(self, plugin: Plugin, filename: str = "") -> StatusDict:
+    def download_jar(
+        self,
+        plugin: Plugin,
+        plugin_jar_name: str,
+        metadata: Union[Metadata, None] = None,
+        locked: Union[Metadata, None] = None,
+    ) -> StatusDict:
         """
-        Download a plugin
+        Download a plugin to a jar while holding the jar's lock. See download_plugin.
 
         :param plugin: Plugin dict
-        :param filename: Force a filename for the plugin instead of inferring it
+        :param plugin_jar_name: The jar filename
+        :param metadata: The Metadata dict of the jar being replaced, loaded from the jar if not given
+        :param locked: A Metadata dict from a lockfile
         :return: StatusDict
         """
-        response = self.call_api(
-            f"/resources/{plugin['id']}/download",
-        )
-        if response.status_code != 200:
+        stored = self.store.find(plugin) if self.store is not None else None
+        # A locked jar is only taken from the store if it has the locked hash, otherwise it is downloaded and checked
+        if stored and locked and "file_hash" in locked:
+            stored_metadata = Utils.load_metadata_file(str(stored))
+            if (
+                not stored_metadata
+                or stored_metadata.get("file_hash") != locked["file_hash"]
+            ):
+                stored = None
+
+        if self.store is not None and stored:
+            self.store.materialise(stored, plugin_jar_name)
+            return {
+                "status": True,
+                "message": f"Copied {plugin_jar_name} from the jar store",
+            }
+
+        # The jar being replaced, if it is the same plugin
+        existing = metadata or Utils.load_metadata_file(plugin_jar_name)
+        if existing and existing["plugin_id"] != plugin["id"]:
+            existing = None
+
+        # The download is skipped if the server says the file hasn't changed since the jar was downloaded
+        headers = {}
+        if (
+            existing
+            and "file_etag" in existing
+            and self.file_may_be_unchanged(existing, plugin.get("file", {}))
+        ):
+            headers["If-None-Match"] = existing["file_etag"]
+
+        download_endpoint = f"/resources/{plugin['id']}/download"
+        if locked:
+            download_endpoint = (
+                f"/resources/{plugin['id']}/versions/{plugin['version']['id']}/download"
+            )
+
+        partial_jar_name = Utils.create_partial_jar_name(plugin_jar_name, plugin)
+        try:
+            file_metadata = self.fetch_download(
+                download_endpoint, partial_jar_name, headers
+            )
+
+            # Not modified since the jar being replaced was downloaded
+            if file_metadata is None:
+                # Only asked with If-None-Match, which is only sent when there is a jar being replaced
+                assert existing is not None
+                return self.keep_jar(plugin, plugin_jar_name, existing)
+
+            if (
+                locked
+                and "file_hash" in locked
+                and file_metadata["file_hash"] != locked["file_hash"]
+            ):
+                os.remove(partial_jar_name)
+                return {
+                    "status": False,
+                    "message": f"{plugin_jar_name} doesn't match the hash in the lockfile",
+                }
+
+            # The same bytes as the jar being replaced, so that jar is kept
+            if existing and existing.get("file_hash") == file_metadata["file_hash"]:
+                os.remove(partial_jar_name)
+                return self.keep_jar(plugin, plugin_jar_name, file_metadata)
+
+            self.finalise_download(
+                plugin, partial_jar_name, plugin_jar_name, file_metadata
+            )
+        except requests.HTTPError:
             return {
                 "status": False,
                 "message": "Could not download resource due to an unknown error. "
                 "This can sometimes happen with external resources.",
             }
+        except requests.RequestException as error:
+            # The partial download is kept, so the next attempt resumes it
+            return {
+                "status": False,
+                "message": f"Could not download {plugin_jar_name}: {error}",
+            }
+        except zipfile.BadZipFile as error:
+            Utils.remove_partial_jars(plugin_jar_name)
+            return {
+                "status": False,
+                "message": f"Could not download {plugin_jar_name}: {error}",
+            }
 
-        if not filename:
-            plugin_jar_name = Utils.create_jar_name(plugin["name"])
-        else:
-            plugin_jar_name = filename
-
-        with open(plugin_jar_name, "wb") as file:
-            file.write(response.content)
+        # Partial downloads of older versions will never be resumed
+        Utils.remove_partial_jars(plugin_jar_name)
 
-        Utils.inject_metadata_file(plugin, plugin_jar_name)
+        if self.store is not None:
+            self.store.add(plugin, plugin_jar_name)
 
         return {"status": True, "message": f"Downloaded {plugin_jar_name}"}
 
+    def fetch_download(
+        self, endpoint: str, partial_jar_name: str, headers: dict
+    ) -> Union[FileMetadata, None]:
+        """
+        Download a file, resuming it with Range requests when the connection drops.
+
+        Servers that don't support ranges send the whole file again, which replaces the partial file.
+        The file is requested without content encoding, so lengths and Range offsets count the bytes on disk.
+        If a server compresses it anyway, a dropped download starts again instead of resuming.
+
+        :param endpoint: The download endpoint
+        :param partial_jar_name: The file to download to, which is resumed if it already exists
+        :param headers: Extra request headers for downloading the file from the start
+        :returns: What the file was downloaded as, or None if the server said it wasn't modified
+        :raises requests.HTTPError: If the server can't send the file
+        :raises requests.RequestException: If the connection still drops after settings.DOWNLOAD_RESUMES resumes
+        """
+        etag = None
+        for resume in range(settings.DOWNLOAD_RESUMES + 1):
+            offset = 0
+            if os.path.exists(partial_jar_name):
+                offset = os.path.getsize(partial_jar_name)
+
+            request_headers = {**headers, "Accept-Encoding": "identity"}
+            if offset:
+                # If-Range makes the server send the whole file if it changed since the partial download
+                request_headers = {
+                    "Range": f"bytes={offset}-",
+                    "Accept-Encoding": "identity",
+                }
+                if etag:
+                    request_headers["If-Range"] = etag
+
+            try:
+                with self.call_api(
+                    endpoint, stream=True, headers=request_headers
+                ) as response:
+                    if response.status_code == 304 and not offset:
+                        return None
+
+                    # The partial file is bigger than the file, so it can't be resumed
+                    if response.status_code == 416:
+                        os.remove(partial_jar_name)
+                        continue
+
+                    if response.status_code == 206:
+                        mode = "ab"
+                        length = self.range_length(response, offset)
+                    elif response.status_code == 200:
+                        mode = "wb"
+                        length = int(response.headers.get("Content-Length", -1))
+                    else:
+                        raise requests.HTTPError(
+                            f"{response.status_code} error downloading {endpoint}",
+                            response=response,
+                        )
+
+                    etag = response.headers.get("ETag", etag)
+                    encoded = (
+                        response.headers.get("Content-Encoding", "identity")
+                        != "identity"
+                    )
+                    with open(partial_jar_name, mode) as file:
+                        for chunk in response.iter_content(
+                            settings.DOWNLOAD_CHUNK_SIZE
+                        ):
+                            file.write(chunk)
+                            TIMINGS.add_bytes(endpoint, len(chunk))
+
+                    if encoded:
+                        # Content-Length counts the compressed bytes, which can't be resumed from
+                        received = response.raw.tell()
+                        length = int(response.headers.get("Content-Length", -1))
+                        if length not in (-1, received):
+                            os.remove(partial_jar_name)
+                            raise requests.ConnectionError(
+                                f"the download ended after {received} of {length} bytes"
+                            )
+
+                size = os.path.getsize(partial_jar_name)
+                if not encoded and length not in (-1, size):
+                    raise requests.ConnectionError(
+                        f"the download ended after {size} of {length} bytes"
+                    )
+            except (
+                requests.ConnectionError,
+                requests.Timeout,
+                requests.exceptions.ChunkedEncodingError,
+            ):
+                if resume == settings.DOWNLOAD_RESUMES:
+                    raise
+                time.sleep(self.backoff_factor * 2**resume)
+                continue
+
+            file_metadata: FileMetadata = {
+                "file_size": size,
+                "file_hash": Utils.hash_file(partial_jar_name),
+            }
+            if etag:
+                file_metadata["file_etag"] = etag
+            return file_metadata
+
+        raise requests.ConnectionError(f"could not resume downloading {endpoint}")
+
+    @staticmethod
+    def range_length(response: requests.Response, offset: int) -> int:
+        """
+        Get the length of a whole file from a partial response
+
+        :param response: A 206 response to a Range request
+        :param offset: The first byte that was requested
+        :returns: The length of the file, or -1 if it is unknown
+        :raises requests.HTTPError: If the response doesn't start at the offset
+        """
+        content_range = re.fullmatch(
+            r"bytes (\d+)-\d+/(\d+|\*)", response.headers.get("Content-Range", "")
+        )
+        if not content_range or int(content_range[1]) != offset:
+            raise requests.HTTPError(
+                f"the server sent the wrong range of {response.url}", response=response
+            )
+
+        return -1 if content_range[2] == "*" else int(content_range[2])
+
+    def keep_jar(
+        self, plugin: Plugin, plugin_jar_name: str, file_metadata: FileMetadata
+    ) -> StatusDict:
+        """
+        Update a jar to a new version of its plugin without downloading it, as its file is unchanged
+
+        :param plugin: The new Plugin dict
+        :param plugin_jar_name: The jar to update
+        :param file_metadata: What the jar was downloaded as
+        :return: StatusDict
+        """
+        # file_metadata can be a whole Metadata dict
+        file_metadata = {
+            key: value  # type: ignore
+            for key, value in file_metadata.items()
+            if key in FileMetadata.__annotations__
+        }
+        Utils.replace_metadata_file(plugin, plugin_jar_name, file_metadata)
+
+        if self.store is not None:
+            self.store.add(plugin, plugin_jar_name)
+
+        return {
+            "status": True,
+            "message": f"{plugin_jar_name} is unchanged, so only its version was updated",
+        }
+
+    @staticmethod
+    def file_may_be_unchanged(metadata: Metadata, file: dict) -> bool:
+        """
+        Check if the file Spiget lists for a resource could be the file a jar was downloaded as
+
+        :param metadata: The Metadata dict of the jar
+        :param file: The file dict of the resource, its size is rounded
+        :returns: False if the file is definitely different, otherwise True
+        """
+        # External resources aren't hosted by Spigot, so nothing is known about them
+        if file.get("type", ".jar") != ".jar":
+            return False
+
+        unit = SIZE_UNITS.get(file.get("sizeUnit", ""))
+        if unit is None or "size" not in file or "file_size" not in metadata:
+            return True
+
+        # Allow for the size being rounded to one decimal place
+        return abs(metadata["file_size"] / unit - file["size"]) <= 0.1
+
+    @staticmethod
+    def finalise_download(
+        plugin: Plugin,
+        tmp_jar_name: str,
+        plugin_jar_name: str,
+        file_metadata: Union[FileMetadata, None] = None,
+    ) -> None:
+        """
+        Inject metadata into a downloaded jar and move it into place
+
+        :param file_metadata: What the jar was downloaded as, default: nothing
+        :raises zipfile.BadZipFile: If the download isn't a jar, or is corrupt
+        """
+        # External resources can download web pages instead of jars
+        if not zipfile.is_zipfile(tmp_jar_name):
+            raise zipfile.BadZipFile("the download is not a jar file")
+
+        # Check every file in the jar, as resumed downloads are put together from several responses
+        try:
+            with zipfile.ZipFile(tmp_jar_name) as jar:
+                corrupt = jar.testzip()
+        except (zlib.error, EOFError) as error:
+            raise zipfile.BadZipFile(f"the download is corrupt: {error}") from error
+        if corrupt is not None:
+            raise zipfile.BadZipFile(f"{corrupt} in the download is corrupt")
+
+        Utils.inject_metadata_file(plugin, tmp_jar_name, file_metadata)
+        os.replace(tmp_jar_name, plugin_jar_name)
+
     def get_plugin_info_if_update(self, metadata: Metadata) -> Union[Plugin, None]:
         """
         Get a Plugin dict for a plugin if it has been updated.
@@ -177,7 +799,7 @@ class SpigetAPI:
         :returns: A Plugin dict if there was an update, otherwise None
         """
         plugin_id: int = metadata["plugin_id"]
-        plugin = self.get_plugin_by_id(plugin_id)
+        plugin = self.get_latest_version(plugin_id)
 
         local_version: int = metadata["plugin_version_id"]
         latest_version: int = plugin["version"]["id"]
@@ -189,13 +811,44 @@ class SpigetAPI:
 
     def get_author(self, author_id: int) -> Author:
         """
-        Gets an Author dict from an ID
+        Gets an Author dict from an ID. Authors are remembered, so each one is only requested once.
 
         :param author_id: The ID of an author
         :return: A dict representing the author
         """
-        return self.call_api(f"/authors/{author_id}").json()
+        with self.authors_lock:
+            if author_id in self.authors:
+                self.authors.move_to_end(author_id)
+                return self.authors[author_id]
+
+        author: Author = self.call_api(
+            f"/authors/{author_id}", {"fields": AUTHOR_FIELDS}
+        ).json()
+
+        with self.authors_lock:
+            self.authors[author_id] = author
+            if len(self.authors) > settings.AUTHOR_CACHE_SIZE:
+                self.authors.popitem(last=False)
+
+        return author
+
+    def get_authors(self, author_ids: Iterable[int]) -> Dict[int, Author]:
+        """
+        Get several Author dicts at once, looking up the unknown ones in parallel
+
+        :param author_ids: Author IDs, duplicates are only looked up once
+        :return: A dict of author IDs to Author dicts
+        """
+        unique_ids = list(dict.fromkeys(author_ids))
+        if len(unique_ids) <= 1:
+            return {author_id: self.get_author(author_id) for author_id in unique_ids}
 
+        with ThreadPoolExecutor(
+            max_workers=min(len(unique_ids), self.pool_size)
+        ) as executor:
+            return dict(zip(unique_ids, executor.map(self.get_author, unique_ids)))
+
+    @TIMINGS.timed("changelog")
     def get_latest_update_info(self, plugin: Plugin) -> Update:
         """
         Get information about the latest update of a plugin
@@ -203,25 +856,18 @@ class SpigetAPI:
         :param plugin: A Plugin dict
         :return: An Update dict
         """
-        response = self.call_api(f"/resources/{plugin['id']}/updates/latest")
+        response = self.call_api(
+            f"/resources/{plugin['id']}/updates/latest", {"fields": UPDATE_FIELDS}
+        )
         response.raise_for_status()
 
-        update: Update = response.json()
-        # Decode base64
-        update["description"] = bytes.decode((base64.b64decode(update["description"])))
-        # Convert html to plaintext
-        update["description"] = " ".join(
-            BeautifulSoup(update["description"], "html.parser").stripped_strings
-        )
-        # Remove duplicate newlines and spaces
-        update["description"] = (
-            update["description"]
-            .replace("  ", " ")
-            .replace("\r\n", "\n")
-            .replace("\n\n", "\n")
-        )
+        return self.render_update(response.json())
 
-        # Truncate description to 1500 chars to avoid terminal spam
-        if len(update["description"]) > 1500:
-            update["description"] = update["description"][:1500] + "..."
+    @staticmethod
+    @TIMINGS.timed("render_changelog")
+    def render_update(update: Update) -> Update:
+        """Convert the base64 HTML description of an Update dict to truncated plaintext"""
+        update["description"] = ChangelogRenderer.render_cached(
+            update["id"], update["description"]
+        )
         return update
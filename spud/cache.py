@@ -0,0 +1,222 @@
+"""
+An on-disk cache for API responses.
+
+Classes:
+    CacheEntry    - A cached response
+    ResponseCache - Stores responses on disk with per-endpoint TTLs and LRU eviction
+"""
+from __future__ import annotations
+
+import hashlib
+import io
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Pattern, Tuple, TypedDict, Union
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from . import settings
+
+# Response headers worth keeping, the validators are used for conditional requests
+STORED_HEADERS = ("Content-Type", "ETag", "Last-Modified")
+# Set on fresh responses served without asking the server, so callers can tell they may be out of date
+CACHED_HEADER = "X-Spud-Cached"
+
+
+class CacheEntry(TypedDict):
+    """A response saved in the cache"""
+
+    url: str
+    stored_at: float
+    status: int
+    headers: Dict[str, str]
+    body: bytes
+
+
+class ResponseCache:
+    """
+    Caches API responses as files in a directory.
+
+    Each entry is a line of JSON describing the response, followed by the raw body.
+    The modification time of an entry is bumped whenever it is used,
+    so the least recently used entries are evicted first once the cache grows past max_size.
+    """
+
+    def __init__(
+        self,
+        directory: Union[str, Path] = settings.CACHE_DIRECTORY,
+        max_size: int = settings.CACHE_MAX_SIZE,
+        ttls: Iterable[Tuple[str, float]] = settings.CACHE_TTLS,
+        refresh: bool = False,
+    ) -> None:
+        """
+        :param directory: Where to save the cache, default: settings.CACHE_DIRECTORY
+        :param max_size: Size in bytes to evict entries after, default: settings.CACHE_MAX_SIZE
+        :param ttls: (endpoint regex, seconds) pairs, the first full match decides how long
+            a response stays fresh. Endpoints without a match aren't cached. default: settings.CACHE_TTLS
+        :param refresh: Treat every entry as stale, so each one is revalidated with the server
+        """
+        self.directory = Path(directory)
+        self.max_size = max_size
+        self.ttls: List[Tuple[Pattern[str], float]] = [
+            (re.compile(pattern), ttl) for pattern, ttl in ttls
+        ]
+        self.refresh = refresh
+
+        self.lock = threading.Lock()
+        # Calculated on the first store
+        self.size: Union[int, None] = None
+
+    def ttl(self, endpoint: str) -> float:
+        """Get how many seconds responses from an endpoint stay fresh, 0 if they aren't cached"""
+        for pattern, ttl in self.ttls:
+            if pattern.fullmatch(endpoint):
+                return ttl
+        return 0
+
+    def path(self, url: str) -> Path:
+        """Get the file an URL is cached in"""
+        return self.directory / hashlib.sha256(url.encode("UTF-8")).hexdigest()
+
+    def load(self, url: str) -> Union[CacheEntry, None]:
+        """
+        Load a cached response and mark it as recently used
+
+        :param url: The full URL of the request, including the query string
+        :returns: A CacheEntry, or None if the URL isn't cached
+        """
+        path = self.path(url)
+        try:
+            with open(path, "rb") as file:
+                header = json.loads(file.readline())
+                body = file.read()
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+
+        if header.get("url") != url:
+            return None
+
+        return {
+            "url": url,
+            "stored_at": header["stored_at"],
+            "status": header["status"],
+            "headers": header["headers"],
+            "body": body,
+        }
+
+    def is_fresh(self, entry: CacheEntry, ttl: float) -> bool:
+        """Check if an entry can be used without asking the server"""
+        return not self.refresh and time.time() - entry["stored_at"] < ttl
+
+    def store(self, url: str, response: requests.Response) -> CacheEntry:
+        """Save a response to the cache and return the new entry"""
+        entry: CacheEntry = {
+            "url": url,
+            "stored_at": time.time(),
+            "status": response.status_code,
+            "headers": {
+                header: response.headers[header]
+                for header in STORED_HEADERS
+                if header in response.headers
+            },
+            "body": response.content,
+        }
+        self.write(entry)
+        return entry
+
+    def revalidate(self, entry: CacheEntry) -> CacheEntry:
+        """Mark an entry as fresh again after the server said it hasn't changed"""
+        entry["stored_at"] = time.time()
+        self.write(entry)
+        return entry
+
+    def write(self, entry: CacheEntry) -> None:
+        """Atomically write an entry to disk, evicting old entries if the cache is too big"""
+        header = {key: value for key, value in entry.items() if key != "body"}
+        data = json.dumps(header).encode("UTF-8") + b"\n" + entry["body"]
+
+        path = self.path(entry["url"])
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            old_size = path.stat().st_size if path.exists() else 0
+
+            file_descriptor, tmp_path = tempfile.mkstemp(dir=self.directory)
+            with os.fdopen(file_descriptor, "wb") as file:
+                file.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            # The cache is only an optimisation, never fail a request because of it
+            return
+
+        with self.lock:
+            if self.size is None:
+                self.size = self.disk_usage()
+            else:
+                self.size += len(data) - old_size
+
+            if self.size > self.max_size:
+                self.evict()
+
+    def disk_usage(self) -> int:
+        """Get the size of every entry in bytes"""
+        return sum(path.stat().st_size for path in self.directory.iterdir())
+
+    def evict(self) -> None:
+        """Remove the least recently used entries until the cache is under 3/4 of max_size"""
+        entries = []
+        for path in self.directory.iterdir():
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        entries.sort()
+        size = sum(entry[1] for entry in entries)
+
+        for _, entry_size, path in entries:
+            if size <= self.max_size * 3 // 4:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            size -= entry_size
+
+        self.size = size
+
+    def clear(self) -> None:
+        """Remove every entry"""
+        with self.lock:
+            if self.directory.exists():
+                for path in self.directory.iterdir():
+                    path.unlink()
+            self.size = 0
+
+    @staticmethod
+    def conditional_headers(entry: CacheEntry) -> Dict[str, str]:
+        """Get headers that ask the server to reply 304 if the entry is still valid"""
+        headers = {}
+        if "ETag" in entry["headers"]:
+            headers["If-None-Match"] = entry["headers"]["ETag"]
+        if "Last-Modified" in entry["headers"]:
+            headers["If-Modified-Since"] = entry["headers"]["Last-Modified"]
+        return headers
+
+    @staticmethod
+    def to_response(entry: CacheEntry) -> requests.Response:
+        """Build a Response object from a cached entry"""
+        response = requests.Response()
+        response.status_code = entry["status"]
+        response.headers = CaseInsensitiveDict(entry["headers"])
+        response.url = entry["url"]
+        response.raw = io.BytesIO(entry["body"])
+        response.encoding = "UTF-8"
+        return response
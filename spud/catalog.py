@@ -0,0 +1,221 @@
+"""
+A local copy of Spiget's resource list, so plugins can be searched for without the network.
+
+Classes:
+    ResourceCatalog - Resources and an inverted index of their name tokens, in an SQLite database
+"""
+from __future__ import annotations
+
+import sqlite3
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterable, List, Union
+
+from . import settings
+from .timings import TIMINGS
+from .type import Plugin
+from .utils import WORD, Utils
+
+if TYPE_CHECKING:
+    from .api import SpigetAPI
+
+# Bump when the schema changes, so old catalogs are rebuilt
+CATALOG_VERSION = 1
+
+# Fields requested when paging through resources
+CATALOG_FIELDS = "id,name,tag,downloads,version,author,updateDate"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS resources (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    tag TEXT NOT NULL,
+    downloads INTEGER NOT NULL,
+    version_id INTEGER NOT NULL,
+    author_id INTEGER NOT NULL,
+    updated INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tokens (
+    token TEXT NOT NULL,
+    resource_id INTEGER NOT NULL,
+    PRIMARY KEY (token, resource_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS info (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+class ResourceCatalog:
+    """
+    Every Spiget resource's ID, name, tag, downloads, version and author, with each lowercased word of its name
+    (and each part of title case words, e.g. LuckPerms -> luck, perms) indexed.
+
+    A query matches resources with a name token starting with each of its words.
+    """
+
+    def __init__(self, path: Union[str, Path] = settings.CATALOG_PATH) -> None:
+        """
+        Open a catalog, creating an empty one if it doesn't exist
+
+        :param path: The SQLite database, default: settings.CATALOG_PATH
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Searches come from worker threads, so the connection is shared behind a lock
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+
+        with self.lock, self.connection:
+            if self.get_info("version") not in (None, CATALOG_VERSION):
+                self.connection.executescript(
+                    "DROP TABLE IF EXISTS resources; DROP TABLE IF EXISTS tokens; DROP TABLE IF EXISTS info;"
+                )
+            self.connection.executescript(SCHEMA)
+            self.set_info("version", CATALOG_VERSION)
+
+    def close(self) -> None:
+        """Close the database"""
+        self.connection.close()
+
+    def get_info(self, key: str) -> Union[int, None]:
+        """Get a value saved about the catalog, without locking"""
+        try:
+            row = self.connection.execute(
+                "SELECT value FROM info WHERE key = ?", (key,)
+            ).fetchone()
+        except sqlite3.OperationalError:
+            return None
+        return row[0] if row else None
+
+    def set_info(self, key: str, value: int) -> None:
+        """Save a value about the catalog, without locking"""
+        self.connection.execute(
+            "INSERT OR REPLACE INTO info (key, value) VALUES (?, ?)", (key, value)
+        )
+
+    def __len__(self) -> int:
+        with self.lock:
+            return self.connection.execute("SELECT COUNT(*) FROM resources").fetchone()[
+                0
+            ]
+
+    def add(self, resources: Iterable[dict]) -> int:
+        """
+        Add or replace resources
+
+        :param resources: Resource dicts from Spiget, with at least the fields in CATALOG_FIELDS
+        :returns: How many resources were added
+        """
+        count = 0
+        with self.lock, self.connection:
+            for resource in resources:
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO resources VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        resource["id"],
+                        resource["name"],
+                        resource.get("tag", ""),
+                        resource.get("downloads", 0),
+                        resource["version"]["id"],
+                        resource["author"]["id"],
+                        resource.get("updateDate", 0),
+                    ),
+                )
+                self.connection.execute(
+                    "DELETE FROM tokens WHERE resource_id = ?", (resource["id"],)
+                )
+                self.connection.executemany(
+                    "INSERT INTO tokens VALUES (?, ?)",
+                    (
+                        (token, resource["id"])
+                        for token in Utils.tokenize_name(resource["name"])
+                    ),
+                )
+                count += 1
+
+        return count
+
+    def refresh(self, api: SpigetAPI) -> int:
+        """
+        Add the resources updated since the catalog was last refreshed, paging through them newest first
+
+        :param api: The SpigetAPI to page through resources with
+        :returns: How many resources were added or updated
+        """
+        with self.lock:
+            since = self.get_info("updated") or 0
+
+        count = 0
+        newest = since
+        page = 1
+        while True:
+            resources = api.get_resources_page(
+                page, settings.CATALOG_PAGE_SIZE, CATALOG_FIELDS
+            )
+            # Resources updated at the same time as the last refresh are fetched again, in case they were missed
+            fresh = [
+                resource
+                for resource in resources
+                if resource.get("updateDate", 0) >= since
+            ]
+            count += self.add(fresh)
+            newest = max(
+                [newest, *(resource.get("updateDate", 0) for resource in fresh)]
+            )
+
+            if len(resources) < settings.CATALOG_PAGE_SIZE or len(fresh) < len(
+                resources
+            ):
+                break
+            page += 1
+
+        with self.lock, self.connection:
+            self.set_info("updated", newest)
+
+        return count
+
+    @TIMINGS.timed("catalog_search")
+    def search(self, query: str, limit: int = 10) -> List[Plugin]:
+        """
+        Find resources whose names match a query
+
+        :param query: The search query
+        :param limit: The most resources to return
+        :returns: Plugin dicts like search results, most downloaded first.
+            Their versions are from when the catalog was refreshed, so refresh one before downloading it.
+        """
+        words = [word.lower() for word in WORD.findall(query)]
+        if not words:
+            return []
+
+        # Each word matches tokens in the range [word, word with its last character incremented)
+        conditions = " INTERSECT ".join(
+            ["SELECT resource_id FROM tokens WHERE token >= ? AND token < ?"]
+            * len(words)
+        )
+        params: list = []
+        for word in words:
+            params += [word, word[:-1] + chr(ord(word[-1]) + 1)]
+
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT id, name, tag, downloads, version_id, author_id FROM resources "
+                f"WHERE id IN ({conditions}) ORDER BY downloads DESC, id DESC LIMIT ?",
+                (*params, limit),
+            ).fetchall()
+
+        return [
+            {
+                "id": resource_id,
+                "name": name,
+                "tag": tag,
+                "downloads": downloads,
+                "version": {"id": version_id},
+                "author": {"id": author_id},
+                "file": {},
+            }
+            for resource_id, name, tag, downloads, version_id, author_id in rows
+        ]
@@ -0,0 +1,150 @@
+"""
+Rendering of update changelogs, which Spiget sends as base64 encoded HTML, to plaintext.
+
+Classes:
+    ChangelogRenderer - Incrementally converts HTML to plaintext, stopping once it has enough
+"""
+from __future__ import annotations
+
+import base64
+import codecs
+import re
+import threading
+from collections import OrderedDict
+from html.parser import HTMLParser
+from typing import List
+
+from . import settings
+
+# How many base64 characters are decoded at a time, a multiple of 4 so chunks decode independently
+BASE64_CHUNK_SIZE = 16 * 1024
+
+WHITESPACE = re.compile(r"\s+")
+
+# Tags whose contents aren't text
+SKIPPED_TAGS = ("script", "style")
+
+
+class ChangelogRenderer(HTMLParser):
+    """
+    Converts HTML to plaintext as it is fed, like joining BeautifulSoup's stripped_strings with spaces.
+
+    Runs of whitespace become one newline if they contain a newline, otherwise one space.
+    Once more than `limit` characters have been rendered, the rest of the input is ignored.
+    """
+
+    # Rendered changelogs by update ID, least recently used first
+    rendered: OrderedDict[int, str] = OrderedDict()
+    rendered_lock = threading.Lock()
+
+    def __init__(self, limit: int = settings.CHANGELOG_LENGTH) -> None:
+        """
+        :param limit: How many characters to render before truncating, default: settings.CHANGELOG_LENGTH
+        """
+        super().__init__(convert_charrefs=True)
+        self.limit = limit
+        self.parts: List[str] = []
+        self.length = 0
+        self.skip_depth = 0
+        # The text node being parsed, which can arrive in several pieces when the HTML is fed in chunks
+        self.pending: List[str] = []
+
+    @property
+    def done(self) -> bool:
+        """Whether enough text has been rendered to truncate it"""
+        if self.length > self.limit:
+            return True
+        # Only the length matters, and every run of whitespace collapses to one character
+        pending = WHITESPACE.sub(" ", "".join(self.pending).strip())
+        if pending and self.parts:
+            pending = " " + pending
+        return self.length + len(pending) > self.limit
+
+    def handle_starttag(self, tag, attrs) -> None:
+        self.flush()
+        if tag in SKIPPED_TAGS:
+            self.skip_depth += 1
+
+    def handle_endtag(self, tag) -> None:
+        self.flush()
+        if tag in SKIPPED_TAGS and self.skip_depth:
+            self.skip_depth -= 1
+
+    def handle_data(self, data) -> None:
+        if self.length > self.limit or self.skip_depth:
+            return
+
+        self.pending.append(data)
+
+    def flush(self) -> None:
+        """Render the text node parsed so far, once all of it has been fed"""
+        text = "".join(self.pending).strip()
+        self.pending.clear()
+        if not text:
+            return
+
+        text = WHITESPACE.sub(
+            lambda match: "\n" if "\n" in match[0] or "\r" in match[0] else " ", text
+        )
+        if self.parts:
+            text = " " + text
+
+        self.parts.append(text)
+        self.length += len(text)
+
+    def text(self) -> str:
+        """Get the rendered plaintext, truncated to the limit with '...' if it was too long"""
+        self.flush()
+        text = "".join(self.parts)
+        if len(text) > self.limit:
+            return text[: self.limit] + "..."
+        return text
+
+    @classmethod
+    def render(cls, description: str, limit: int = settings.CHANGELOG_LENGTH) -> str:
+        """
+        Render a base64 encoded HTML changelog, decoding and parsing only as much as is displayed
+
+        :param description: The base64 encoded HTML
+        :param limit: How many characters to render before truncating, default: settings.CHANGELOG_LENGTH
+        :returns: The plaintext changelog
+        """
+        # Chunks need to be aligned to 4 characters, which line breaks would throw off
+        if WHITESPACE.search(description):
+            description = "".join(description.split())
+
+        renderer = cls(limit)
+        decoder = codecs.getincrementaldecoder("UTF-8")(errors="replace")
+
+        for start in range(0, len(description), BASE64_CHUNK_SIZE):
+            chunk = base64.b64decode(description[start : start + BASE64_CHUNK_SIZE])
+            renderer.feed(decoder.decode(chunk))
+            if renderer.done:
+                return renderer.text()
+
+        renderer.feed(decoder.decode(b"", final=True))
+        renderer.close()
+        return renderer.text()
+
+    @classmethod
+    def render_cached(cls, update_id: int, description: str) -> str:
+        """
+        Render a changelog, reusing the result for the same update
+
+        :param update_id: The ID of the update the changelog is for
+        :param description: The base64 encoded HTML
+        :returns: The plaintext changelog
+        """
+        with cls.rendered_lock:
+            if update_id in cls.rendered:
+                cls.rendered.move_to_end(update_id)
+                return cls.rendered[update_id]
+
+        text = cls.render(description)
+
+        with cls.rendered_lock:
+            cls.rendered[update_id] = text
+            if len(cls.rendered) > settings.CHANGELOG_CACHE_SIZE:
+                cls.rendered.popitem(last=False)
+
+        return text
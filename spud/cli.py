@@ -7,75 +7,260 @@ classes:
 """
 from __future__ import annotations
 
+import glob
+import json
+import signal
 import sys
-from argparse import ArgumentParser, Namespace
+from argparse import ArgumentParser, ArgumentTypeError, Namespace
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
 import os
 from pathlib import Path
-from typing import Collection, Union
+from typing import Collection, Dict, List, Tuple, Union
 
-from . import api
+from . import settings
+from .index import MetadataIndex
+from .lock import Lockfile
+from .timings import TIMINGS
 from .utils import Utils, Color
 from .type import StatusDict, Plugin, Metadata, Update
 from .settings import VERSION
 
+# The metadata of a jar, its Plugin dict if an update is available, and why it couldn't be checked if it failed
+UpdateCheck = Tuple[Union[Metadata, None], Union[Plugin, None], Union[str, None]]
+# An UpdateCheck, and the latest update of the plugin if it has one
+PrefetchedUpdate = Tuple[UpdateCheck, Union[Update, None]]
+# Whether a plugin was installed or updated, and the messages to print about it
+ActionResult = Tuple[bool, List[Tuple[str, Color]]]
+
 
 class CLI:
     """Represents the spud CLI. Handles program arguments and allows the user to interact with the API"""
 
-    def __init__(self, api_class=api.SpigetAPI) -> None:
-        """Initialise the cli application"""
-        self.api = api_class()
+    def __init__(self, api_class=None) -> None:
+        """
+        Initialise the cli application
 
+        :param api_class: The API client class to use, default: api.SpigetAPI
+        """
         self.args: Namespace = self.parse_args()
 
-        os.chdir(self.args.directory)
+        # Imported after parsing arguments, so --help and --version don't wait for requests to import
+        # pylint: disable=import-outside-toplevel
+        from .api import SpigetAPI
+        from .cache import ResponseCache
+        from .catalog import ResourceCatalog
+        from .ratelimit import RateLimiter
+        from .store import JarStore
+
+        if api_class is None:
+            api_class = SpigetAPI
+
+        TIMINGS.reset(enabled=self.args.timings or bool(self.args.timings_json))
+
+        cache = None
+        if not self.args.no_cache:
+            cache = ResponseCache(refresh=self.args.refresh)
+
+        store = None
+        if self.args.store:
+            store = JarStore(self.args.store)
+
+        # The catalog is only used once it has been created with the catalog action
+        catalog = None
+        if not self.args.no_catalog and (
+            self.args.action == "catalog" or settings.CATALOG_PATH.exists()
+        ):
+            catalog = ResourceCatalog()
+
+        # Every worker thread needs its own pooled connection
+        self.api = api_class(
+            pool_size=max(settings.POOL_SIZE, self.args.jobs),
+            cache=cache,
+            store=store,
+            rate_limiter=RateLimiter(self.args.rate_limit),
+            catalog=catalog,
+        )
 
-        if self.args.action == "install":
+        directories = self.expand_directories(self.args.directories)
+        if not directories:
+            Utils.format_text("No plugin directories matched", Color.ERROR)
+            return
+
+        if len(directories) == 1:
+            os.chdir(directories[0])
+        self.index = MetadataIndex()
+        # The jars installed by the install action
+        self.installed_jars: List[str] = []
+
+        if len(directories) > 1 and self.args.action == "update":
+            self.update_fleet(directories, self.args.plugins)
+        elif len(directories) > 1 and self.args.action in (
+            "install",
+            "lock",
+            "sync",
+            "watch",
+            "adopt",
+        ):
+            Utils.format_text(
+                f"{self.args.action} only works on one directory at a time",
+                Color.ERROR,
+            )
+        elif self.args.action == "install":
             self.install(self.args.plugins)
         elif self.args.action == "update":
             self.update(self.args.plugins)
+        elif self.args.action == "lock":
+            self.lock()
+        elif self.args.action == "sync":
+            self.sync()
+        elif self.args.action == "gc":
+            self.collect_garbage()
+        elif self.args.action == "catalog":
+            self.refresh_catalog()
+        elif self.args.action == "watch":
+            self.watch()
+        elif self.args.action == "adopt":
+            self.adopt()
         else:
             Utils.format_text(f"Action {self.args.action} does not exist", Color.ERROR)
 
+        self.report_timings()
+
+    def report_timings(self) -> None:
+        """Print the timings of the run, and/or write them as JSON, if the user asked for them"""
+        if self.args.timings:
+            Utils.separator()
+            for line in TIMINGS.format_report():
+                Utils.format_text(line, Color.DIMMED)
+
+        if self.args.timings_json:
+            with open(self.args.timings_json, "w", encoding="UTF-8") as file:
+                json.dump(TIMINGS.report(), file, indent=2)
+
     def install(self, plugins: Collection[str]) -> None:
         """
         Download the jars for a list of plugins and save them as files.
 
         :param plugins: A list of plugin names or jar filenames
         """
-        for plugin_name in plugins:
-            plugin_name = Utils.get_plugin_name_from_jar(plugin_name)
+        # Each jar is only installed once, however many times it was asked for
+        jar_names: Dict[str, str] = {}
+        for name in plugins:
+            plugin_name = Utils.get_plugin_name_from_jar(name)
+            jar_names.setdefault(Utils.create_jar_name(plugin_name), plugin_name)
+        plugin_names = list(jar_names.values())
+
+        with ThreadPoolExecutor(max_workers=self.args.jobs) as executor:
+            if self.args.noninteractive:
+                # Later plugins are searched for while earlier ones download
+                results = executor.map(self.search_install, plugin_names)
+            else:
+                # Searches run ahead in the pool while the user chooses
+                searches = executor.map(self.search_plugins, plugin_names)
+                results = map(self.prompt_install, plugin_names, searches)
+
+            for _, messages in results:
+                for text, color in messages:
+                    Utils.format_text(text, color)
+
+        if self.installed_jars and not self.args.no_deps:
+            self.install_dependencies(self.installed_jars)
+
+    def install_dependencies(self, filenames: List[str]) -> None:
+        """
+        Install the plugins that some jars depend on and that aren't installed, and theirs in turn
+
+        :param filenames: The jar filenames
+        """
+        # pylint: disable=import-outside-toplevel
+        from .dependencies import DependencyResolver
+
+        resolver = DependencyResolver(self.api, jobs=self.args.jobs)
+        for text, color in resolver.resolve(filenames):
+            Utils.format_text(text, color)
+
+    def search_plugins(self, plugin_name: str) -> list[Plugin]:
+        """Search for a plugin, with author names for the user to choose from"""
+        with TIMINGS.plugin(plugin_name):
+            return self.api.search_plugins(plugin_name)
+
+    def search_install(self, plugin_name: str) -> ActionResult:
+        """
+        Search for a plugin and install the best match. Safe to call from worker threads, as nothing is printed.
 
-            plugin_list = self.api.search_plugins(plugin_name)
+        :param plugin_name: The name to search for
+        :returns: Whether the plugin was installed, and the messages to print
+        """
+        with TIMINGS.plugin(plugin_name):
+            # Author names are only shown when the user chooses a plugin
+            plugin_list = self.api.search_plugins(plugin_name, resolve_authors=False)
 
             if not plugin_list:
-                Utils.format_text(
-                    f"No plugin with name {plugin_name} found.", Color.ERROR
-                )
-                continue
+                return False, [
+                    (f"No plugin with name {plugin_name} found.", Color.ERROR)
+                ]
 
-            Utils.format_text(f"Query: {plugin_name}", Color.SUCCESS)
+            installed, messages = self.install_plugin(plugin_list[0])
 
-            if self.args.noninteractive:
-                plugin = plugin_list[0]
-            else:
-                plugin = self.get_plugin_choice(plugin_list)
+        return installed, [(f"Query: {plugin_name}", Color.SUCCESS), *messages]
 
-            if not plugin:
-                Utils.format_text("Skipping Install!", Color.ERROR)
-                continue
+    def prompt_install(
+        self, plugin_name: str, plugin_list: list[Plugin]
+    ) -> ActionResult:
+        """
+        Ask the user which search result to install, then install it
+
+        :param plugin_name: The name that was searched for
+        :param plugin_list: The search results
+        :returns: Whether the plugin was installed, and the messages to print
+        """
+        if not plugin_list:
+            return False, [(f"No plugin with name {plugin_name} found.", Color.ERROR)]
 
-            Utils.format_text(f"Installing {plugin['name']}", Color.STATUS)
+        Utils.format_text(f"Query: {plugin_name}", Color.SUCCESS)
 
-            result: StatusDict = self.api.download_plugin(plugin)
+        plugin = self.get_plugin_choice(plugin_list)
+        if not plugin:
+            return False, [("Skipping Install!", Color.ERROR)]
 
-            if result["status"]:
-                Utils.format_text(
-                    f"{plugin['name']} was installed successfully",
-                    Color.SUCCESS,
+        with TIMINGS.plugin(plugin_name):
+            return self.install_plugin(plugin)
+
+    def install_plugin(self, plugin: Plugin) -> ActionResult:
+        """
+        Download a plugin's jar. Safe to call from worker threads, as nothing is printed.
+
+        :param plugin: The Plugin dict to install
+        :returns: Whether the plugin was installed, and the messages to print
+        """
+        import requests  # pylint: disable=import-outside-toplevel
+
+        messages = [(f"Installing {plugin['name']}", Color.STATUS)]
+
+        try:
+            plugin = self.api.refresh_plugin(plugin)
+        except requests.RequestException as error:
+            messages.append(
+                (
+                    f"Couldn't get the latest version of {plugin['name']}: {error}",
+                    Color.WARNING,
                 )
-            else:
-                Utils.format_text(result["message"], Color.WARNING)
+            )
+            return False, messages
+
+        result: StatusDict = self.api.download_plugin(plugin)
+
+        if result["status"]:
+            # Appending is atomic, so workers can share the list
+            self.installed_jars.append(Utils.create_jar_name(plugin["name"]))
+            messages.append(
+                (f"{plugin['name']} was installed successfully", Color.SUCCESS)
+            )
+        else:
+            messages.append((result["message"], Color.WARNING))
+
+        return result["status"], messages
 
     def update(self, plugins: Collection[str]) -> None:
         """
@@ -86,67 +271,363 @@ class CLI:
         if not plugins:
             file_list = os.listdir()
             plugins = [i for i in file_list if i.endswith(".jar")]
+            self.index.prune(plugins)
             Utils.format_text(
                 f"Detected {len(plugins)} plugins in {os.getcwd()}", Color.STATUS
             )
 
+        filenames = [
+            plugin_name if ".jar" in plugin_name else Utils.create_jar_name(plugin_name)
+            for plugin_name in plugins
+        ]
+
+        update_count = 0
+        with ThreadPoolExecutor(max_workers=self.args.jobs) as executor:
+            if self.args.noninteractive:
+                # Checks run ahead in the pool, but their results come back in input order
+                checks = executor.map(self.check_update, filenames)
+                results = executor.map(self.download_update, filenames, checks)
+
+                for updated, messages in results:
+                    for text, color in messages:
+                        Utils.format_text(text, color)
+                    update_count += updated
+            else:
+                update_count = self.prompt_updates(executor, filenames)
+
+        self.index.save()
+
+        Utils.separator()
+        Utils.format_text(
+            f"{update_count} updated, {len(plugins) - update_count} left unchanged",
+            Color.STATUS,
+        )
+
+    def prompt_updates(self, executor: ThreadPoolExecutor, filenames: List[str]) -> int:
+        """
+        Ask the user about the update of each plugin in turn.
+
+        The next settings.PREFETCH_DEPTH plugins are checked and their changelogs fetched in the executor
+        while the user reads one. If input ends, the remaining plugins are left unchanged.
+
+        :param executor: The executor to prefetch in
+        :param filenames: The jar filenames
+        :returns: How many plugins were updated
+        """
         update_count = 0
-        for plugin_name in plugins:
-            filename = plugin_name
-            if ".jar" not in filename:
-                filename = Utils.create_jar_name(plugin_name)
+        with closing(
+            Utils.prefetch(executor, self.prefetch_update, filenames)
+        ) as prefetched:
+            try:
+                for filename, (check, update) in zip(filenames, prefetched):
+                    updated, messages = self.prompt_update(filename, check, update)
+                    for text, color in messages:
+                        Utils.format_text(text, color)
+                    update_count += updated
+            except EOFError:
+                Utils.format_text(
+                    "Input ended, not updating the remaining plugins", Color.WARNING
+                )
 
-            metadata: Union[Metadata, None] = Utils.load_metadata_file(filename)
+        return update_count
 
+    def check_update(self, filename: str) -> UpdateCheck:
+        """
+        Load the metadata of a jar and check whether it has an update
+
+        :param filename: The jar filename
+        :returns: The Metadata dict (None if it couldn't be loaded),
+            the updated Plugin dict (None if there is no update), and the error if the check failed
+        """
+        import requests  # pylint: disable=import-outside-toplevel
+
+        with TIMINGS.plugin(filename):
+            metadata: Union[Metadata, None] = self.index.load_metadata(filename)
             if not metadata:
-                Utils.format_text(
+                return None, None, None
+
+            try:
+                return metadata, self.api.get_plugin_info_if_update(metadata), None
+            except requests.RequestException as error:
+                # e.g. the resource was deleted from Spiget
+                return metadata, None, f"Couldn't check {filename} for updates: {error}"
+
+    def prefetch_update(self, filename: str) -> PrefetchedUpdate:
+        """
+        Check whether a jar has an update, and get the changelog if it does
+
+        :param filename: The jar filename
+        :returns: The result of check_update, and the Update dict (None if there is no update)
+        """
+        import requests  # pylint: disable=import-outside-toplevel
+
+        check = self.check_update(filename)
+        metadata, plugin, _ = check
+        if not metadata or not plugin:
+            return check, None
+
+        with TIMINGS.plugin(filename):
+            try:
+                return check, self.api.get_latest_update_info(plugin)
+            except requests.RequestException as error:
+                return (
+                    metadata,
+                    None,
+                    f"Couldn't get the changelog of {plugin['name']}: {error}",
+                ), None
+
+    def download_update(self, filename: str, check: UpdateCheck) -> ActionResult:
+        """
+        Download a plugin's update if it has one. Safe to call from worker threads, as nothing is printed.
+
+        :param filename: The jar filename
+        :param check: The result of check_update for the jar
+        :returns: Whether the plugin was updated, and the messages to print
+        """
+        metadata, plugin, error = check
+
+        if error:
+            return False, [(error, Color.WARNING)]
+
+        if not metadata:
+            return False, [
+                (
                     f"Couldn't load metadata for {filename}. Try reinstalling with spud first",
                     Color.WARNING,
                 )
-                continue
+            ]
 
-            plugin: Union[Plugin, None] = self.api.get_plugin_info_if_update(metadata)
-            if plugin is None:
-                Utils.format_text(
-                    f"Plugin {metadata['search_name']} already up to date", Color.STATUS
-                )
-                continue
+        if plugin is None:
+            return False, [
+                (f"Plugin {metadata['search_name']} already up to date", Color.STATUS)
+            ]
 
-            # If running in interactive mode
-            if not self.args.noninteractive:
-                update: Update = self.api.get_latest_update_info(plugin)
-                changelog = update["description"]
-                Utils.separator()
-                Utils.format_text(f"Changelog for {plugin['name']}:", Color.STATUS)
-                Utils.format_text(changelog, Color.STATUS)
-                Utils.separator()
+        # Download the latest version of the plugin
+        with TIMINGS.plugin(filename):
+            result: StatusDict = self.api.download_plugin(plugin, filename, metadata)
 
-                # If user doesn't want to update
-                if not Utils.prompt_bool(f"Would you like to update {plugin['name']}?"):
-                    Utils.format_text(f"Not updating {plugin['name']}", Color.WARNING)
-                    continue
+        # If the download succeeded
+        color = Color.SUCCESS if result["status"] else Color.WARNING
 
-            # By this point we can ensure that:
-            #  1. The plugin has an update available
-            #  2. The user wants to update
+        messages = [(result["message"], color)] if result["message"] else []
+        return result["status"], messages
 
-            # Download the latest version of the plugin
-            result: StatusDict = self.api.download_plugin(plugin, filename)
+    def prompt_update(
+        self, filename: str, check: UpdateCheck, update: Union[Update, None] = None
+    ) -> ActionResult:
+        """
+        Show the changelog of a plugin's update and ask the user before downloading it
 
-            color = Color.WARNING
-            # If the download succeeded
-            if result["status"]:
-                update_count += 1
-                color = Color.SUCCESS
+        :param filename: The jar filename
+        :param check: The result of check_update for the jar
+        :param update: The plugin's latest Update dict if it was prefetched, default: get it now
+        :returns: Whether the plugin was updated, and the messages to print
+        :raises EOFError: If input has ended
+        """
+        metadata, plugin, _ = check
+
+        if metadata and plugin:
+            if update is None:
+                with TIMINGS.plugin(filename):
+                    update = self.api.get_latest_update_info(plugin)
+            changelog = update["description"]
+            Utils.separator()
+            Utils.format_text(f"Changelog for {plugin['name']}:", Color.STATUS)
+            Utils.format_text(changelog, Color.STATUS)
+            Utils.separator()
+
+            # If user doesn't want to update
+            if not Utils.prompt_bool(
+                f"Would you like to update {plugin['name']}?", raise_eof=True
+            ):
+                return False, [(f"Not updating {plugin['name']}", Color.WARNING)]
+
+        return self.download_update(filename, check)
+
+    def update_fleet(
+        self, directories: Collection[Path], plugins: Collection[str]
+    ) -> None:
+        """
+        Update the plugins of several directories at once, looking up and downloading each plugin once
 
-            if message := result["message"]:
-                Utils.format_text(message, color)
+        :param directories: The plugin directories
+        :param plugins: A list of plugin names or jar filenames to update in every directory,
+            if empty every jar is updated
+        """
+        # pylint: disable=import-outside-toplevel
+        from .fleet import FleetUpdater
+
+        updater = FleetUpdater(
+            self.api,
+            directories,
+            jobs=self.args.jobs,
+            noninteractive=self.args.noninteractive,
+        )
+        updater.update(plugins)
+
+    def lock(self) -> None:
+        """Write a lockfile of the versions of every jar in the directory"""
+        filenames = sorted(name for name in os.listdir() if name.endswith(".jar"))
+        self.index.prune(filenames)
+
+        lockfile = Lockfile()
+        with ThreadPoolExecutor(max_workers=self.args.jobs) as executor:
+            for filename, metadata in zip(
+                filenames, executor.map(self.index.load_metadata, filenames)
+            ):
+                if metadata:
+                    lockfile.plugins[filename] = metadata
+                else:
+                    Utils.format_text(
+                        f"Couldn't load metadata for {filename}, so it isn't locked. "
+                        "Try reinstalling with spud first",
+                        Color.WARNING,
+                    )
+
+        self.index.save()
+        lockfile.save()
+        Utils.format_text(
+            f"Locked {len(lockfile.plugins)} plugins in {lockfile.path}", Color.SUCCESS
+        )
+
+    def sync(self) -> None:
+        """Download exactly the versions in the lockfile, without searching for anything"""
+        lockfile = Lockfile()
+        if not lockfile.load():
+            Utils.format_text(
+                f"Couldn't load {lockfile.path}, create it with spud lock", Color.ERROR
+            )
+            return
+
+        synced_count = 0
+        failed_count = 0
+        with ThreadPoolExecutor(max_workers=self.args.jobs) as executor:
+            results = executor.map(
+                self.sync_plugin, lockfile.plugins.keys(), lockfile.plugins.values()
+            )
+            for synced, messages in results:
+                for text, color in messages:
+                    Utils.format_text(text, color)
+                synced_count += synced
+                # Jars that already match have nothing to say
+                failed_count += not synced and bool(messages)
+
+        self.index.save()
 
         Utils.separator()
+        matched_count = len(lockfile.plugins) - synced_count - failed_count
         Utils.format_text(
-            f"{update_count} updated, {len(plugins) - update_count} left unchanged",
+            f"{synced_count} downloaded, {failed_count} failed, "
+            f"{matched_count} already matched the lockfile",
+            Color.STATUS,
+        )
+
+    def sync_plugin(self, filename: str, locked: Metadata) -> ActionResult:
+        """
+        Download the locked version of a jar, unless it is already that version.
+        Safe to call from worker threads, as nothing is printed.
+
+        :param filename: The jar filename
+        :param locked: The jar's Metadata dict in the lockfile
+        :returns: Whether the jar was downloaded, and the messages to print
+        """
+        with TIMINGS.plugin(filename):
+            metadata = self.index.load_metadata(filename)
+            if (
+                metadata
+                and metadata["plugin_id"] == locked["plugin_id"]
+                and metadata["plugin_version_id"] == locked["plugin_version_id"]
+            ):
+                return False, []
+
+            result: StatusDict = self.api.download_plugin(
+                Lockfile.locked_plugin(locked), filename, metadata, locked=locked
+            )
+
+        color = Color.SUCCESS if result["status"] else Color.WARNING
+        return result["status"], [(result["message"], color)]
+
+    def refresh_catalog(self) -> None:
+        """Download the resources updated since the catalog was last refreshed"""
+        if self.api.catalog is None:
+            Utils.format_text("The catalog is disabled by --no-catalog", Color.ERROR)
+            return
+
+        Utils.format_text("Refreshing the resource catalog", Color.STATUS)
+        count = self.api.catalog.refresh(self.api)
+        Utils.format_text(
+            f"Catalogued {count} new or updated resources, "
+            f"{len(self.api.catalog)} in total",
+            Color.SUCCESS,
+        )
+
+    def adopt(self) -> None:
+        """Identify the jars that weren't installed with spud from their plugin.yml, so they can be updated"""
+        # pylint: disable=import-outside-toplevel
+        from .adopt import Adopter
+
+        adopter = Adopter(self.api, jobs=self.args.jobs, index=self.index)
+        adopted, messages = adopter.adopt()
+        for text, color in messages:
+            Utils.format_text(text, color)
+
+        Utils.separator()
+        Utils.format_text(f"Adopted {adopted} plugins", Color.STATUS)
+
+    def watch(self) -> None:
+        """
+        Stage updates as they are published until interrupted, checking every --interval seconds.
+        SIGUSR1 makes it check straight away.
+        """
+        # pylint: disable=import-outside-toplevel
+        from .watch import Watcher
+
+        watcher = Watcher(
+            self.api,
+            interval=self.args.interval,
+            jitter=self.args.jitter,
+            jobs=self.args.jobs,
+        )
+
+        handlers = {
+            signal.SIGINT: lambda *_: watcher.stop(),
+            signal.SIGTERM: lambda *_: watcher.stop(),
+        }
+        hint = ""
+        # Not available on Windows
+        if hasattr(signal, "SIGUSR1"):
+            handlers[signal.SIGUSR1] = lambda *_: watcher.check_now()
+            hint = f", kill -USR1 {os.getpid()} to check now"
+        previous = {
+            signum: signal.signal(signum, handler)
+            for signum, handler in handlers.items()
+        }
+
+        Utils.format_text(
+            f"Watching {os.getcwd()} for updates every {self.args.interval:g} seconds{hint}",
             Color.STATUS,
         )
+        try:
+            watcher.run()
+        finally:
+            for signum, handler in previous.items():
+                signal.signal(signum, handler)
+
+        Utils.format_text("Stopped watching", Color.STATUS)
+
+    def collect_garbage(self) -> None:
+        """Remove the jars in the jar store that no plugin directory uses any more"""
+        if self.api.store is None:
+            Utils.format_text(
+                "gc needs a jar store, pass one with --store", Color.ERROR
+            )
+            return
+
+        removed, freed = self.api.store.collect_garbage()
+        Utils.format_text(
+            f"Removed {removed} unused jars from the jar store, freeing {freed} bytes",
+            Color.SUCCESS,
+        )
 
     @staticmethod
     def parse_args(argv=None) -> Namespace:
@@ -165,7 +646,11 @@ class CLI:
             epilog="Licensed under GPLv3 (https://www.gnu.org/licenses/gpl-3.0.en.html). "
             "Source available at https://github.com/exciteabletom/spud",
         )
-        parser.add_argument("action", help="install or update", type=str)
+        parser.add_argument(
+            "action",
+            help="install, update, adopt, lock, sync, watch, catalog or gc",
+            type=str,
+        )
         parser.add_argument(
             "plugins",
             metavar="name",
@@ -183,16 +668,166 @@ class CLI:
         parser.add_argument(
             "-d",
             "--directory",
-            dest="directory",
-            help="path to plugins directory, defaults to the working directory",
+            dest="directories",
+            help="path to a plugins directory, or a glob of them, defaults to the working directory. "
+            "Repeat to update several directories at once",
             type=Path,
-            default=".",
+            action="append",
+            default=None,
+        )
+        parser.add_argument(
+            "-j",
+            "--jobs",
+            dest="jobs",
+            help="how many plugins to search for, check and download in parallel, default: 1",
+            type=CLI.positive_int,
+            default=1,
+        )
+        parser.add_argument(
+            "--rate-limit",
+            dest="rate_limit",
+            metavar="RPS",
+            help=f"the most API requests to make per second, 0 for no limit, default: {settings.RATE_LIMIT:g}",
+            type=CLI.non_negative_float,
+            default=settings.RATE_LIMIT,
+        )
+        parser.add_argument(
+            "--no-deps",
+            dest="no_deps",
+            help="don't install the plugins that installed plugins depend on",
+            action="store_true",
+            default=False,
+        )
+        parser.add_argument(
+            "--interval",
+            dest="interval",
+            metavar="SECONDS",
+            help=f"how often watch checks for updates, at least {settings.WATCH_MIN_INTERVAL}, "
+            f"default: {settings.WATCH_INTERVAL}",
+            type=CLI.watch_interval,
+            default=settings.WATCH_INTERVAL,
+        )
+        parser.add_argument(
+            "--jitter",
+            dest="jitter",
+            metavar="FRACTION",
+            help="the fraction of the interval that watch randomly moves checks by, "
+            f"default: {settings.WATCH_JITTER:g}",
+            type=CLI.non_negative_float,
+            default=settings.WATCH_JITTER,
+        )
+        parser.add_argument(
+            "--no-cache",
+            dest="no_cache",
+            help="don't read or write the API response cache",
+            action="store_true",
+            default=False,
+        )
+        parser.add_argument(
+            "--refresh",
+            dest="refresh",
+            help="check every cached API response with the server before using it",
+            action="store_true",
+            default=False,
+        )
+        parser.add_argument(
+            "--no-catalog",
+            dest="no_catalog",
+            help="search with the API even if there is an offline resource catalog",
+            action="store_true",
+            default=False,
+        )
+        parser.add_argument(
+            "--store",
+            dest="store",
+            metavar="DIR",
+            help="share downloaded jars with other plugin directories through a jar store in DIR",
+            type=Path,
+            default=None,
+        )
+        parser.add_argument(
+            "--timings",
+            dest="timings",
+            help="print where the time of the run went",
+            action="store_true",
+            default=False,
+        )
+        parser.add_argument(
+            "--timings-json",
+            dest="timings_json",
+            metavar="FILE",
+            help="write where the time of the run went to FILE as JSON",
+            type=Path,
+            default=None,
         )
         parser.add_argument(
             "-v", "--version", action="version", version=f"%(prog)s {VERSION}"
         )
         return parser.parse_args(argv)
 
+    @staticmethod
+    def expand_directories(patterns: Union[List[Path], None]) -> List[Path]:
+        """
+        Expand the globs of -d arguments into plugin directories
+
+        :param patterns: The -d arguments, or None if there weren't any
+        :returns: The matching directories without duplicates, or the working directory if there were no arguments
+        """
+        if not patterns:
+            return [Path(".")]
+
+        directories: List[Path] = []
+        for pattern in patterns:
+            pattern_str = os.path.expanduser(pattern)
+            if any(char in pattern_str for char in "*?["):
+                directories.extend(
+                    Path(path)
+                    for path in sorted(glob.glob(pattern_str))
+                    if os.path.isdir(path)
+                )
+            else:
+                directories.append(Path(pattern_str))
+
+        return list(dict.fromkeys(directories))
+
+    @staticmethod
+    def positive_int(text: str) -> int:
+        """Argument type for integers greater than zero"""
+        try:
+            value = int(text)
+        except ValueError as error:
+            raise ArgumentTypeError(f"invalid int value: '{text}'") from error
+
+        if value < 1:
+            raise ArgumentTypeError(f"must be at least 1, not {value}")
+
+        return value
+
+    @staticmethod
+    def non_negative_float(text: str) -> float:
+        """Argument type for numbers of at least zero"""
+        try:
+            value = float(text)
+        except ValueError as error:
+            raise ArgumentTypeError(f"invalid float value: '{text}'") from error
+
+        if not value >= 0:
+            raise ArgumentTypeError(f"must be at least 0, not {value}")
+
+        return value
+
+    @staticmethod
+    def watch_interval(text: str) -> float:
+        """Argument type for watch intervals, which are long enough not to poll the API nonstop"""
+        value = CLI.non_negative_float(text)
+
+        if value < settings.WATCH_MIN_INTERVAL:
+            raise ArgumentTypeError(
+                f"must be at least {settings.WATCH_MIN_INTERVAL}, not {value:g}"
+            )
+
+        return value
+
     @staticmethod
     def get_plugin_choice(plugin_list: list[Plugin]) -> Union[Plugin, None]:
         """
@@ -0,0 +1,189 @@
+"""
+Resolution of the plugins that plugins depend on, from the plugin.yml files in their jars.
+
+Classes:
+    DependencyResolver - Installs the missing hard dependencies of jars, downloading independent branches in parallel
+"""
+from __future__ import annotations
+
+import os
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Dict, Iterable, List, Set, Tuple, Union
+
+import requests
+
+from .api import SpigetAPI
+from .type import Plugin, PluginDescription
+from .utils import Color, Utils
+
+# The plugin.yml of a downloaded dependency (None if it couldn't be installed), and the messages to print about it
+DependencyResult = Tuple[Union[PluginDescription, None], List[Tuple[str, Color]]]
+
+
+class DependencyResolver:
+    """
+    Installs the missing hard dependencies (`depend` in plugin.yml) of jars in a plugin directory,
+    then the missing dependencies of those, and so on.
+
+    The dependency graph is discovered as jars are downloaded. As soon as a jar's plugin.yml is read,
+    its missing dependencies are searched for and downloaded alongside every other branch of the graph.
+    Each dependency is only scheduled once, so cycles don't loop forever; they are reported once the graph
+    is complete, as the server refuses to load plugins that depend on each other.
+    """
+
+    def __init__(
+        self, api: SpigetAPI, directory: Union[str, Path] = ".", jobs: int = 1
+    ) -> None:
+        """
+        :param api: The SpigetAPI to search for and download dependencies with
+        :param directory: The plugin directory, default: the working directory
+        :param jobs: How many dependencies to search for and download in parallel, default: 1
+        """
+        self.api = api
+        self.directory = Path(directory)
+        self.jobs = jobs
+
+    def resolve(self, filenames: Iterable[str]) -> List[Tuple[str, Color]]:
+        """
+        Install the missing dependencies of some jars, and of their dependencies
+
+        :param filenames: The jar filenames, in the plugin directory
+        :returns: The messages to print
+        """
+        messages: List[Tuple[str, Color]] = []
+        # Plugin names to the names of the plugins they depend on
+        graph: Dict[str, List[str]] = {}
+        pending: Dict[Future, str] = {}
+
+        with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+            jars = sorted(
+                name for name in os.listdir(self.directory) if name.endswith(".jar")
+            )
+            descriptions = dict(
+                zip(
+                    jars,
+                    executor.map(
+                        Utils.load_plugin_description,
+                        (str(self.directory / jar) for jar in jars),
+                    ),
+                )
+            )
+
+            # Dependencies provided by a jar in the directory, or already scheduled
+            scheduled: Set[str] = set()
+            for description in descriptions.values():
+                if description:
+                    scheduled.add(description["name"])
+                    scheduled.update(description["provides"])
+
+            def schedule(description: PluginDescription) -> None:
+                graph[description["name"]] = description["depend"]
+                for dependency in description["depend"]:
+                    if dependency not in scheduled:
+                        scheduled.add(dependency)
+                        future = executor.submit(
+                            self.install_dependency, dependency, description["name"]
+                        )
+                        pending[future] = dependency
+
+            for filename in filenames:
+                description = descriptions.get(filename)
+                if description:
+                    schedule(description)
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    del pending[future]
+                    description, dependency_messages = future.result()
+                    messages.extend(dependency_messages)
+                    if description:
+                        schedule(description)
+
+        for cycle in self.find_cycles(graph):
+            messages.append(
+                (
+                    f"Circular dependency: {' -> '.join(cycle)}. The server won't load these plugins",
+                    Color.WARNING,
+                )
+            )
+
+        return messages
+
+    def install_dependency(self, name: str, dependent: str) -> DependencyResult:
+        """
+        Find a dependency on Spiget by its exact name, and download it. Safe to call from worker threads.
+
+        :param name: The name of the dependency in plugin.yml
+        :param dependent: The name of the plugin that depends on it, for messages
+        :returns: The plugin.yml of the downloaded jar, and the messages to print
+        """
+        try:
+            plugin_list = self.api.search_plugins(name, resolve_authors=False)
+        except requests.RequestException as error:
+            return None, [(f"Couldn't search for {name}: {error}", Color.WARNING)]
+
+        matches: List[Plugin] = [
+            plugin
+            for plugin in plugin_list
+            if Utils.normalise_name(plugin["name"]) == Utils.normalise_name(name)
+        ]
+        if not matches:
+            return None, [
+                (
+                    f"Couldn't find {name}, which {dependent} depends on. Install it yourself",
+                    Color.WARNING,
+                )
+            ]
+
+        try:
+            plugin = self.api.refresh_plugin(matches[0])
+        except requests.RequestException as error:
+            return None, [
+                (f"Couldn't get the latest version of {name}: {error}", Color.WARNING)
+            ]
+
+        filename = str(self.directory / Utils.create_jar_name(plugin["name"]))
+        result = self.api.download_plugin(plugin, filename)
+        if not result["status"]:
+            return None, [(result["message"], Color.WARNING)]
+
+        return Utils.load_plugin_description(filename), [
+            (
+                f"Installed {plugin['name']}, which {dependent} depends on",
+                Color.SUCCESS,
+            )
+        ]
+
+    @staticmethod
+    def find_cycles(graph: Dict[str, List[str]]) -> List[List[str]]:
+        """
+        Find the cycles in a dependency graph
+
+        :param graph: Plugin names to the names of the plugins they depend on
+        :returns: Each cycle as the plugin names along it, starting and ending with the same plugin
+        """
+        cycles: List[List[str]] = []
+        # Plugins whose dependencies have all been visited
+        finished: Set[str] = set()
+
+        for root in sorted(graph):
+            if root in finished:
+                continue
+
+            # Depth first, keeping the path from the root and an iterator of each plugin's dependencies
+            path: List[str] = [root]
+            iterators = [iter(graph[root])]
+            while iterators:
+                dependency = next(iterators[-1], None)
+                if dependency is None:
+                    finished.add(path.pop())
+                    iterators.pop()
+                elif dependency in path:
+                    cycles.append(path[path.index(dependency) :] + [dependency])
+                elif dependency in graph and dependency not in finished:
+                    path.append(dependency)
+                    iterators.append(iter(graph[dependency]))
+
+        return cycles
@@ -0,0 +1,300 @@
+"""
+Updating the plugins of several server directories at once, looking up and downloading each plugin once.
+
+Classes:
+    FleetUpdater - Updates the jars of several plugin directories, copying each update between them
+"""
+from __future__ import annotations
+
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from pathlib import Path
+from typing import Collection, Dict, Iterator, List, Tuple, Union
+
+import requests
+
+from .api import SpigetAPI
+from .index import MetadataIndex
+from .timings import TIMINGS
+from .type import Metadata, Plugin, StatusDict, Update
+from .utils import Color, Utils
+
+# A jar in one of several plugin directories, as its directory and filename
+FleetJar = Tuple[Path, str]
+# The directories whose jars were updated, and the messages to print about it
+FleetResult = Tuple[List[Path], List[Tuple[str, Color]]]
+# The latest version of a plugin (None if it couldn't be got), and why it couldn't be got
+LatestVersion = Tuple[Union[Plugin, None], Union[str, None]]
+
+
+class FleetUpdater:
+    """
+    Updates the plugins of several directories at once.
+
+    The metadata of every directory is gathered first, so each plugin is only looked up once,
+    and each new version is only downloaded once, then copied to the other directories.
+    """
+
+    def __init__(
+        self,
+        api: SpigetAPI,
+        directories: Collection[Path],
+        jobs: int = 1,
+        noninteractive: bool = False,
+    ) -> None:
+        """
+        :param api: The SpigetAPI to check and download with
+        :param directories: The plugin directories
+        :param jobs: How many plugins to check and download in parallel, default: 1
+        :param noninteractive: Update without showing changelogs and asking first, default: False
+        """
+        self.api = api
+        self.directories = directories
+        self.jobs = jobs
+        self.noninteractive = noninteractive
+        self.indexes = {
+            directory: MetadataIndex(directory) for directory in directories
+        }
+
+    def update(self, plugins: Collection[str]) -> None:
+        """
+        Update the plugins of every directory, then print how many were updated in each
+
+        :param plugins: A list of plugin names or jar filenames to update in every directory,
+            if empty every jar is updated
+        """
+        jars: List[FleetJar] = []
+        for directory in self.directories:
+            jars.extend(
+                (directory, filename)
+                for filename in self.fleet_jars(self.indexes[directory], plugins)
+            )
+
+        updated: Dict[Path, int] = dict.fromkeys(self.directories, 0)
+        with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+            outdated = self.find_outdated(executor, jars)
+
+            try:
+                for updated_directories, messages in self.update_outdated(
+                    executor, outdated
+                ):
+                    for text, color in messages:
+                        Utils.format_text(text, color)
+                    for directory in updated_directories:
+                        updated[directory] += 1
+            except EOFError:
+                Utils.format_text(
+                    "Input ended, not updating the remaining plugins", Color.WARNING
+                )
+
+        for index in self.indexes.values():
+            index.save()
+
+        Utils.separator()
+        for directory in self.directories:
+            unchanged = sum(jar[0] == directory for jar in jars) - updated[directory]
+            Utils.format_text(
+                f"{directory}: {updated[directory]} updated, {unchanged} left unchanged",
+                Color.STATUS,
+            )
+        Utils.format_text(
+            f"{sum(updated.values())} updated across {len(self.directories)} directories",
+            Color.STATUS,
+        )
+
+    def find_outdated(
+        self, executor: ThreadPoolExecutor, jars: List[FleetJar]
+    ) -> Dict[int, Tuple[Plugin, List[FleetJar]]]:
+        """
+        Look up the latest version of every plugin once, and find the jars it updates
+
+        :param executor: The executor to load metadata and look up plugins in
+        :param jars: Every jar to check, in any of the directories
+        :returns: Plugin IDs to the updated Plugin dict and the jars to update to it
+        """
+        metadata_list: List[Union[Metadata, None]] = list(
+            executor.map(lambda jar: self.indexes[jar[0]].load_metadata(jar[1]), jars)
+        )
+
+        plugin_ids = list(
+            dict.fromkeys(
+                metadata["plugin_id"] for metadata in metadata_list if metadata
+            )
+        )
+        latest: Dict[int, LatestVersion] = dict(
+            zip(plugin_ids, executor.map(self.get_latest_version, plugin_ids))
+        )
+
+        outdated: Dict[int, Tuple[Plugin, List[FleetJar]]] = {}
+        for (directory, filename), metadata in zip(jars, metadata_list):
+            if not metadata:
+                Utils.format_text(
+                    f"Couldn't load metadata for {directory / filename}. "
+                    "Try reinstalling with spud first",
+                    Color.WARNING,
+                )
+                continue
+
+            plugin, error = latest[metadata["plugin_id"]]
+            if plugin is None:
+                # Only this plugin's jars are skipped
+                Utils.format_text(
+                    f"Couldn't check {directory / filename} for updates: {error}",
+                    Color.WARNING,
+                )
+                continue
+
+            if metadata["plugin_version_id"] < plugin["version"]["id"]:
+                outdated.setdefault(plugin["id"], (plugin, []))[1].append(
+                    (directory, filename)
+                )
+
+        return outdated
+
+    def update_outdated(
+        self,
+        executor: ThreadPoolExecutor,
+        outdated: Dict[int, Tuple[Plugin, List[FleetJar]]],
+    ) -> Iterator[FleetResult]:
+        """
+        Update the jars of each outdated plugin, asking first unless noninteractive
+
+        :param executor: The executor to download, or prefetch changelogs, in
+        :param outdated: The result of find_outdated
+        :returns: A generator of the results of each plugin, in order
+        :raises EOFError: If input ends while asking
+        """
+        plugins = [plugin for plugin, _ in outdated.values()]
+        jar_lists = [jars for _, jars in outdated.values()]
+
+        if self.noninteractive:
+            yield from executor.map(self.update_jars, plugins, jar_lists)
+            return
+
+        # The next changelogs are fetched while the user reads this one
+        with closing(
+            Utils.prefetch(executor, self.get_update_info, plugins)
+        ) as updates:
+            yield from map(self.prompt_update_jars, plugins, jar_lists, updates)
+
+    @staticmethod
+    def fleet_jars(index: MetadataIndex, plugins: Collection[str]) -> List[str]:
+        """
+        Get the filenames of the jars to update in one of the directories
+
+        :param index: The MetadataIndex of the directory
+        :param plugins: A list of plugin names or jar filenames, if empty every jar in the directory
+        :returns: The filenames of the jars that exist, relative to the directory
+        """
+        if not plugins:
+            filenames = sorted(
+                name for name in os.listdir(index.directory) if name.endswith(".jar")
+            )
+            index.prune(filenames)
+            Utils.format_text(
+                f"Detected {len(filenames)} plugins in {index.directory}", Color.STATUS
+            )
+            return filenames
+
+        requested = (
+            plugin_name if ".jar" in plugin_name else Utils.create_jar_name(plugin_name)
+            for plugin_name in plugins
+        )
+        return [name for name in requested if (index.directory / name).is_file()]
+
+    def get_latest_version(self, plugin_id: int) -> LatestVersion:
+        """Get the latest version of a plugin, or why it couldn't be got, e.g. it was deleted"""
+        try:
+            return self.api.get_latest_version(plugin_id), None
+        except requests.RequestException as error:
+            return None, str(error)
+
+    def update_jars(self, plugin: Plugin, jars: List[FleetJar]) -> FleetResult:
+        """
+        Download a plugin's update once, then copy it over every jar of the plugin.
+        Safe to call from worker threads, as nothing is printed.
+
+        :param plugin: The updated Plugin dict
+        :param jars: The jars to update, in any of the directories
+        :returns: The directory of each updated jar, and the messages to print
+        """
+        source = str(jars[0][0] / jars[0][1])
+
+        with TIMINGS.plugin(plugin["name"]):
+            result: StatusDict = self.api.download_plugin(plugin, source)
+            if not result["status"]:
+                return [], [(result["message"], Color.WARNING)]
+
+            updated = [jars[0][0]]
+            messages = [(result["message"], Color.SUCCESS)]
+            for directory, filename in jars[1:]:
+                destination = str(directory / filename)
+
+                # The download was added to the jar store, so this links it from there
+                if self.api.store is not None:
+                    result = self.api.download_plugin(plugin, destination)
+                    if not result["status"]:
+                        messages.append((result["message"], Color.WARNING))
+                        continue
+                else:
+                    try:
+                        self.copy_jar(source, destination)
+                    except OSError as error:
+                        messages.append(
+                            (f"Could not copy {destination}: {error}", Color.WARNING)
+                        )
+                        continue
+
+                updated.append(directory)
+                messages.append((f"Copied {destination}", Color.SUCCESS))
+
+        return updated, messages
+
+    def get_update_info(self, plugin: Plugin) -> Update:
+        """Get the latest update of a plugin, timed as part of it"""
+        with TIMINGS.plugin(plugin["name"]):
+            return self.api.get_latest_update_info(plugin)
+
+    def prompt_update_jars(
+        self,
+        plugin: Plugin,
+        jars: List[FleetJar],
+        update: Union[Update, None] = None,
+    ) -> FleetResult:
+        """
+        Show the changelog of a plugin's update once, and ask the user before updating every jar of it
+
+        :param plugin: The updated Plugin dict
+        :param jars: The jars to update, in any of the directories
+        :param update: The plugin's latest Update dict if it was prefetched, default: get it now
+        :returns: The directory of each updated jar, and the messages to print
+        :raises EOFError: If input has ended
+        """
+        if update is None:
+            update = self.get_update_info(plugin)
+        Utils.separator()
+        Utils.format_text(f"Changelog for {plugin['name']}:", Color.STATUS)
+        Utils.format_text(update["description"], Color.STATUS)
+        Utils.separator()
+
+        if not Utils.prompt_bool(
+            f"Would you like to update {plugin['name']} in {len(jars)} places?",
+            raise_eof=True,
+        ):
+            return [], [(f"Not updating {plugin['name']}", Color.WARNING)]
+
+        return self.update_jars(plugin, jars)
+
+    @staticmethod
+    def copy_jar(source: str, destination: str) -> None:
+        """Atomically replace a jar with a copy of another"""
+        tmp_path = Utils.create_temp_jar_name(destination)
+        try:
+            shutil.copyfile(source, tmp_path)
+            os.replace(tmp_path, destination)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
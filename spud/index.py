@@ -0,0 +1,105 @@
+"""
+An index of the metadata saved in the jars of a plugin directory,
+so jars only need to be opened when they change.
+
+Classes:
+    MetadataIndex - Caches jar metadata in a file, keyed by filename, size and modification time
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Collection, Dict, Union
+
+from . import settings
+from .type import IndexEntry, Metadata
+from .utils import Utils
+
+# Bump when the format of the index changes, so old indexes are rebuilt
+INDEX_VERSION = 1
+
+
+class MetadataIndex:
+    """
+    The metadata of every jar in a directory, saved to settings.INDEX_FILENAME in that directory.
+
+    Jars whose size or modification time changed since they were indexed are read again.
+    """
+
+    def __init__(self, directory: Union[str, Path] = ".") -> None:
+        """
+        Load the index of a directory, starting from scratch if it is missing, corrupt or outdated
+
+        :param directory: The plugin directory, default: the working directory
+        """
+        self.directory = Path(directory)
+        self.path = self.directory / settings.INDEX_FILENAME
+        self.entries: Dict[str, IndexEntry] = {}
+        self.changed = False
+        self.lock = threading.Lock()
+
+        try:
+            with open(self.path, encoding="UTF-8") as file:
+                index = json.load(file)
+            if index.get("version") == INDEX_VERSION:
+                self.entries = index["entries"]
+        except (OSError, ValueError, KeyError, AttributeError):
+            self.changed = True
+
+    def load_metadata(self, filename: str) -> Union[Metadata, None]:
+        """
+        Get the metadata of a jar, only opening it if it changed since it was indexed
+
+        :param filename: The filename of the jar, relative to the directory
+        :returns: Metadata dict, or None if the jar doesn't have valid metadata
+        """
+        try:
+            stat = os.stat(self.directory / filename)
+        except OSError:
+            return None
+
+        with self.lock:
+            entry = self.entries.get(filename)
+        if (
+            entry
+            and entry["size"] == stat.st_size
+            and entry["mtime"] == stat.st_mtime_ns
+        ):
+            return entry["metadata"]
+
+        metadata = Utils.load_metadata_file(str(self.directory / filename))
+
+        with self.lock:
+            self.entries[filename] = {
+                "size": stat.st_size,
+                "mtime": stat.st_mtime_ns,
+                "metadata": metadata,
+            }
+            self.changed = True
+
+        return metadata
+
+    def prune(self, filenames: Collection[str]) -> None:
+        """Forget every jar that isn't in filenames"""
+        with self.lock:
+            for filename in set(self.entries) - set(filenames):
+                del self.entries[filename]
+                self.changed = True
+
+    def save(self) -> None:
+        """Atomically write the index if it changed. Failing to write it is not an error."""
+        with self.lock:
+            if not self.changed:
+                return
+
+            tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+            try:
+                with open(tmp_path, "w", encoding="UTF-8") as file:
+                    json.dump({"version": INDEX_VERSION, "entries": self.entries}, file)
+                os.replace(tmp_path, self.path)
+            except OSError:
+                return
+
+            self.changed = False
@@ -0,0 +1,74 @@
+"""
+Lockfiles, which pin the exact plugin versions of a plugin directory so it can be reproduced.
+
+Classes:
+    Lockfile - The resource and version IDs of every jar in a directory, saved in that directory
+"""
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+from typing import Dict, Union
+
+from . import settings
+from .type import Metadata, Plugin
+
+# Bump when the format of lockfiles changes
+LOCK_VERSION = 1
+
+
+class Lockfile:
+    """
+    The Metadata dicts of a plugin directory's jars by filename, saved to settings.LOCK_FILENAME in that directory.
+
+    The file is sorted and indented, so it can be committed and diffed.
+    """
+
+    def __init__(self, directory: Union[str, Path] = ".") -> None:
+        """
+        :param directory: The plugin directory, default: the working directory
+        """
+        self.directory = Path(directory)
+        self.path = self.directory / settings.LOCK_FILENAME
+        self.plugins: Dict[str, Metadata] = {}
+
+    def load(self) -> bool:
+        """
+        Load the lockfile of the directory
+
+        :returns: False if it is missing, corrupt or from a newer version of spud
+        """
+        try:
+            with open(self.path, encoding="UTF-8") as file:
+                lock = json.load(file)
+            if lock.get("version") != LOCK_VERSION:
+                return False
+            self.plugins = lock["plugins"]
+        except (OSError, ValueError, KeyError, AttributeError):
+            return False
+
+        return True
+
+    def save(self) -> None:
+        """Atomically write the lockfile"""
+        tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="UTF-8") as file:
+            json.dump(
+                {"version": LOCK_VERSION, "plugins": self.plugins},
+                file,
+                indent=2,
+                sort_keys=True,
+            )
+            file.write("\n")
+        os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def locked_plugin(metadata: Metadata) -> Plugin:
+        """Get a Plugin dict for the locked version of a jar, with what download_plugin needs"""
+        return {  # type: ignore
+            "id": metadata["plugin_id"],
+            "name": metadata["search_name"],
+            "version": {"id": metadata["plugin_version_id"]},
+            "file": {},
+        }
@@ -0,0 +1,139 @@
+"""
+Scheduling of API requests, so Spiget's rate limit isn't exceeded however many threads make them.
+
+Classes:
+    RateLimiter - A token bucket that slows down when the server says it is rate limiting
+"""
+from __future__ import annotations
+
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Union
+
+from . import settings
+from .timings import TIMINGS
+
+# The longest a request waits after a rate limited response without Retry-After
+MAX_BACKOFF = 60.0
+# How far below the configured rate rate limited responses can slow requests
+MIN_RATE_FACTOR = 1 / 8
+
+
+class RateLimiter:
+    """
+    A thread-safe token bucket shared by every request made through it.
+
+    Each request takes a token, and tokens are added at `rate` per second up to `burst`.
+    Rate limited responses pause every request for Retry-After seconds (or an exponential backoff)
+    and halve the rate, which then recovers as requests succeed.
+    """
+
+    def __init__(
+        self,
+        rate: float = settings.RATE_LIMIT,
+        burst: int = settings.RATE_LIMIT_BURST,
+        backoff_factor: float = settings.BACKOFF_FACTOR,
+    ) -> None:
+        """
+        :param rate: Requests per second, 0 for no limit, default: settings.RATE_LIMIT
+        :param burst: How many requests can be made at once after being idle, default: settings.RATE_LIMIT_BURST
+        :param backoff_factor: Pause backoff_factor * 2^(responses - 1) seconds after consecutive
+            rate limited responses without Retry-After, default: settings.BACKOFF_FACTOR
+        """
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.backoff_factor = backoff_factor
+
+        self.lock = threading.Lock()
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.failures = 0
+
+    def acquire(self) -> float:
+        """
+        Wait until a request can be made
+
+        :returns: How many seconds were spent waiting
+        """
+        wait = self.reserve()
+        if wait:
+            time.sleep(wait)
+            TIMINGS.add_throttle(wait)
+        return wait
+
+    def reserve(self) -> float:
+        """
+        Reserve a request without waiting for it, for callers that can't block like asyncio code
+
+        :returns: How many seconds to wait before making the request
+        """
+        with self.lock:
+            now = time.monotonic()
+            wait = max(self.paused_until - now, 0.0)
+
+            if self.rate > 0:
+                elapsed = max(now - self.updated, 0.0)
+                self.tokens = min(self.burst, self.tokens + elapsed * self.rate)
+                self.updated = max(self.updated, now)
+                # Tokens are reserved before waiting for them, so waiting threads are served in order.
+                # They are added from self.updated, which is the end of any pause.
+                self.tokens -= 1
+                if self.tokens < 0:
+                    wait = max(wait, self.updated - now - self.tokens / self.rate)
+
+        return wait
+
+    def throttle(self, retry_after: Union[float, None] = None) -> float:
+        """
+        Pause every request after a rate limited response, and slow down
+
+        :param retry_after: The seconds the server asked to wait, if it did
+        :returns: How many seconds requests are paused for
+        """
+        with self.lock:
+            self.failures += 1
+            self.rate = max(self.rate / 2, self.max_rate * MIN_RATE_FACTOR)
+
+            if retry_after is None:
+                retry_after = min(
+                    self.backoff_factor * 2 ** (self.failures - 1), MAX_BACKOFF
+                )
+
+            now = time.monotonic()
+            self.paused_until = max(self.paused_until, now + retry_after)
+            # No tokens are added during the pause, so requests don't all resume at once
+            self.tokens = min(self.tokens, 0.0)
+            self.updated = max(self.updated, self.paused_until)
+
+        TIMINGS.add_throttle(0.0, rate_limited=True)
+        return retry_after
+
+    def succeed(self) -> None:
+        """Speed back up towards the configured rate after a request wasn't rate limited"""
+        with self.lock:
+            self.failures = 0
+            if self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + self.max_rate / 10)
+
+    @staticmethod
+    def parse_retry_after(value: Union[str, None]) -> Union[float, None]:
+        """
+        Parse a Retry-After header, which is either seconds or an HTTP date
+
+        :returns: Seconds to wait, or None if the header is missing or invalid
+        """
+        if not value:
+            return None
+
+        try:
+            return max(float(value), 0.0)
+        except ValueError:
+            pass
+
+        try:
+            return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+        except (TypeError, ValueError):
+            return None
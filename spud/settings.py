@@ -6,9 +6,84 @@ Variables:
     BASE_API_URL      - The root URL of the API
     USER_AGENT        - The default user-agent to send with every request
     METADATA_FILENAME - The filename for metadata files saved in jars
+    INDEX_FILENAME    - The filename for the metadata index saved in plugin directories
+    LOCK_FILENAME     - The filename for lockfiles saved in plugin directories
+    UPDATE_FOLDER     - The folder in plugin directories that the server applies staged updates from when it starts
+    POOL_SIZE         - The maximum number of pooled connections kept open to the API
+    TIMEOUT           - The (connect, read) timeout in seconds for API requests
+    RETRIES           - How many times a failed API request is retried
+    BACKOFF_FACTOR    - The exponential backoff factor in seconds between retries
+    DOWNLOAD_CHUNK_SIZE - How many bytes of a download are held in memory at once
+    DOWNLOAD_RESUMES  - How many times a dropped download is resumed before giving up
+    RATE_LIMIT        - The maximum number of API requests per second
+    RATE_LIMIT_BURST  - How many API requests can be made at once after being idle
+    RATE_LIMIT_RETRIES - How many times a rate limited API request is retried
+    CACHE_DIRECTORY   - Where API responses are cached
+    CACHE_MAX_SIZE    - The size in bytes the response cache is trimmed to
+    CACHE_TTLS        - (endpoint regex, seconds) pairs for how long responses stay fresh
+    AUTHOR_CACHE_SIZE - How many authors a SpigetAPI instance remembers
+    CATALOG_PATH      - Where the offline catalog of resources is saved
+    CATALOG_PAGE_SIZE - How many resources are requested at a time when refreshing the catalog
+    CHANGELOG_LENGTH  - How many characters of a changelog are shown
+    CHANGELOG_CACHE_SIZE - How many rendered changelogs are remembered
+    PREFETCH_DEPTH    - How many plugins ahead of the prompt update checks and changelogs are fetched
+    WATCH_INTERVAL    - The default seconds between polls for updates when watching
+    WATCH_MIN_INTERVAL - The fewest seconds allowed between polls for updates when watching
+    WATCH_JITTER      - The default fraction of the interval that polls are randomly moved by
 """
+import os
+from pathlib import Path
+
 # Static values
 VERSION = "1.3.1"
 BASE_API_URL = "https://api.spiget.org/v2"
 USER_AGENT = f"Spud/{VERSION}"
 METADATA_FILENAME = ".spud_meta.json"
+INDEX_FILENAME = ".spud_index.json"
+LOCK_FILENAME = "spud.lock"
+UPDATE_FOLDER = "update"
+
+# Networking
+POOL_SIZE = 10
+TIMEOUT = (5.0, 30.0)
+RETRIES = 3
+BACKOFF_FACTOR = 0.5
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+DOWNLOAD_RESUMES = 5
+RATE_LIMIT = 10.0
+RATE_LIMIT_BURST = 20
+RATE_LIMIT_RETRIES = 5
+
+# Response cache
+CACHE_DIRECTORY = (
+    Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "spud"
+)
+CACHE_MAX_SIZE = 50 * 1024 * 1024
+CACHE_TTLS = (
+    # Author names almost never change
+    (r"/authors/\d+", 7 * 24 * 60 * 60),
+    # Versions and updates need to be current to be useful
+    (r"/resources/\d+", 5 * 60),
+    (r"/resources/\d+/updates/latest", 5 * 60),
+    (r"/resources/\d+/versions", 5 * 60),
+    (r"/search/resources/.+", 60 * 60),
+)
+AUTHOR_CACHE_SIZE = 1024
+
+# Offline resource catalog
+CATALOG_PATH = (
+    Path(os.environ.get("XDG_DATA_HOME") or Path.home() / ".local" / "share")
+    / "spud"
+    / "catalog.sqlite3"
+)
+CATALOG_PAGE_SIZE = 1000
+
+# Changelogs
+CHANGELOG_LENGTH = 1500
+CHANGELOG_CACHE_SIZE = 256
+PREFETCH_DEPTH = 4
+
+# Watching for updates
+WATCH_INTERVAL = 60 * 60
+WATCH_MIN_INTERVAL = 60
+WATCH_JITTER = 0.1
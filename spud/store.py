@@ -0,0 +1,153 @@
+"""
+A content-addressed store of downloaded jars, shared by several plugin directories.
+
+Classes:
+    JarStore - Keeps one copy of each plugin version and links it into plugin directories
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import secrets
+import shutil
+from pathlib import Path
+from typing import Tuple, Union
+
+from .type import Plugin
+from .utils import Utils
+
+
+class JarStore:
+    """
+    Stores jars as <directory>/<resource ID>/<version ID>/<sha256>.jar.
+
+    Jars are hardlinked into plugin directories when they are on the same filesystem, otherwise copied.
+    Every plugin directory jar made from a stored jar is recorded in its refs directory,
+    so versions that are no longer used anywhere can be garbage collected.
+    """
+
+    def __init__(self, directory: Union[str, Path]) -> None:
+        """
+        :param directory: Where to keep the store, it is created if needed
+        """
+        self.directory = Path(directory).expanduser()
+
+    def version_directory(self, plugin: Plugin) -> Path:
+        """Get the directory holding a plugin version's jar"""
+        return self.directory / str(plugin["id"]) / str(plugin["version"]["id"])
+
+    def find(self, plugin: Plugin) -> Union[Path, None]:
+        """
+        Find the stored jar of a plugin version
+
+        :param plugin: A Plugin dict, with the version to find
+        :returns: The path of the jar, or None if it isn't stored
+        """
+        for path in self.version_directory(plugin).glob("*.jar"):
+            return path
+        return None
+
+    def add(self, plugin: Plugin, filename: str) -> Path:
+        """
+        Store a plugin version's jar, which must already have its metadata injected
+
+        :param plugin: The Plugin dict the jar was downloaded for
+        :param filename: The jar in a plugin directory, which is recorded as using the stored jar
+        :returns: The path of the stored jar
+        """
+        version_directory = self.version_directory(plugin)
+        stored = version_directory / f"{Utils.hash_file(filename)}.jar"
+
+        if not stored.exists():
+            version_directory.mkdir(parents=True, exist_ok=True)
+            tmp_path = version_directory / f".{secrets.token_hex(4)}.part"
+            self.link_or_copy(filename, tmp_path)
+            os.replace(tmp_path, stored)
+
+        self.add_reference(stored, filename)
+        return stored
+
+    def materialise(self, stored: Path, filename: str) -> None:
+        """
+        Atomically replace a jar in a plugin directory with a stored jar
+
+        :param stored: The path of the stored jar
+        :param filename: The jar to create or replace
+        """
+        tmp_path = Utils.create_temp_jar_name(filename)
+        try:
+            self.link_or_copy(stored, tmp_path)
+            os.replace(tmp_path, filename)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        self.add_reference(stored, filename)
+
+    @staticmethod
+    def link_or_copy(source: Union[str, Path], destination: Union[str, Path]) -> None:
+        """Hardlink a file, copying it instead if it is on another filesystem"""
+        try:
+            os.link(source, destination)
+        except OSError:
+            shutil.copyfile(source, destination)
+
+    @staticmethod
+    def add_reference(stored: Path, filename: str) -> None:
+        """Record that a plugin directory jar was made from a stored jar"""
+        path = os.path.abspath(filename)
+        refs = stored.parent / "refs"
+        refs.mkdir(exist_ok=True)
+        (refs / hashlib.sha256(path.encode("UTF-8")).hexdigest()).write_text(
+            path, encoding="UTF-8"
+        )
+
+    @staticmethod
+    def is_referenced_by(stored: Path, path: str) -> bool:
+        """Check if a plugin directory jar is still the version of a stored jar"""
+        try:
+            if os.path.samefile(stored, path):
+                return True
+        except OSError:
+            return False
+
+        # Copies are the same version if their metadata says so
+        metadata = Utils.load_metadata_file(path)
+        if metadata is None:
+            return False
+        return (
+            str(metadata["plugin_id"]),
+            str(metadata["plugin_version_id"]),
+        ) == (stored.parent.parent.name, stored.parent.name)
+
+    def collect_garbage(self) -> Tuple[int, int]:
+        """
+        Remove the stored jars that no plugin directory uses any more
+
+        :returns: How many jars were removed, and how many bytes were freed
+        """
+        removed = 0
+        freed = 0
+
+        for stored in self.directory.glob("*/*/*.jar"):
+            refs = stored.parent / "refs"
+            referenced = False
+            if refs.is_dir():
+                for ref in refs.iterdir():
+                    if self.is_referenced_by(stored, ref.read_text(encoding="UTF-8")):
+                        referenced = True
+                    else:
+                        ref.unlink()
+
+            if not referenced:
+                freed += stored.stat().st_size
+                removed += 1
+                shutil.rmtree(stored.parent)
+
+        # Remove resource directories left empty
+        for resource_directory in self.directory.glob("*"):
+            if resource_directory.is_dir() and not any(resource_directory.iterdir()):
+                resource_directory.rmdir()
+
+        return removed, freed
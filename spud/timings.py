@@ -0,0 +1,202 @@
+"""
+Instrumentation for finding out where the time of a run goes.
+
+Classes:
+    Timings - Thread-safe accumulator of phase, request and per-plugin timings
+
+Variables:
+    TIMINGS - The Timings instance used by the rest of the program, disabled until enabled by the CLI
+"""
+from __future__ import annotations
+
+import functools
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, TypeVar
+
+F = TypeVar("F", bound=Callable)
+
+# How many plugins are listed in reports
+SLOWEST_PLUGINS = 5
+
+
+class Timings:
+    """
+    Accumulates wall time per phase, request counts and bytes per endpoint, and time per plugin.
+
+    Recording does nothing while the instance is disabled, so hooks can be left in hot code.
+    """
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.phases: Dict[str, Dict[str, float]] = {}
+        self.endpoints: Dict[str, Dict[str, float]] = {}
+        self.plugins: Dict[str, float] = {}
+        self.throttle = {"seconds": 0.0, "rate_limited": 0}
+
+    def reset(self, enabled: bool) -> None:
+        """Forget everything recorded and start recording again if enabled"""
+        with self.lock:
+            self.enabled = enabled
+            self.started = time.perf_counter()
+            self.phases = {}
+            self.endpoints = {}
+            self.plugins = {}
+            self.throttle = {"seconds": 0.0, "rate_limited": 0}
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Time a block of code as part of a phase"""
+        if not self.enabled:
+            yield
+            return
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            with self.lock:
+                phase = self.phases.setdefault(name, {"seconds": 0.0, "calls": 0})
+                phase["seconds"] += seconds
+                phase["calls"] += 1
+
+    def timed(self, name: str) -> Callable[[F], F]:
+        """Decorator that times every call of a function as part of a phase"""
+
+        def decorator(function: F) -> F:
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.phase(name):
+                    return function(*args, **kwargs)
+
+            return wrapper  # type: ignore
+
+        return decorator
+
+    @contextmanager
+    def plugin(self, name: str) -> Iterator[None]:
+        """Time a block of code as work done for a plugin"""
+        if not self.enabled:
+            yield
+            return
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            with self.lock:
+                self.plugins[name] = self.plugins.get(name, 0.0) + seconds
+
+    def add_request(
+        self, endpoint: str, seconds: float, size: int, cached: bool = False
+    ) -> None:
+        """
+        Record an API request
+
+        :param endpoint: The endpoint called, IDs and queries are grouped together
+        :param seconds: How long the request took
+        :param size: How many bytes of body were received
+        :param cached: Whether it was answered from the response cache
+        """
+        if not self.enabled:
+            return
+
+        endpoint = re.sub(
+            r"^/search/resources/.*", "/search/resources/{query}", endpoint
+        )
+        endpoint = re.sub(r"/\d+", "/{id}", endpoint)
+
+        with self.lock:
+            stats = self.endpoints.setdefault(
+                endpoint, {"requests": 0, "cached": 0, "seconds": 0.0, "bytes": 0}
+            )
+            stats["requests"] += 1
+            stats["cached"] += cached
+            stats["seconds"] += seconds
+            stats["bytes"] += size
+
+    def add_bytes(self, endpoint: str, size: int) -> None:
+        """Record body bytes received after a request was recorded, e.g. for streamed downloads"""
+        if not self.enabled:
+            return
+
+        endpoint = re.sub(r"/\d+", "/{id}", endpoint)
+        with self.lock:
+            if endpoint in self.endpoints:
+                self.endpoints[endpoint]["bytes"] += size
+
+    def add_throttle(self, seconds: float, rate_limited: bool = False) -> None:
+        """
+        Record time spent waiting for the rate limit
+
+        :param seconds: How long a request waited
+        :param rate_limited: Whether the server answered with a rate limited response
+        """
+        if not self.enabled:
+            return
+
+        with self.lock:
+            self.throttle["seconds"] += seconds
+            self.throttle["rate_limited"] += rate_limited
+
+    def report(self) -> dict:
+        """Get everything recorded as a JSON serialisable dict"""
+        with self.lock:
+            slowest = sorted(self.plugins.items(), key=lambda item: -item[1])
+            return {
+                "total_seconds": round(time.perf_counter() - self.started, 4),
+                "phases": {
+                    name: {**phase, "seconds": round(phase["seconds"], 4)}
+                    for name, phase in sorted(self.phases.items())
+                },
+                "endpoints": {
+                    name: {**stats, "seconds": round(stats["seconds"], 4)}
+                    for name, stats in sorted(self.endpoints.items())
+                },
+                "bytes": sum(stats["bytes"] for stats in self.endpoints.values()),
+                "throttled_seconds": round(self.throttle["seconds"], 4),
+                "rate_limited": self.throttle["rate_limited"],
+                "slowest_plugins": [
+                    {"plugin": name, "seconds": round(seconds, 4)}
+                    for name, seconds in slowest[:SLOWEST_PLUGINS]
+                ],
+            }
+
+    def format_report(self) -> List[str]:
+        """Get everything recorded as human readable lines"""
+        report = self.report()
+        lines = [
+            f"Total: {report['total_seconds']:.3f}s, {report['bytes']} bytes received"
+        ]
+
+        # Phases can nest, so their times don't add up to the total
+        for name, phase in report["phases"].items():
+            lines.append(
+                f"Phase {name}: {phase['seconds']:.3f}s over {phase['calls']} calls"
+            )
+
+        if report["throttled_seconds"] or report["rate_limited"]:
+            lines.append(
+                f"Throttled: {report['throttled_seconds']:.3f}s waiting for the rate limit, "
+                f"{report['rate_limited']} rate limited responses"
+            )
+
+        for name, stats in report["endpoints"].items():
+            lines.append(
+                f"Endpoint {name}: {stats['requests']} requests ({stats['cached']} cached), "
+                f"{stats['seconds']:.3f}s, {stats['bytes']} bytes"
+            )
+
+        for plugin in report["slowest_plugins"]:
+            lines.append(f"Slow plugin {plugin['plugin']}: {plugin['seconds']:.3f}s")
+
+        return lines
+
+
+TIMINGS = Timings()
@@ -4,12 +4,17 @@ Custom types used in the program.
 TypedDicts:
     StatusDict
     Author
+    BasePluginVersion
     PluginVersion
     Plugin
+    BaseMetadata
+    FileMetadata
     Metadata
     Update
+    IndexEntry
+    PluginDescription
 """
-from typing import TypedDict
+from typing import List, Optional, TypedDict
 
 
 class StatusDict(TypedDict):
@@ -26,10 +31,15 @@ class Author(TypedDict, total=False):
     name: str
 
 
-class PluginVersion(TypedDict):
-    """Represents a specific plugin version"""
+class BasePluginVersion(TypedDict):
+    """Represents the ID every plugin version has"""
 
     id: int
+
+
+class PluginVersion(BasePluginVersion, total=False):
+    """Represents a specific plugin version, catalog hits don't have its UUID"""
+
     uuid: str
 
 
@@ -41,18 +51,30 @@ class Plugin(TypedDict):
     tag: str
     version: PluginVersion
     id: int
-    str: int
+    downloads: int
     author: Author
 
 
-class Metadata(TypedDict):
-    """Represents the metadata values saved into jar files"""
+class BaseMetadata(TypedDict):
+    """Represents the metadata values saved into every jar file"""
 
     search_name: str
     plugin_id: int
     plugin_version_id: int
 
 
+class FileMetadata(TypedDict, total=False):
+    """Represents what a jar file was downloaded as, which jars saved by older versions don't have"""
+
+    file_size: int
+    file_hash: str
+    file_etag: str
+
+
+class Metadata(BaseMetadata, FileMetadata):
+    """Represents the metadata values saved into jar files"""
+
+
 class Update(TypedDict):
     """Represents a specific update of a plugin received"""
 
@@ -61,3 +83,22 @@ class Update(TypedDict):
     description: str
     date: int
     likes: int
+
+
+class IndexEntry(TypedDict):
+    """Represents the cached metadata of a jar file in a MetadataIndex"""
+
+    size: int
+    mtime: int
+    metadata: Optional[Metadata]
+
+
+class PluginDescription(TypedDict):
+    """Represents the plugin.yml of a jar file, with the keys spud uses"""
+
+    name: str
+    version: str
+    authors: List[str]
+    depend: List[str]
+    softdepend: List[str]
+    provides: List[str]
@@ -7,20 +7,45 @@ Classes:
 """
 from __future__ import annotations
 
+import glob
+import hashlib
+import itertools
 import json
+import os
 import re
+import secrets
 import string
 import sys
+from collections import deque
+from concurrent.futures import Executor, Future
 from enum import Enum, unique
-from typing import Union, get_type_hints
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Generator,
+    Iterable,
+    List,
+    Set,
+    Union,
+    get_type_hints,
+)
 import zipfile
 
-import emoji
 from colorama import Fore, Style
 from colorama import init as init_colorama
 
 from . import settings
-from .type import Plugin, Metadata
+from .timings import TIMINGS
+from .type import BaseMetadata, FileMetadata, Plugin, Metadata, PluginDescription
+
+# Evaluated once, instead of each time a metadata file is validated
+METADATA_TYPES = get_type_hints(Metadata)
+REQUIRED_METADATA_KEYS = frozenset(get_type_hints(BaseMetadata))
+
+# Runs of letters and digits, and the parts of title case words
+WORD = re.compile(r"[^\W_]+")
+TITLE_CASE_PART = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+")
 
 
 @unique
@@ -41,7 +66,8 @@ class Utils:
     This class shouldn't be initialised before use.
     """
 
-    init_colorama()
+    # colorama is initialised when something is first printed, instead of on import
+    colorama_initialised = False
 
     @staticmethod
     def sanitise_api_plugin(plugin: Plugin) -> Plugin:
@@ -72,6 +98,9 @@ class Utils:
             if char in "|":
                 name = name[:index]
 
+        # Imported here, as it takes a while and is only needed for search results
+        import emoji  # pylint: disable=import-outside-toplevel
+
         # Remove all emojis from name
         name = emoji.get_emoji_regexp().sub("", name)
 
@@ -87,6 +116,49 @@ class Utils:
         """Remove whitespace and append '.jar'"""
         return text.translate(str.maketrans("", "", string.whitespace)) + ".jar"
 
+    @staticmethod
+    def create_temp_jar_name(jar_name: str) -> str:
+        """
+        Get a unique, hidden filename to write a jar to before it replaces jar_name.
+
+        It is in the same directory, so a failed write never replaces the old jar and the final rename is atomic.
+        """
+        return os.path.join(
+            os.path.dirname(jar_name),
+            f".{os.path.basename(jar_name)}.{secrets.token_hex(4)}.part",
+        )
+
+    @staticmethod
+    def create_partial_jar_name(jar_name: str, plugin: Plugin) -> str:
+        """
+        Get the hidden filename a plugin version is downloaded to before it replaces jar_name.
+
+        It is the same each time, so a download that was cut short can be resumed.
+        """
+        return os.path.join(
+            os.path.dirname(jar_name),
+            f".{os.path.basename(jar_name)}.{plugin['id']}-{plugin['version']['id']}.partial",
+        )
+
+    @staticmethod
+    def remove_partial_jars(jar_name: str) -> None:
+        """Remove the partial downloads of every version of jar_name"""
+        pattern = os.path.join(
+            glob.escape(os.path.dirname(jar_name)),
+            f".{glob.escape(os.path.basename(jar_name))}.*.partial",
+        )
+        for partial_jar_name in glob.glob(pattern):
+            os.remove(partial_jar_name)
+
+    @staticmethod
+    def hash_file(filename: str) -> str:
+        """Get the hex SHA-256 digest of a file"""
+        digest = hashlib.sha256()
+        with open(filename, "rb") as file:
+            for chunk in iter(lambda: file.read(1024 * 1024), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
     @staticmethod
     def get_plugin_name_from_jar(jar_name: str) -> str:
         """Remove '.jar' from the end of the string"""
@@ -94,8 +166,17 @@ class Utils:
             return jar_name.replace(".jar", "")
         return jar_name
 
-    @staticmethod
-    def format_text(text: str, ansi_color: Color, print_text=True) -> Union[str, None]:
+    @classmethod
+    def init_colors(cls) -> None:
+        """Initialise colorama if it hasn't been already"""
+        if not cls.colorama_initialised:
+            init_colorama()
+            cls.colorama_initialised = True
+
+    @classmethod
+    def format_text(
+        cls, text: str, ansi_color: Color, print_text=True
+    ) -> Union[str, None]:
         """
         Format text with a color
 
@@ -103,6 +184,8 @@ class Utils:
         :param ansi_color: The Ansi color to use
         :param print_text: Whether to print the text or return it, default: True
         """
+        cls.init_colors()
+
         str_color: str = str(ansi_color.value)
 
         formatted_text = str_color + text + Style.RESET_ALL
@@ -123,12 +206,18 @@ class Utils:
             sys.exit(1)
 
     @classmethod
-    def prompt_bool(cls, question: str) -> bool:
-        """Ask the user a yes/no question and return a boolean"""
+    def prompt_bool(cls, question: str, raise_eof: bool = False) -> bool:
+        """
+        Ask the user a yes/no question and return a boolean
+
+        :param raise_eof: Raise EOFError if input has ended, instead of answering no
+        """
         while True:
             try:
                 answer = cls.prompt(question + " (y/n)").lower()
             except EOFError:
+                if raise_eof:
+                    raise
                 return False
 
             if answer == "y":
@@ -138,6 +227,33 @@ class Utils:
 
             cls.format_text("Answer must be 'y' or 'n'", Color.ERROR)
 
+    @staticmethod
+    def prefetch(
+        executor: Executor, function: Callable, items: Iterable
+    ) -> Generator[Any, None, None]:
+        """
+        Call a function on each item in an executor, ahead of the results being used.
+
+        At most settings.PREFETCH_DEPTH calls run or wait ahead of the result being used,
+        and those that haven't started are cancelled when the generator is closed.
+
+        :returns: A generator of the results, in the order of the items
+        """
+        remaining = iter(items)
+        futures: Deque[Future] = deque()
+        try:
+            while True:
+                for item in itertools.islice(
+                    remaining, settings.PREFETCH_DEPTH + 1 - len(futures)
+                ):
+                    futures.append(executor.submit(function, item))
+                if not futures:
+                    return
+                yield futures.popleft().result()
+        finally:
+            for future in futures:
+                future.cancel()
+
     @classmethod
     def separator(cls) -> None:
         """Print 20 * '-'"""
@@ -145,12 +261,25 @@ class Utils:
         cls.format_text(sep_char * 20, Color.DIMMED)
 
     @classmethod
-    def inject_metadata_file(cls, plugin: Plugin, filename: str) -> None:
-        """Insert a Plugin's metadata into a filename"""
+    @TIMINGS.timed("inject_metadata")
+    def inject_metadata_file(
+        cls,
+        plugin: Plugin,
+        filename: str,
+        file_metadata: Union[FileMetadata, None] = None,
+    ) -> None:
+        """
+        Insert a Plugin's metadata into a filename
+
+        :param plugin: The Plugin dict the jar is
+        :param filename: The jar, which mustn't already have metadata
+        :param file_metadata: What the jar was downloaded as, default: nothing
+        """
         metadata: Metadata = {
             "search_name": plugin["name"],
             "plugin_id": plugin["id"],
             "plugin_version_id": plugin["version"]["id"],
+            **(file_metadata or {}),  # type: ignore
         }
 
         metadata_json = json.dumps(metadata).encode("UTF-8")
@@ -158,7 +287,38 @@ class Utils:
         with zipfile.ZipFile(filename, "a") as jar:
             jar.writestr(settings.METADATA_FILENAME, metadata_json)
 
+    @classmethod
+    def replace_metadata_file(
+        cls,
+        plugin: Plugin,
+        filename: str,
+        file_metadata: Union[FileMetadata, None] = None,
+    ) -> None:
+        """
+        Atomically replace the metadata of a jar, without touching the rest of it
+
+        :param plugin: The Plugin dict the jar is now
+        :param filename: The jar, with or without metadata
+        :param file_metadata: What the jar was downloaded as, default: nothing
+        """
+        tmp_jar_name = cls.create_temp_jar_name(filename)
+        try:
+            with zipfile.ZipFile(filename) as source, zipfile.ZipFile(
+                tmp_jar_name, "w"
+            ) as jar:
+                for item in source.infolist():
+                    if item.filename != settings.METADATA_FILENAME:
+                        jar.writestr(item, source.read(item))
+
+            cls.inject_metadata_file(plugin, tmp_jar_name, file_metadata)
+            os.replace(tmp_jar_name, filename)
+        except BaseException:
+            if os.path.exists(tmp_jar_name):
+                os.remove(tmp_jar_name)
+            raise
+
     @staticmethod
+    @TIMINGS.timed("load_metadata")
     def load_metadata_file(filename: str) -> Union[Metadata, None]:
         """
         Load a metadata file from a Plugin jar
@@ -173,22 +333,83 @@ class Utils:
                 tmp_metadata: dict = json.loads(metadata_str)
 
                 # Validate that the keys in the metadata are of the correct type
-                # to satisfy the type checker
-                for key, value in get_type_hints(Metadata).items():
+                # to satisfy the type checker. Jars saved by older versions lack the file keys.
+                metadata: dict = {}
+                for key, value in METADATA_TYPES.items():
+                    if key not in tmp_metadata and key not in REQUIRED_METADATA_KEYS:
+                        continue
                     if not isinstance(tmp_metadata[key], value):
                         raise TypeError
+                    metadata[key] = tmp_metadata[key]
 
-                metadata: Metadata = {
-                    "search_name": tmp_metadata["search_name"],
-                    "plugin_id": tmp_metadata["plugin_id"],
-                    "plugin_version_id": tmp_metadata["plugin_version_id"],
-                }
-
-                return metadata
+                return metadata  # type: ignore
 
         except (FileNotFoundError, KeyError, zipfile.BadZipfile):
             return None
 
+    @staticmethod
+    @TIMINGS.timed("load_plugin_description")
+    def load_plugin_description(filename: str) -> Union[PluginDescription, None]:
+        """
+        Load the plugin.yml of a jar
+
+        :param filename: The filename of the jar
+        :returns: PluginDescription dict, or None if the jar doesn't have a valid plugin.yml
+        """
+        # Imported here, as it is only needed for plugin.yml files
+        import yaml  # pylint: disable=import-outside-toplevel
+
+        try:
+            with zipfile.ZipFile(filename) as jar:
+                description = yaml.load(
+                    jar.read("plugin.yml"),
+                    Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader),
+                )
+        except (OSError, KeyError, zipfile.BadZipfile, yaml.YAMLError):
+            return None
+
+        if not isinstance(description, dict) or not description.get("name"):
+            return None
+
+        authors = Utils.string_list(description.get("author"))
+        authors += Utils.string_list(description.get("authors"))
+
+        return {
+            "name": str(description["name"]),
+            "version": str(description.get("version", "")),
+            "authors": list(dict.fromkeys(authors)),
+            "depend": Utils.string_list(description.get("depend")),
+            "softdepend": Utils.string_list(description.get("softdepend")),
+            "provides": Utils.string_list(description.get("provides")),
+        }
+
+    @staticmethod
+    def string_list(value) -> List[str]:
+        """Get a plugin.yml value that is a list of strings, a single string, or missing, as a list"""
+        if value is None:
+            return []
+        if isinstance(value, list):
+            return [str(item) for item in value if item is not None]
+        return [str(value)]
+
+    @staticmethod
+    def normalise_name(name: str) -> str:
+        """Lowercase a name and remove spaces and punctuation, so names can be compared loosely"""
+        return re.sub(r"[\W_]+", "", name).lower()
+
+    @staticmethod
+    def tokenize_name(name: str) -> Set[str]:
+        """
+        Get the lowercased words of a name, and the parts of its title case words
+
+        Example: 'LuckPerms' -> {'luckperms', 'luck', 'perms'}
+        """
+        tokens: Set[str] = set()
+        for word in WORD.findall(name):
+            tokens.add(word.lower())
+            tokens.update(part.lower() for part in TITLE_CASE_PART.findall(word))
+        return tokens
+
     @staticmethod
     def split_title_case(text: str) -> str:
         """Split a title case word up with spaces. E.g. 'FooBar' -> 'Foo Bar'"""
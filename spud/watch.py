@@ -0,0 +1,182 @@
+"""
+A long-running watcher, which stages plugin updates as they are published without starting spud for each check.
+
+Classes:
+    Watcher - Polls Spiget for updates of a plugin directory's jars on a schedule, and stages them
+"""
+from __future__ import annotations
+
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Tuple, Union
+
+import requests
+
+from . import settings
+from .api import SpigetAPI
+from .index import MetadataIndex
+from .type import Metadata
+from .utils import Color, Utils
+
+# Whether an update was staged, and the messages to print about it
+StageResult = Tuple[bool, List[Tuple[str, Color]]]
+
+
+class Watcher:
+    """
+    Checks every jar of a plugin directory for updates every `interval` seconds, give or take `jitter`,
+    and downloads each update into the directory's settings.UPDATE_FOLDER, which the server applies on its next start.
+
+    The API session and both metadata indexes are kept between polls, so with the response cache
+    a poll only stats jars and makes conditional requests. Between polls the watcher sleeps on an event,
+    which check_now() and stop() wake it from.
+    """
+
+    def __init__(
+        self,
+        api: SpigetAPI,
+        directory: Union[str, Path] = ".",
+        interval: float = settings.WATCH_INTERVAL,
+        jitter: float = settings.WATCH_JITTER,
+        jobs: int = 1,
+    ) -> None:
+        """
+        :param api: The SpigetAPI to check and download with
+        :param directory: The plugin directory, default: the working directory
+        :param interval: Seconds between polls, default: settings.WATCH_INTERVAL
+        :param jitter: The fraction of the interval polls are randomly moved by, default: settings.WATCH_JITTER
+        :param jobs: How many plugins to check and download in parallel, default: 1
+        """
+        self.api = api
+        self.directory = Path(directory)
+        self.staging = self.directory / settings.UPDATE_FOLDER
+        self.interval = interval
+        self.jitter = jitter
+        self.jobs = jobs
+
+        self.index = MetadataIndex(self.directory)
+        self.staged_index = MetadataIndex(self.staging)
+
+        self.wake = threading.Event()
+        self.stopped = threading.Event()
+        self.polls = 0
+
+    def run(self) -> None:
+        """Poll for updates until stop() is called, carrying on after a poll fails"""
+        while not self.stopped.is_set():
+            try:
+                messages = self.poll()
+            except Exception as error:  # pylint: disable=broad-except
+                messages = [
+                    (
+                        f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] Checking for updates failed: "
+                        f"{error!r}. Trying again at the next poll",
+                        Color.WARNING,
+                    )
+                ]
+            for text, color in messages:
+                Utils.format_text(text, color)
+
+            self.wake.wait(self.next_delay())
+            self.wake.clear()
+
+    def check_now(self) -> None:
+        """Wake the watcher to poll straight away. Safe to call from signal handlers and other threads."""
+        self.wake.set()
+
+    def stop(self) -> None:
+        """Stop the watcher once any poll in progress has finished"""
+        self.stopped.set()
+        self.wake.set()
+
+    def next_delay(self) -> float:
+        """Get the seconds until the next poll, so several watchers don't poll at the same moment"""
+        return max(self.interval * (1 + random.uniform(-self.jitter, self.jitter)), 0.0)
+
+    def poll(self) -> List[Tuple[str, Color]]:
+        """
+        Check every jar for an update, and stage the updates
+
+        :returns: The messages to print
+        """
+        filenames = self.list_jars(self.directory)
+        self.index.prune(filenames)
+        self.staged_index.prune(self.list_jars(self.staging))
+
+        # Worker threads only live for the poll, so an idle watcher is one sleeping thread
+        with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+            results = list(executor.map(self.stage_update, filenames))
+
+        self.index.save()
+        self.staged_index.save()
+        self.polls += 1
+
+        messages = [
+            message for _, plugin_messages in results for message in plugin_messages
+        ]
+        staged_count = sum(staged for staged, _ in results)
+        messages.append(
+            (
+                f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] Checked {len(filenames)} plugins, "
+                f"{staged_count} updates staged",
+                Color.DIMMED,
+            )
+        )
+        return messages
+
+    def stage_update(self, filename: str) -> StageResult:
+        """
+        Download a jar's update into the staging folder if it has one newer than what is installed or staged.
+        Safe to call from worker threads, as nothing is printed.
+
+        :param filename: The jar filename, in the plugin directory
+        :returns: Whether an update was staged, and the messages to print
+        """
+        metadata = self.index.load_metadata(filename)
+        if not metadata:
+            return False, []
+
+        # A staged update of the same plugin is the version to check against
+        staged: Union[Metadata, None] = self.staged_index.load_metadata(filename)
+        if not staged or staged["plugin_id"] != metadata["plugin_id"]:
+            staged = None
+        elif staged["plugin_version_id"] > metadata["plugin_version_id"]:
+            metadata = staged
+
+        try:
+            plugin = self.api.get_plugin_info_if_update(metadata)
+            if plugin is None:
+                return False, []
+
+            self.staging.mkdir(exist_ok=True)
+            result = self.api.download_plugin(
+                plugin, str(self.staging / filename), staged
+            )
+        except (requests.RequestException, KeyError, ValueError) as error:
+            # e.g. the resource was deleted from Spiget, or the response was malformed
+            return False, [
+                (f"Couldn't check {filename} for updates: {error!r}", Color.WARNING)
+            ]
+
+        if not result["status"]:
+            return False, [(result["message"], Color.WARNING)]
+        return True, [
+            (
+                f"Staged {plugin['name']} version {plugin['version']['id']} in {self.staging}",
+                Color.SUCCESS,
+            )
+        ]
+
+    @staticmethod
+    def list_jars(directory: Path) -> List[str]:
+        """Get the jar filenames in a directory, or none if it doesn't exist"""
+        try:
+            return sorted(
+                name for name in os.listdir(directory) if name.endswith(".jar")
+            )
+        except OSError:
+            return []
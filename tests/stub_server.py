@@ -0,0 +1,369 @@
+"""
+A local stand-in for the Spiget API, used by the tests and benchmarks so they don't depend on the network.
+
+Classes:
+    StubSpigetServer      - Serves canned responses from a background thread
+    SyntheticSpigetServer - Serves generated plugins from the Spiget endpoints spud uses
+
+Functions:
+    query_params        - Get the query string of a request
+    ranged              - Answer a request for part of a file
+    synthetic_jar       - Create a jar of a given size
+    plugin_jar          - Create a small jar with a plugin.yml
+    enter_context       - Enter a context manager for the duration of a test
+    temporary_directory - Create a directory for the duration of a test
+"""
+from __future__ import annotations
+
+import base64
+import contextlib
+import io
+import json
+import random
+import re
+import shutil
+import socket
+import tempfile
+import threading
+import time
+import unittest
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, ContextManager, Dict, List, Pattern, Tuple, TypeVar, Union
+from urllib.parse import parse_qs, urlsplit
+
+# A route is called with the request handler and the regex match of the path,
+# and returns (status code, body, extra headers). Bodies that aren't bytes are sent as JSON.
+RouteResult = Tuple[int, Union[bytes, dict, list], Dict[str, str]]
+Route = Callable[[BaseHTTPRequestHandler, "re.Match[str]"], RouteResult]
+
+T = TypeVar("T")
+
+
+class StubSpigetServer:
+    """
+    An HTTP/1.1 keep-alive server on localhost that answers requests using registered routes.
+
+    Use as a context manager; the server listens on a random free port, see `url`.
+    """
+
+    def __init__(self, latency: float = 0.0) -> None:
+        """
+        :param latency: Seconds to sleep before answering each request, to simulate a real network
+        """
+        self.latency = latency
+        self.routes: List[Tuple[Pattern[str], Route]] = []
+        # Status codes to answer the next requests with, regardless of route
+        self.fail_next: List[int] = []
+        # How many body bytes to send of the next responses before dropping the connection
+        self.cut_next: List[int] = []
+
+        self.request_count = 0
+        self.connection_count = 0
+        self.bytes_sent = 0
+        self.requests: List[str] = []
+        self.lock = threading.Lock()
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(
+            target=self.httpd.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+        )
+
+    @property
+    def url(self) -> str:
+        """The base URL of the server, usable as a SpigetAPI base_api_url"""
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def route(self, pattern: str, handler: Route) -> None:
+        """Register a handler for paths fully matching a regex pattern"""
+        self.routes.append((re.compile(pattern), handler))
+
+    def json_route(
+        self, pattern: str, body: Union[dict, list], status: int = 200
+    ) -> None:
+        """Register a route that always answers with the same JSON body"""
+        self.route(pattern, lambda _request, _match: (status, body, {}))
+
+    def reset_counters(self) -> None:
+        """Zero the request, connection and byte counters"""
+        with self.lock:
+            self.request_count = 0
+            self.connection_count = 0
+            self.bytes_sent = 0
+            self.requests.clear()
+
+    def __enter__(self) -> StubSpigetServer:
+        self.thread.start()
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def dispatch(self, request: BaseHTTPRequestHandler) -> RouteResult:
+        """Count a request and answer it with the first matching route"""
+        path = urlsplit(request.path).path
+
+        with self.lock:
+            self.request_count += 1
+            self.requests.append(path)
+            if self.fail_next:
+                return self.fail_next.pop(0), {"error": "stubbed failure"}, {}
+
+        for pattern, handler in self.routes:
+            match = pattern.fullmatch(path)
+            if match:
+                return handler(request, match)
+
+        return 404, {"error": "not found"}, {}
+
+    def _make_handler(self) -> type:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def setup(self) -> None:
+                super().setup()
+                with server.lock:
+                    server.connection_count += 1
+
+            def do_GET(self) -> None:  # pylint: disable=invalid-name
+                if server.latency:
+                    time.sleep(server.latency)
+
+                status, body, headers = server.dispatch(self)
+                if not isinstance(body, bytes):
+                    body = json.dumps(body).encode("UTF-8")
+                    headers = {"Content-Type": "application/json", **headers}
+
+                with server.lock:
+                    cut = server.cut_next.pop(0) if server.cut_next else None
+                    server.bytes_sent += len(body) if cut is None else cut
+
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                if "Content-Length" not in headers:
+                    self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+
+                if cut is None:
+                    self.wfile.write(body)
+                    return
+
+                # Send part of the body, then drop the connection like a flaky network
+                self.wfile.write(body[:cut])
+                self.wfile.flush()
+                self.close_connection = True
+                self.connection.shutdown(socket.SHUT_RDWR)
+
+            def log_message(self, *_) -> None:
+                pass
+
+        return Handler
+
+
+def query_params(request: BaseHTTPRequestHandler) -> Dict[str, str]:
+    """Get the query string of a request as a flat dict"""
+    return {
+        key: values[0] for key, values in parse_qs(urlsplit(request.path).query).items()
+    }
+
+
+def ranged(
+    request: BaseHTTPRequestHandler,
+    body: bytes,
+    headers: Union[Dict[str, str], None] = None,
+) -> RouteResult:
+    """
+    Answer a request for a file, honouring Range and If-Range headers like a CDN
+
+    :param request: The request being answered
+    :param body: The whole file
+    :param headers: Extra response headers, an ETag is used to check If-Range
+    """
+    headers = {"Accept-Ranges": "bytes", **(headers or {})}
+    byte_range = re.fullmatch(r"bytes=(\d+)-", request.headers.get("Range", ""))
+    if_range = request.headers.get("If-Range")
+
+    if not byte_range or (if_range and if_range != headers.get("ETag")):
+        return 200, body, headers
+
+    start = int(byte_range[1])
+    if start >= len(body):
+        return 416, b"", {**headers, "Content-Range": f"bytes */{len(body)}"}
+
+    return (
+        206,
+        body[start:],
+        {**headers, "Content-Range": f"bytes {start}-{len(body) - 1}/{len(body)}"},
+    )
+
+
+class SyntheticSpigetServer(StubSpigetServer):
+    """
+    A StubSpigetServer pre-loaded with the Spiget endpoints spud uses, serving generated plugins.
+
+    Plugin N is named PluginN, has ID N, is written by author N % 50,
+    and its latest version ID is `version_id`, which can be changed to publish an update.
+    It was last updated at N, unless it is in `update_dates`.
+    """
+
+    def __init__(
+        self, plugin_count: int, jar_size: int = 64 * 1024, latency: float = 0.0
+    ) -> None:
+        """
+        :param plugin_count: How many plugins exist
+        :param jar_size: The approximate size in bytes of every downloaded jar
+        :param latency: Seconds to sleep before answering each request
+        """
+        super().__init__(latency)
+        self.plugin_count = plugin_count
+        self.version_id = 1
+        self.update_dates: Dict[int, int] = {}
+        self.jar = synthetic_jar(jar_size)
+
+        self.route(r"/search/resources/(.+)", self.search_route)
+        self.route(r"/resources", self.resources_route)
+        self.route(r"/resources/(\d+)", self.resource_route)
+        self.route(r"/resources/(\d+)/download", self.download_route)
+        self.route(r"/resources/(\d+)/updates/latest", self.update_route)
+        self.route(r"/authors/(\d+)", self.author_route)
+
+    def plugin(self, plugin_id: int) -> dict:
+        """Get the full resource document of a plugin"""
+        return {
+            "id": plugin_id,
+            "name": f"Plugin{plugin_id}",
+            "tag": f"The number {plugin_id} plugin",
+            "downloads": self.plugin_count - plugin_id,
+            "version": {"id": self.version_id, "uuid": ""},
+            "file": {"type": ".jar", "size": len(self.jar), "sizeUnit": "B"},
+            "author": {"id": plugin_id % 50},
+            "updateDate": self.update_dates.get(plugin_id, plugin_id),
+            "description": base64.b64encode(b"<p>A plugin</p>" * 100).decode(),
+        }
+
+    def search_route(self, request: BaseHTTPRequestHandler, match) -> RouteResult:
+        """Find plugins whose names contain the query, most downloaded first"""
+        params = query_params(request)
+        query = match[1].lower()
+        size = int(params.get("size", 10))
+        fields = params.get("fields", "").split(",")
+
+        results = []
+        for plugin_id in range(self.plugin_count):
+            if query in f"plugin{plugin_id}":
+                plugin = self.plugin(plugin_id)
+                results.append({key: plugin[key] for key in fields if key in plugin})
+                if len(results) == size:
+                    break
+
+        if not results:
+            return 404, {"error": "resource not found"}, {}
+        return 200, results, {}
+
+    def resources_route(self, request: BaseHTTPRequestHandler, _match) -> RouteResult:
+        """Get a page of every plugin, most recently updated first"""
+        params = query_params(request)
+        size = int(params.get("size", 10))
+        page = int(params.get("page", 1))
+        fields = params.get("fields", "").split(",")
+
+        plugins = sorted(
+            (self.plugin(plugin_id) for plugin_id in range(self.plugin_count)),
+            key=lambda plugin: plugin["updateDate"],
+            reverse=True,
+        )
+        return (
+            200,
+            [
+                {key: plugin[key] for key in fields if key in plugin}
+                for plugin in plugins[(page - 1) * size : page * size]
+            ],
+            {},
+        )
+
+    def resource_route(self, request: BaseHTTPRequestHandler, match) -> RouteResult:
+        """Get a plugin, optionally only some of its fields"""
+        plugin_id = int(match[1])
+        if plugin_id >= self.plugin_count:
+            return 404, {"error": "resource not found"}, {}
+
+        plugin = self.plugin(plugin_id)
+        fields = query_params(request).get("fields")
+        if fields:
+            plugin = {key: plugin[key] for key in fields.split(",") if key in plugin}
+        return 200, plugin, {}
+
+    def download_route(self, request: BaseHTTPRequestHandler, match) -> RouteResult:
+        """Download a plugin's jar, or part of it"""
+        if int(match[1]) >= self.plugin_count:
+            return 404, {"error": "resource not found"}, {}
+        return ranged(request, self.jar, {"Content-Type": "application/java-archive"})
+
+    def update_route(self, _request, match) -> RouteResult:
+        """Get the latest update of a plugin"""
+        changelog = f"<p>Version {self.version_id} of plugin {match[1]}</p>" * 50
+        return (
+            200,
+            {
+                "id": int(match[1]) * 1000 + self.version_id,
+                "title": f"Version {self.version_id}",
+                "description": base64.b64encode(changelog.encode()).decode(),
+                "date": 0,
+                "likes": 0,
+            },
+            {},
+        )
+
+    @staticmethod
+    def author_route(_request, match) -> RouteResult:
+        """Get an author"""
+        return 200, {"id": int(match[1]), "name": f"Author{match[1]}"}, {}
+
+
+def synthetic_jar(size: int) -> bytes:
+    """Create a jar of about `size` bytes, with incompressible contents so it stays that size"""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as jar:
+        jar.writestr("plugin.yml", "name: Synthetic\nversion: 1.0\nmain: a.B\n")
+        jar.writestr(
+            "data.bin",
+            random.Random(size).getrandbits(size * 8).to_bytes(size, "little"),
+        )
+    return buffer.getvalue()
+
+
+def plugin_jar(name: str = "Test", **fields: str) -> bytes:
+    """Create a small jar whose plugin.yml has a name and any other fields"""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as jar:
+        jar.writestr(
+            "plugin.yml",
+            "".join(
+                f"{key}: {value}\n" for key, value in {"name": name, **fields}.items()
+            ),
+        )
+    return buffer.getvalue()
+
+
+def enter_context(test: unittest.TestCase, manager: ContextManager[T]) -> T:
+    """
+    Enter a context manager, which is exited when the test is cleaned up, even if setUp fails.
+    Like TestCase.enterContext, which needs Python 3.11.
+    """
+    stack = contextlib.ExitStack()
+    test.addCleanup(stack.close)
+    return stack.enter_context(manager)
+
+
+def temporary_directory(test: unittest.TestCase) -> str:
+    """Create a temporary directory, which is removed when the test is cleaned up, even if setUp fails"""
+    directory = tempfile.mkdtemp()
+    test.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+    return directory
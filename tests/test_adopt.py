@@ -0,0 +1,135 @@
+# pylint: disable=missing-module-docstring, missing-class-docstring, missing-function-docstring
+import os
+import unittest
+import zipfile
+
+from spud import adopt, api
+from spud.utils import Utils
+from tests.stub_server import StubSpigetServer, enter_context, temporary_directory
+
+# Search results by name on the stub server
+RESOURCES = {
+    "LuckPerms": {"id": 1, "name": "LuckPerms", "author": {"id": 10}},
+    "Essentials": {"id": 2, "name": "Essentials", "author": {"id": 20}},
+    "Thing": {"id": 3, "name": "Something Else", "author": {"id": 10}},
+}
+AUTHORS = {10: "Luck", 20: "Other"}
+
+
+class TestAdopter(unittest.TestCase):
+    def setUp(self):
+        self.server = enter_context(self, StubSpigetServer())
+        self.server.route(
+            r"/search/resources/(.+)",
+            lambda _request, match: (
+                200,
+                [
+                    {
+                        "tag": "",
+                        "downloads": 1,
+                        "version": {"id": 99},
+                        "file": {},
+                        **RESOURCES[match[1]],
+                    }
+                ],
+                {},
+            ),
+        )
+        self.server.route(
+            r"/authors/(\d+)",
+            lambda _request, match: (
+                200,
+                {"id": int(match[1]), "name": AUTHORS[int(match[1])]},
+                {},
+            ),
+        )
+        self.server.json_route(
+            r"/resources/\d+/versions",
+            [{"id": 99, "name": "5.5"}, {"id": 55, "name": "v5.4"}],
+        )
+        self.spiget = api.SpigetAPI(base_api_url=self.server.url)
+        self.directory = temporary_directory(self)
+
+    def tearDown(self):
+        self.spiget.close()
+
+    def jar(self, filename, plugin_yml=None):
+        path = os.path.join(self.directory, filename)
+        with zipfile.ZipFile(path, "w") as jar:
+            jar.writestr("a/B.class", b"\xca\xfe\xba\xbe")
+            if plugin_yml:
+                jar.writestr("plugin.yml", plugin_yml)
+        return path
+
+    def test_adopt(self):
+        luckperms = self.jar(
+            "LuckPerms.jar", "name: LuckPerms\nversion: 5.4\nauthors: [Luck]\n"
+        )
+        self.jar("LuckPerms-copy.jar", "name: LuckPerms\nversion: 5.4\nauthor: Luck\n")
+        self.jar("ess.jar", "name: Essentials\nversion: 2.0\n")
+        # The same name, but by someone else
+        self.jar("ess-fork.jar", "name: Essentials\nversion: 2.0\nauthor: someone\n")
+        self.jar("Thing.jar", "name: Thing\nversion: 1\nauthor: Luck\n")
+        self.jar("NoYml.jar")
+        managed = self.jar("Managed.jar", "name: Managed\n")
+        Utils.inject_metadata_file(
+            {"name": "Managed", "id": 4, "version": {"id": 1}}, managed
+        )
+        size = os.path.getsize(luckperms)
+        file_hash = Utils.hash_file(luckperms)
+
+        adopted, messages = adopt.Adopter(self.spiget, self.directory, jobs=4).adopt()
+        messages = [text for text, _ in messages]
+
+        self.assertEqual(adopted, 3)
+        self.assertIn(
+            "Adopted LuckPerms.jar as LuckPerms (ID 1), high confidence: same name and author",
+            messages,
+        )
+        self.assertIn(
+            "Adopted ess.jar as Essentials (ID 2), medium confidence: "
+            "same name, plugin.yml lists no authors",
+            messages,
+        )
+        self.assertIn(
+            "ess-fork.jar: best guess is Essentials (ID 2), low confidence: "
+            "same name, different author. Not adopted",
+            messages,
+        )
+        self.assertIn(
+            "Thing.jar: best guess is Something Else (ID 3), low confidence: different name. "
+            "Not adopted",
+            messages,
+        )
+        self.assertIn(
+            "NoYml.jar has no valid plugin.yml, so it wasn't adopted", messages
+        )
+
+        metadata = Utils.load_metadata_file(luckperms)
+        self.assertEqual(metadata["plugin_id"], 1)
+        self.assertEqual(metadata["plugin_version_id"], 55)
+        self.assertEqual(metadata["file_size"], size)
+        self.assertEqual(metadata["file_hash"], file_hash)
+        # 2.0 isn't a listed version, so the next update replaces it
+        ess = Utils.load_metadata_file(os.path.join(self.directory, "ess.jar"))
+        self.assertEqual(ess["plugin_version_id"], 0)
+        for filename in ("ess-fork.jar", "Thing.jar"):
+            self.assertIsNone(
+                Utils.load_metadata_file(os.path.join(self.directory, filename))
+            )
+
+        # Each name is searched for and each author looked up once, and managed jars are skipped
+        searches = [path for path in self.server.requests if "/search/" in path]
+        self.assertEqual(
+            sorted(searches),
+            [
+                "/search/resources/Essentials",
+                "/search/resources/LuckPerms",
+                "/search/resources/Thing",
+            ],
+        )
+        self.assertEqual(self.server.requests.count("/authors/10"), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
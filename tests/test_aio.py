@@ -0,0 +1,154 @@
+# pylint: disable=missing-module-docstring, missing-class-docstring, missing-function-docstring
+import asyncio
+import base64
+import os
+import time
+import unittest
+from unittest import mock
+
+from spud import settings
+from spud.ratelimit import RateLimiter
+from tests.stub_server import (
+    StubSpigetServer,
+    enter_context,
+    plugin_jar,
+    temporary_directory,
+)
+
+try:
+    import aiohttp
+
+    from spud.aio import AsyncSpigetAPI
+except ImportError:
+    aiohttp = None
+
+
+@unittest.skipIf(aiohttp is None, "aiohttp is not installed")
+class TestAsyncAPI(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.server = enter_context(self, StubSpigetServer())
+        self.server.route(
+            r"/search/resources/(.+)",
+            lambda _request, match: (
+                200,
+                [
+                    {
+                        "id": len(match[1]),
+                        "name": f"Other{len(match[1])}",
+                        "tag": "",
+                        "downloads": 1,
+                        "version": {"id": 1},
+                        "file": {},
+                        "author": {"id": 7},
+                    }
+                ],
+                {},
+            ),
+        )
+        self.server.json_route(r"/authors/7", {"id": 7, "name": "Luck"})
+        self.server.json_route(
+            r"/resources/1", {"id": 1, "name": "Test", "version": {"id": 5}}
+        )
+        self.server.route(
+            r"/resources/1/download", lambda _request, _match: (200, plugin_jar(), {})
+        )
+        self.server.json_route(
+            r"/resources/1/updates/latest",
+            {
+                "id": 1,
+                "title": "",
+                "date": 0,
+                "likes": 0,
+                "description": base64.b64encode(b"<p>Fixed  bugs</p>").decode(),
+            },
+        )
+        self.directory = temporary_directory(self)
+
+    def client(self, **kwargs):
+        return AsyncSpigetAPI(base_api_url=self.server.url, backoff_factor=0, **kwargs)
+
+    async def test_search_plugins(self):
+        async with self.client() as spiget:
+            plugins = await spiget.search_plugins("LuckPerms")
+
+        self.assertEqual([plugin["author"]["name"] for plugin in plugins], ["Luck"] * 2)
+        self.assertEqual(self.server.requests.count("/authors/7"), 1)
+
+    async def test_update(self):
+        async with self.client() as spiget:
+            metadata = {"search_name": "Test", "plugin_id": 1, "plugin_version_id": 1}
+            plugin = await spiget.get_plugin_info_if_update(metadata)
+            self.assertEqual(plugin["version"]["id"], 5)
+
+            filename = os.path.join(self.directory, "Test.jar")
+            result = await spiget.download_plugin(plugin, filename)
+            self.assertTrue(result["status"])
+            self.assertEqual(os.listdir(self.directory), ["Test.jar"])
+
+            update = await spiget.get_latest_update_info(plugin)
+            self.assertEqual(update["description"], "Fixed bugs")
+
+    async def test_retry_and_shared_connector(self):
+        connector = aiohttp.TCPConnector(limit=2)
+        try:
+            self.server.fail_next = [503]
+            async with self.client(connector=connector) as first:
+                plugin = await first.get_plugin_by_id(1)
+            # The shared connector outlives the first client
+            async with self.client(connector=connector) as second:
+                self.assertEqual(await second.get_plugin_by_id(1), plugin)
+        finally:
+            await connector.close()
+
+        self.assertEqual(self.server.request_count, 3)
+
+    async def test_rate_limited(self):
+        limited = [1]
+
+        def resource(_request, _match):
+            if limited[0]:
+                limited[0] -= 1
+                return 429, {"error": "rate limited"}, {"Retry-After": "0.2"}
+            return 200, {"id": 2, "version": {"id": 3}}, {}
+
+        self.server.route(r"/resources/2", resource)
+        limiter = RateLimiter(backoff_factor=0)
+
+        async with self.client(rate_limiter=limiter) as spiget:
+            start = time.perf_counter()
+            self.assertEqual((await spiget.get_plugin_by_id(2))["version"]["id"], 3)
+            self.assertGreaterEqual(time.perf_counter() - start, 0.2)
+            self.assertEqual(self.server.request_count, 2)
+
+            # A 429 body is never returned as the resource
+            limited[0] = 10
+            with mock.patch.object(settings, "RATE_LIMIT_RETRIES", 1):
+                with self.assertRaises(aiohttp.ClientResponseError):
+                    await spiget.get_plugin_by_id(2)
+
+            with self.assertRaises(aiohttp.ClientResponseError):
+                await spiget.get_latest_update_info({"id": 404})
+
+    async def test_cancel_download(self):
+        self.server.latency = 1
+        async with self.client() as spiget:
+            filename = os.path.join(self.directory, "Test.jar")
+            task = asyncio.ensure_future(
+                spiget.download_plugin({"id": 1, "name": "Test"}, filename)
+            )
+            await asyncio.sleep(0.1)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        self.assertEqual(os.listdir(self.directory), [])
+
+    async def test_timeout(self):
+        self.server.latency = 1
+        async with self.client(timeout=(1, 0.1), retries=0) as spiget:
+            with self.assertRaises(asyncio.TimeoutError):
+                await spiget.get_plugin_by_id(1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,9 +1,27 @@
 # pylint: disable=missing-module-docstring, missing-class-docstring, missing-function-docstring
+import gzip
+import hashlib
+import json
 import os
+import tempfile
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from unittest import mock
 
-from spud import api
+from requests import HTTPError
+
+from spud import api, settings
+from spud.utils import Utils
+from tests.stub_server import (
+    StubSpigetServer,
+    SyntheticSpigetServer,
+    enter_context,
+    plugin_jar,
+    ranged,
+    synthetic_jar,
+    temporary_directory,
+)
 
 
 class TestAPI(unittest.TestCase):
@@ -39,5 +57,355 @@ class TestAPI(unittest.TestCase):
         self.assertTrue(Path("LuckPerms.jar").stat().st_size > 100000)
 
 
+class TestAPISession(unittest.TestCase):
+    def setUp(self):
+        self.server = enter_context(self, StubSpigetServer())
+        self.server.json_route(r"/resources/\d+", {"id": 1, "version": {"id": 2}})
+        self.spiget = api.SpigetAPI(base_api_url=self.server.url, backoff_factor=0)
+
+    def tearDown(self):
+        self.spiget.close()
+
+    def test_connection_reuse(self):
+        for _ in range(5):
+            self.spiget.call_api("/resources/1")
+        self.assertEqual(self.server.request_count, 5)
+        self.assertEqual(self.server.connection_count, 1)
+
+    def test_retry_server_error(self):
+        self.server.fail_next = [500, 503]
+        self.assertEqual(self.spiget.get_plugin_by_id(1)["version"]["id"], 2)
+        self.assertEqual(self.server.request_count, 3)
+
+    def test_retries_exhausted(self):
+        self.server.fail_next = [502] * 10
+        with self.assertRaises(HTTPError):
+            self.spiget.call_api("/resources/1")
+        self.assertEqual(self.server.request_count, 4)
+
+    def test_download_plugin_atomic(self):
+        jar = synthetic_jar(1024 * 1024)
+        self.server.route(
+            r"/resources/1/download", lambda _request, _match: (200, jar, {})
+        )
+        self.server.json_route(r"/resources/2/download", {"not": "a jar"})
+        plugin = {"id": 1, "name": "Test", "version": {"id": 3}}
+
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "Test.jar")
+
+            result = self.spiget.download_plugin(plugin, filename)
+            self.assertTrue(result["status"])
+            self.assertEqual(Utils.load_metadata_file(filename)["plugin_version_id"], 3)
+
+            # A failed download leaves the old jar alone
+            result = self.spiget.download_plugin({**plugin, "id": 2}, filename)
+            self.assertFalse(result["status"])
+            self.assertEqual(os.listdir(directory), ["Test.jar"])
+            self.assertEqual(Utils.load_metadata_file(filename)["plugin_id"], 1)
+
+    def test_download_plugin_unchanged(self):
+        served = {"body": plugin_jar(version="v1"), "etag": '"v1"'}
+        etags = []
+
+        def download(request, _match):
+            etags.append(request.headers.get("If-None-Match"))
+            if (
+                served["etag"]
+                and request.headers.get("If-None-Match") == served["etag"]
+            ):
+                return 304, b"", {}
+            headers = {"ETag": served["etag"]} if served["etag"] else {}
+            return 200, served["body"], headers
+
+        self.server.route(r"/resources/1/download", download)
+        plugin = {
+            "id": 1,
+            "name": "Test",
+            "version": {"id": 1},
+            "file": {"type": ".jar", "size": 0.1, "sizeUnit": "KB"},
+        }
+
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "Test.jar")
+            self.assertTrue(self.spiget.download_plugin(plugin, filename)["status"])
+            metadata = Utils.load_metadata_file(filename)
+            self.assertEqual(metadata["file_size"], len(served["body"]))
+            self.assertEqual(metadata["file_etag"], '"v1"')
+
+            # The server says the file is unchanged, so it isn't downloaded again
+            plugin["version"]["id"] = 2
+            result = self.spiget.download_plugin(plugin, filename)
+            self.assertIn("unchanged", result["message"])
+            self.assertEqual(Utils.load_metadata_file(filename)["plugin_version_id"], 2)
+
+            # Spiget lists a different size, so the file has changed
+            served.update(body=plugin_jar(version="v3" * 1000), etag="")
+            plugin["version"]["id"] = 3
+            plugin["file"]["size"] = 2.5
+            result = self.spiget.download_plugin(plugin, filename)
+            self.assertEqual(result["message"], f"Downloaded {filename}")
+            self.assertEqual(etags, [None, '"v1"', None])
+
+            # Without an ETag, the same bytes still don't replace the jar
+            plugin["version"]["id"] = 4
+            result = self.spiget.download_plugin(plugin, filename)
+            self.assertIn("unchanged", result["message"])
+            self.assertEqual(Utils.load_metadata_file(filename)["plugin_version_id"], 4)
+            self.assertEqual(os.listdir(directory), ["Test.jar"])
+
+    def test_search_plugins_authors(self):
+        # Both searches for the query find a different, weak match by the same author
+        self.server.route(
+            r"/search/resources/(.+)",
+            lambda _request, match: (
+                200,
+                [
+                    {
+                        "id": len(match[1]),
+                        "name": f"Other{len(match[1])}",
+                        "tag": "",
+                        "downloads": 1,
+                        "version": {"id": 1},
+                        "file": {},
+                        "author": {"id": 7},
+                    }
+                ],
+                {},
+            ),
+        )
+        self.server.json_route(r"/authors/7", {"id": 7, "name": "Luck"})
+
+        plugins = self.spiget.search_plugins("LuckPerms", resolve_authors=False)
+        self.assertEqual(len(plugins), 2)
+        self.assertNotIn("name", plugins[0]["author"])
+        self.assertEqual(self.server.request_count, 2)
+
+        for _ in range(2):
+            plugins = self.spiget.search_plugins("LuckPerms")
+            self.assertEqual(
+                [plugin["author"]["name"] for plugin in plugins], ["Luck"] * 2
+            )
+
+        # The author is only looked up once
+        self.assertEqual(self.server.requests.count("/authors/7"), 1)
+        self.assertEqual(self.server.request_count, 7)
+
+    def test_search_plugins_strong_match(self):
+        def search(_request, match):
+            searches.append(match[1])
+            return (
+                200,
+                [
+                    {
+                        "id": plugin_id,
+                        "name": name,
+                        "tag": "",
+                        "downloads": downloads,
+                        "version": {"id": 1},
+                        "file": {},
+                        "author": {"id": 7},
+                    }
+                    for plugin_id, name, downloads in results
+                ],
+                {},
+            )
+
+        searches = []
+        self.server.route(r"/search/resources/(.+)", search)
+
+        # Every result is ranked, not just the most downloaded
+        results = [(1, "Essentials Chat", 900), (2, "[1.17] Essentials", 10)]
+        plugins = self.spiget.search_plugins("Essentials", resolve_authors=False)
+        self.assertEqual([plugin["id"] for plugin in plugins], [2, 1])
+        self.assertEqual(plugins[0]["name"], "Essentials")
+        # Neither is a good match for EssentialsX, so "Essentials X" is searched for too
+        searches.clear()
+        self.spiget.search_plugins("EssentialsX", resolve_authors=False)
+        self.assertEqual(searches, ["EssentialsX", "Essentials%20X"])
+
+        # The exact match is good enough not to search again
+        results = [(3, "EssentialsX", 5), (4, "EssentialsX Chat", 500)]
+        searches.clear()
+        plugins = self.spiget.search_plugins("EssentialsX", resolve_authors=False)
+        self.assertEqual([plugin["id"] for plugin in plugins], [3, 4])
+        self.assertEqual(searches, ["EssentialsX"])
+
+    def test_update_check_fields(self):
+        metadata = {"search_name": "Plugin1", "plugin_id": 1, "plugin_version_id": 1}
+        with SyntheticSpigetServer(2) as server, api.SpigetAPI(
+            base_api_url=server.url
+        ) as spiget:
+            self.assertIsNone(spiget.get_plugin_info_if_update(metadata))
+
+            server.version_id = 2
+            server.reset_counters()
+            plugin = spiget.get_plugin_info_if_update(metadata)
+
+        # Only what's needed to download the update is fetched, not the description
+        self.assertEqual(set(plugin), {"id", "name", "version", "file"})
+        self.assertLess(server.bytes_sent, len(json.dumps(server.plugin(1))) / 4)
+
+
+class TestRankPlugins(unittest.TestCase):
+    @staticmethod
+    def plugin(plugin_id, name, downloads):
+        return {"id": plugin_id, "name": name, "tag": "", "downloads": downloads}
+
+    def test_rank_plugins(self):
+        plugin_list = [
+            self.plugin(1, "Chat Manager", 100000),
+            self.plugin(2, "Vault Chat", 500),
+            self.plugin(3, "ChatControl", 1000),
+            self.plugin(4, "Chat", 10),
+            self.plugin(3, "ChatControl", 1000),
+        ]
+        ranked = api.SpigetAPI.rank_plugins("Chat", plugin_list)
+
+        # Exact, then prefixes by downloads, then names containing the query, without duplicates
+        self.assertEqual([plugin["id"] for plugin in ranked], [4, 1, 3, 2])
+        self.assertEqual(len(plugin_list), 5)
+
+    def test_is_strong_match(self):
+        self.assertTrue(
+            api.SpigetAPI.is_strong_match(
+                "World Edit", [self.plugin(1, "WorldEdit", 1)]
+            )
+        )
+        self.assertFalse(
+            api.SpigetAPI.is_strong_match(
+                "WorldEdit", [self.plugin(1, "FastAsyncWE", 10**6)]
+            )
+        )
+        self.assertFalse(api.SpigetAPI.is_strong_match("WorldEdit", []))
+
+
+class TestResumableDownload(unittest.TestCase):
+    def setUp(self):
+        self.server = enter_context(self, StubSpigetServer())
+        self.spiget = api.SpigetAPI(base_api_url=self.server.url, backoff_factor=0)
+        self.jar = synthetic_jar(256 * 1024)
+        self.ranges = []
+
+        self.directory = temporary_directory(self)
+        self.filename = os.path.join(self.directory, "Test.jar")
+        self.plugin = {"id": 1, "name": "Test", "version": {"id": 1}}
+
+        # Bytes are only kept a whole chunk at a time, so cuts are made between chunks
+        patcher = mock.patch.object(settings, "DOWNLOAD_CHUNK_SIZE", 1000)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.spiget.close()
+
+    def serve(self, body, supports_ranges=True):
+        def download(request, _match):
+            self.ranges.append(request.headers.get("Range"))
+            if supports_ranges:
+                return ranged(request, body, {"ETag": '"jar"'})
+            return 200, body, {}
+
+        self.server.routes.clear()
+        self.server.route(r"/resources/1/download", download)
+
+    def assert_downloaded(self):
+        self.assertEqual(os.listdir(self.directory), ["Test.jar"])
+        metadata = Utils.load_metadata_file(self.filename)
+        self.assertEqual(metadata["file_size"], len(self.jar))
+        self.assertEqual(metadata["file_hash"], hashlib.sha256(self.jar).hexdigest())
+
+    def test_resume(self):
+        self.serve(self.jar)
+        self.server.cut_next = [1000, 50000]
+
+        self.assertTrue(
+            self.spiget.download_plugin(self.plugin, self.filename)["status"]
+        )
+        self.assertEqual(self.ranges, [None, "bytes=1000-", "bytes=51000-"])
+        self.assert_downloaded()
+
+    def test_ranges_unsupported(self):
+        self.serve(self.jar, supports_ranges=False)
+        self.server.cut_next = [1000]
+
+        self.assertTrue(
+            self.spiget.download_plugin(self.plugin, self.filename)["status"]
+        )
+        self.assertEqual(self.ranges, [None, "bytes=1000-"])
+        self.assert_downloaded()
+
+    def test_resume_next_time(self):
+        self.serve(self.jar)
+        self.server.cut_next = [1000, 2000]
+
+        with mock.patch.object(settings, "DOWNLOAD_RESUMES", 1):
+            result = self.spiget.download_plugin(self.plugin, self.filename)
+        self.assertFalse(result["status"])
+        self.assertEqual(len(os.listdir(self.directory)), 1)
+
+        # The partial download is kept and resumed
+        self.assertTrue(
+            self.spiget.download_plugin(self.plugin, self.filename)["status"]
+        )
+        self.assertEqual(self.ranges[-1], "bytes=3000-")
+        self.assert_downloaded()
+
+    def test_gzip_encoded(self):
+        encodings = []
+
+        def download(request, _match):
+            encodings.append(request.headers.get("Accept-Encoding"))
+            self.ranges.append(request.headers.get("Range"))
+            # Compressed even though the client asked for it not to be
+            return 200, gzip.compress(self.jar), {"Content-Encoding": "gzip"}
+
+        self.server.route(r"/resources/1/download", download)
+        self.server.cut_next = [1000]
+
+        self.assertTrue(
+            self.spiget.download_plugin(self.plugin, self.filename)["status"]
+        )
+        self.assertEqual(encodings, ["identity", "identity"])
+        # Compressed downloads start again rather than resuming
+        self.assertEqual(self.ranges, [None, None])
+        self.assert_downloaded()
+
+    def test_parallel_same_jar(self):
+        self.serve(self.jar)
+
+        # Downloads of the same jar take turns with its partial file
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(
+                executor.map(
+                    lambda _: self.spiget.download_plugin(self.plugin, self.filename),
+                    range(4),
+                )
+            )
+
+        self.assertTrue(all(result["status"] for result in results), results)
+        self.assert_downloaded()
+
+    def test_corrupt_resume(self):
+        self.serve(self.jar, supports_ranges=False)
+        self.server.cut_next = [100000]
+        with mock.patch.object(settings, "DOWNLOAD_RESUMES", 0):
+            self.spiget.download_plugin(self.plugin, self.filename)
+
+        # A different file with the same layout, whose ranges don't check If-Range
+        other = bytearray(self.jar)
+        other[150000] ^= 0xFF
+        self.server.routes.clear()
+        self.server.route(
+            r"/resources/1/download",
+            lambda request, _match: ranged(request, bytes(other)),
+        )
+
+        result = self.spiget.download_plugin(self.plugin, self.filename)
+        self.assertFalse(result["status"])
+        self.assertIn("corrupt", result["message"])
+        self.assertEqual(os.listdir(self.directory), [])
+
+
 if __name__ == "__main__":
     unittest.main()
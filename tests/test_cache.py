@@ -0,0 +1,86 @@
+# pylint: disable=missing-module-docstring, missing-class-docstring, missing-function-docstring
+import unittest
+
+from spud import api
+from spud.cache import ResponseCache
+from tests.stub_server import StubSpigetServer, enter_context, temporary_directory
+
+
+class TestCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = temporary_directory(self)
+        self.server = enter_context(self, StubSpigetServer())
+        self.server.route(r"/authors/(\d+)", self.author_route)
+        self.cache = ResponseCache(
+            self.directory,
+            ttls=(
+                (r"/authors/\d+", 60),
+                (r"/resources/\d+", 0),
+                (r"/search/resources/\w+", 60),
+            ),
+        )
+        self.spiget = api.SpigetAPI(base_api_url=self.server.url, cache=self.cache)
+
+    def tearDown(self):
+        self.spiget.close()
+
+    @staticmethod
+    def author_route(request, match):
+        if request.headers.get("If-None-Match") == '"v1"':
+            return 304, b"", {"ETag": '"v1"'}
+        return 200, {"id": int(match[1]), "name": "Tom"}, {"ETag": '"v1"'}
+
+    def test_fresh_hit(self):
+        self.assertEqual(self.spiget.get_author(1)["name"], "Tom")
+        self.assertEqual(self.spiget.get_author(1)["name"], "Tom")
+        self.assertEqual(self.server.request_count, 1)
+
+    def test_uncached_endpoint(self):
+        self.server.json_route(r"/resources/\d+", {"id": 1})
+        self.spiget.get_plugin_by_id(1)
+        self.spiget.get_plugin_by_id(1)
+        self.assertEqual(self.server.request_count, 2)
+
+    def test_revalidate(self):
+        self.spiget.get_author(1)
+        self.cache.refresh = True
+
+        response = self.spiget.call_api("/authors/1")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["name"], "Tom")
+        self.assertEqual(self.server.request_count, 2)
+
+    def test_refresh_cached_search(self):
+        self.server.json_route(
+            r"/search/resources/\w+", [{"id": 1, "name": "Tom", "version": {"id": 1}}]
+        )
+        self.server.json_route(
+            r"/resources/1", {"id": 1, "name": "Tom", "version": {"id": 2}, "file": {}}
+        )
+
+        # Live search results are already up to date
+        plugin = self.spiget.search_api("Tom")[0]
+        self.assertIs(self.spiget.refresh_plugin(plugin), plugin)
+        self.assertEqual(self.server.request_count, 1)
+
+        # Results served from the cache may not be
+        plugin = self.spiget.search_api("Tom")[0]
+        self.assertEqual(self.spiget.refresh_plugin(plugin)["version"]["id"], 2)
+        self.assertEqual(
+            self.server.requests, ["/search/resources/Tom", "/resources/1"]
+        )
+
+    def test_evict_least_recently_used(self):
+        self.cache.max_size = 1000
+        for author_id in range(20):
+            self.spiget.call_api(f"/authors/{author_id}")
+            # Keep the first author in use
+            self.spiget.call_api("/authors/0")
+
+        self.assertLessEqual(self.cache.disk_usage(), 1000)
+        self.assertIsNotNone(self.cache.load(self.server.url + "/authors/0"))
+        self.assertIsNone(self.cache.load(self.server.url + "/authors/1"))
+
+
+if __name__ == "__main__":
+    unittest.main()
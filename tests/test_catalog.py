@@ -0,0 +1,75 @@
+# pylint: disable=missing-module-docstring, missing-class-docstring, missing-function-docstring
+import os
+import unittest
+from unittest import mock
+
+from spud import api, settings
+from spud.catalog import ResourceCatalog
+from spud.utils import Utils
+from tests.stub_server import SyntheticSpigetServer, enter_context, temporary_directory
+
+
+class TestResourceCatalog(unittest.TestCase):
+    def setUp(self):
+        self.server = enter_context(self, SyntheticSpigetServer(2500))
+        self.directory = temporary_directory(self)
+        self.catalog = ResourceCatalog(os.path.join(self.directory, "catalog"))
+        self.spiget = api.SpigetAPI(base_api_url=self.server.url, catalog=self.catalog)
+
+    def tearDown(self):
+        self.spiget.close()
+        self.catalog.close()
+
+    def test_refresh(self):
+        with mock.patch.object(settings, "CATALOG_PAGE_SIZE", 1000):
+            self.assertEqual(self.catalog.refresh(self.spiget), 2500)
+            self.assertEqual(self.server.request_count, 3)
+
+            # Only the resources updated since then are fetched again
+            self.server.update_dates[5] = 10000
+            self.server.reset_counters()
+            self.assertEqual(self.catalog.refresh(self.spiget), 2)
+            self.assertEqual(self.server.request_count, 1)
+
+        self.assertEqual(len(self.catalog), 2500)
+
+    def test_search(self):
+        self.catalog.add(self.server.plugin(plugin_id) for plugin_id in range(2500))
+
+        results = self.catalog.search("Plugin12")
+        self.assertEqual(len(results), 10)
+        self.assertEqual(results[0]["name"], "Plugin12")
+        self.assertTrue(
+            all(plugin["name"].startswith("Plugin12") for plugin in results)
+        )
+        self.assertEqual(self.catalog.search("plugin 12")[0]["id"], 12)
+        self.assertEqual(self.catalog.search("nothing"), [])
+
+        # No requests are made for queries the catalog has
+        plugins = self.spiget.search_plugins("Plugin7", resolve_authors=False)
+        self.assertEqual(plugins[0]["id"], 7)
+        self.assertEqual(self.server.request_count, 0)
+
+        # The API is searched for queries it doesn't
+        self.spiget.search_plugins("Missing", resolve_authors=False)
+        self.assertEqual(set(self.server.requests), {"/search/resources/Missing"})
+
+    def test_download_refreshed(self):
+        self.catalog.add(self.server.plugin(plugin_id) for plugin_id in range(10))
+        # A version was published since the catalog was refreshed
+        self.server.version_id = 7
+
+        plugin = self.spiget.search_plugins("Plugin3", resolve_authors=False)[0]
+        self.assertEqual(plugin["version"]["id"], 1)
+
+        plugin = self.spiget.refresh_plugin(plugin)
+        self.assertEqual(plugin["name"], "Plugin3")
+        self.assertEqual(plugin["file"]["type"], ".jar")
+
+        filename = os.path.join(self.directory, "Plugin3.jar")
+        self.assertTrue(self.spiget.download_plugin(plugin, filename)["status"])
+        self.assertEqual(Utils.load_metadata_file(filename)["plugin_version_id"], 7)
+
+
+if __name__ == "__main__":
+    unittest.main()
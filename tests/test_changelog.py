@@ -0,0 +1,57 @@
+# pylint: disable=missing-module-docstring, missing-class-docstring, missing-function-docstring
+import base64
+import unittest
+from unittest import mock
+
+from spud.changelog import ChangelogRenderer
+
+
+def encode(html):
+    return base64.b64encode(html.encode("UTF-8")).decode()
+
+
+class TestChangelogRenderer(unittest.TestCase):
+    def test_render(self):
+        html = (
+            "<h1>Version 2</h1>\r\n<ul><li>Fixed  a   bug</li>\n\n\n<li>Added &amp; removed</li></ul>"
+            "<script>alert('no')</script><p>Line one\r\n\r\nline two 😃</p>"
+        )
+        self.assertEqual(
+            ChangelogRenderer.render(encode(html)),
+            "Version 2 Fixed a bug Added & removed Line one\nline two 😃",
+        )
+
+    def test_truncate(self):
+        html = "<p>word</p>" * 1000
+        text = ChangelogRenderer.render(encode(html), limit=100)
+        self.assertEqual(len(text), 103)
+        self.assertTrue(text.startswith("word word"))
+        self.assertTrue(text.endswith("..."))
+
+    def test_stops_early(self):
+        html = "<p>" + "word " * 1000000 + "</p>"
+        with mock.patch.object(
+            ChangelogRenderer, "feed", autospec=True, side_effect=ChangelogRenderer.feed
+        ) as feed:
+            ChangelogRenderer.render(encode(html), limit=100)
+        # Only the first chunk is decoded and parsed
+        self.assertEqual(feed.call_count, 1)
+
+    def test_chunk_boundaries(self):
+        html = "<h1>Hello  world</h1><p>aaa bbb éxyz\n\n ok</p><p>x</p>"
+        expected = ChangelogRenderer.render(encode(html))
+        self.assertEqual(expected, "Hello world aaa bbb éxyz\nok x")
+
+        # Every word and character is split across chunks
+        with mock.patch("spud.changelog.BASE64_CHUNK_SIZE", 4):
+            self.assertEqual(ChangelogRenderer.render(encode(html)), expected)
+
+    def test_render_cached(self):
+        first = ChangelogRenderer.render_cached(-1, encode("<p>first</p>"))
+        second = ChangelogRenderer.render_cached(-1, encode("<p>second</p>"))
+        self.assertEqual(first, "first")
+        self.assertEqual(second, "first")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,8 +1,27 @@
 # pylint: disable=missing-module-docstring, missing-class-docstring, missing-function-docstring
+import base64
+import functools
+import io
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
 import unittest
+from contextlib import redirect_stdout
 from pathlib import Path
+from unittest import mock
 
-from spud import cli
+from spud import api, cli, settings
+from spud.utils import Utils
+from tests.stub_server import (
+    StubSpigetServer,
+    enter_context,
+    plugin_jar,
+    temporary_directory,
+)
 
 
 class TestCli(unittest.TestCase):
@@ -13,10 +32,352 @@ class TestCli(unittest.TestCase):
         self.assertTrue(args.noninteractive)
         self.assertEqual(args.plugins, ["LuckPerms", "EssentialsX"])
         self.assertEqual(args.action, "install")
-        self.assertEqual(args.directory, Path("/home/test"))
+        self.assertEqual(args.directories, [Path("/home/test")])
 
         args = cli.CLI.parse_args(["spud", "update", "LuckPerms", "EssentialsX"])
         self.assertFalse(args.noninteractive)
         self.assertEqual(args.plugins, ["LuckPerms", "EssentialsX"])
         self.assertEqual(args.action, "update")
-        self.assertEqual(Path(args.directory).absolute(), Path.cwd().absolute())
+        self.assertEqual(cli.CLI.expand_directories(args.directories), [Path(".")])
+        self.assertEqual(args.jobs, 1)
+        self.assertFalse(args.no_cache)
+        self.assertFalse(args.refresh)
+
+        args = cli.CLI.parse_args(
+            ["spud", "-j", "8", "--refresh", "--rate-limit", "0", "update"]
+        )
+        self.assertEqual(args.jobs, 8)
+        self.assertTrue(args.refresh)
+        self.assertEqual(args.rate_limit, 0)
+
+        args = cli.CLI.parse_args(["spud", "--interval", "600", "watch"])
+        self.assertEqual(args.action, "watch")
+        self.assertEqual(args.interval, 600)
+        self.assertEqual(args.jitter, settings.WATCH_JITTER)
+
+        with redirect_stdout(io.StringIO()), mock.patch("sys.stderr"):
+            with self.assertRaises(SystemExit):
+                cli.CLI.parse_args(["spud", "-j", "0", "update"])
+            # Watching with no interval would poll the API nonstop
+            with self.assertRaises(SystemExit):
+                cli.CLI.parse_args(["spud", "--interval", "0", "watch"])
+
+    def test_expand_directories(self):
+        with tempfile.TemporaryDirectory() as root:
+            for name in ("b", "a", "c"):
+                os.makedirs(os.path.join(root, name, "plugins"))
+            Path(root, "file").touch()
+
+            directories = cli.CLI.expand_directories(
+                [
+                    Path(root, "*", "plugins"),
+                    Path(root, "*"),
+                    Path(root, "a", "plugins"),
+                ]
+            )
+            self.assertEqual(
+                directories,
+                [
+                    *(Path(root, name, "plugins") for name in "abc"),
+                    *(Path(root, name) for name in "abc"),
+                ],
+            )
+
+    def test_light_startup(self):
+        # --version shouldn't import the heavy dependencies
+        script = (
+            "import sys\n"
+            "from spud.cli import CLI\n"
+            "sys.argv = ['spud', '--version']\n"
+            "try:\n"
+            "    CLI()\n"
+            "except SystemExit:\n"
+            "    pass\n"
+            "print([m for m in ('requests', 'bs4', 'emoji') if m in sys.modules])\n"
+        )
+        output = subprocess.run(
+            [sys.executable, "-c", script], capture_output=True, text=True, check=True
+        ).stdout
+        self.assertTrue(output.endswith("[]\n"))
+
+
+class TestCliActions(unittest.TestCase):
+    def setUp(self):
+        self.server = enter_context(self, StubSpigetServer())
+        self.server.route(
+            r"/resources/(\d+)",
+            lambda _request, match: (
+                200,
+                {"id": int(match[1]), "name": f"P{match[1]}", "version": {"id": 2}},
+                {},
+            ),
+        )
+        self.server.route(
+            r"/search/resources/(\w+)",
+            lambda _request, match: (
+                200,
+                [
+                    {
+                        "id": 100 + len(match[1]),
+                        "name": match[1],
+                        "tag": "",
+                        "downloads": 1,
+                        "version": {"id": 1},
+                        "file": {},
+                        "author": {"id": 1},
+                    }
+                ],
+                {},
+            ),
+        )
+        self.server.route(
+            r"/resources/\d+/download", lambda _request, _match: (200, plugin_jar(), {})
+        )
+        self.server.route(
+            r"/resources/\d+/versions/\d+/download",
+            lambda _request, _match: (200, plugin_jar(), {}),
+        )
+
+        self.cwd = os.getcwd()
+        self.directory = temporary_directory(self)
+
+        for plugin_id in range(10):
+            filename = os.path.join(self.directory, f"P{plugin_id}.jar")
+            with open(filename, "wb") as file:
+                file.write(plugin_jar())
+            Utils.inject_metadata_file(
+                {
+                    "name": f"P{plugin_id}",
+                    "id": plugin_id,
+                    "version": {"id": plugin_id % 3},
+                },
+                filename,
+            )
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+
+    def run_cli(self, *argv, directory=None):
+        api_class = functools.partial(api.SpigetAPI, base_api_url=self.server.url)
+        directory = directory or self.directory
+        output = io.StringIO()
+        with mock.patch(
+            "sys.argv", ["spud", "--no-cache", "--no-catalog", "-d", directory, *argv]
+        ):
+            with redirect_stdout(output):
+                cli.CLI(api_class)
+        return output.getvalue()
+
+    def test_parallel_update(self):
+        plugins = [f"P{plugin_id}" for plugin_id in range(10)]
+        output = self.run_cli("-n", "-j", "4", "update", *plugins)
+
+        # Output stays in input order
+        positions = [
+            output.index(f"P{plugin_id}.jar")
+            for plugin_id in range(10)
+            if plugin_id % 3 != 2
+        ]
+        self.assertEqual(positions, sorted(positions))
+        self.assertIn("7 updated, 3 left unchanged", output)
+
+        for plugin_id in range(10):
+            metadata = Utils.load_metadata_file(
+                os.path.join(self.directory, f"P{plugin_id}.jar")
+            )
+            self.assertEqual(metadata["plugin_version_id"], 2)
+
+    def test_update_deleted_resource(self):
+        # P4 was removed from Spiget
+        self.server.routes.insert(
+            0, (re.compile(r"/resources/4"), lambda _request, _match: (404, {}, {}))
+        )
+
+        output = self.run_cli(
+            "-n", "-j", "4", "update", *(f"P{plugin_id}" for plugin_id in range(10))
+        )
+
+        self.assertIn("Couldn't check P4.jar for updates", output)
+        self.assertIn("6 updated, 4 left unchanged", output)
+
+    def test_parallel_install(self):
+        names = ["alpha", "be", "gamma", "d"]
+        output = self.run_cli("-n", "-j", "4", "install", *names)
+
+        positions = [output.index(f"Query: {name}") for name in names]
+        self.assertEqual(positions, sorted(positions))
+        for name in names:
+            self.assertIn(f"{name} was installed successfully", output)
+            metadata = Utils.load_metadata_file(
+                os.path.join(self.directory, f"{name}.jar")
+            )
+            self.assertEqual(metadata["plugin_id"], 100 + len(name))
+
+        # Authors aren't looked up for non-interactive installs
+        self.assertFalse([path for path in self.server.requests if "authors" in path])
+
+    def test_install_duplicates(self):
+        output = self.run_cli("-n", "-j", "4", "install", "alpha", "alpha.jar", "alpha")
+
+        self.assertEqual(output.count("Query: alpha"), 1)
+        self.assertEqual(
+            len([path for path in self.server.requests if "download" in path]), 1
+        )
+
+    def test_interactive_update(self):
+        self.server.route(
+            r"/resources/(\d+)/updates/latest",
+            lambda _request, match: (
+                200,
+                {
+                    "id": int(match[1]),
+                    "title": "",
+                    "description": base64.b64encode(
+                        f"<p>Changes to P{match[1]}</p>".encode()
+                    ).decode(),
+                    "date": 0,
+                },
+                {},
+            ),
+        )
+
+        # Update P0, not P1, then input ends at P3
+        with mock.patch.object(Utils, "prompt", side_effect=["y", "n", EOFError]):
+            output = self.run_cli(
+                "-j", "2", "update", *(f"P{plugin_id}" for plugin_id in range(10))
+            )
+
+        self.assertIn("Changes to P3", output)
+        self.assertIn("Input ended, not updating the remaining plugins", output)
+        self.assertIn("1 updated, 9 left unchanged", output)
+
+        # Only settings.PREFETCH_DEPTH plugins were checked ahead of P3
+        self.assertNotIn("/resources/8", self.server.requests)
+        self.assertNotIn("/resources/9", self.server.requests)
+
+    def test_fleet_update(self):
+        others = [temporary_directory(self) for _ in range(2)]
+        for other in others:
+            for name in os.listdir(self.directory):
+                shutil.copy(os.path.join(self.directory, name), other)
+
+        output = self.run_cli(
+            "-n", "-j", "4", "-d", others[0], "-d", others[1], "update"
+        )
+
+        # Each plugin is looked up once, and each update downloaded once
+        self.assertEqual(
+            len([path for path in self.server.requests if "download" in path]), 7
+        )
+        self.assertEqual(
+            len([path for path in self.server.requests if path.count("/") == 2]),
+            10,
+        )
+
+        for directory in (self.directory, *others):
+            self.assertIn(f"{directory}: 7 updated, 3 left unchanged", output)
+            for plugin_id in range(10):
+                metadata = Utils.load_metadata_file(
+                    os.path.join(directory, f"P{plugin_id}.jar")
+                )
+                self.assertEqual(metadata["plugin_version_id"], 2)
+        self.assertIn("21 updated across 3 directories", output)
+
+    def test_fleet_update_deleted_resource(self):
+        other = temporary_directory(self)
+        for name in os.listdir(self.directory):
+            shutil.copy(os.path.join(self.directory, name), other)
+        # P4 was removed from Spiget
+        self.server.routes.insert(
+            0, (re.compile(r"/resources/4"), lambda _request, _match: (404, {}, {}))
+        )
+
+        output = self.run_cli("-n", "-j", "4", "-d", other, "update")
+
+        self.assertIn(f"Couldn't check {Path(other, 'P4.jar')} for updates", output)
+        self.assertIn(f"{other}: 6 updated, 4 left unchanged", output)
+        self.assertIn("12 updated across 2 directories", output)
+
+    def test_interactive_fleet_update(self):
+        self.server.json_route(
+            r"/resources/\d+/updates/latest",
+            {"id": 1, "title": "", "description": "", "date": 0},
+        )
+        other = temporary_directory(self)
+        for name in os.listdir(self.directory):
+            shutil.copy(os.path.join(self.directory, name), other)
+
+        # Update P0, then input ends at P1
+        with mock.patch.object(Utils, "prompt", side_effect=["y", EOFError]) as prompt:
+            output = self.run_cli(
+                "-j", "2", "-d", other, "update", "P0", "P1", "P3", "P4"
+            )
+
+        self.assertEqual(prompt.call_count, 2)
+        self.assertIn("Input ended, not updating the remaining plugins", output)
+        self.assertIn("2 updated across 2 directories", output)
+
+    def test_lock_sync(self):
+        self.assertIn("Locked 10 plugins", self.run_cli("lock"))
+        with open(os.path.join(self.directory, "spud.lock"), encoding="UTF-8") as file:
+            lock = json.load(file)["plugins"]
+        self.assertEqual(lock["P4.jar"]["plugin_version_id"], 1)
+
+        with tempfile.TemporaryDirectory() as directory:
+            shutil.copy(os.path.join(self.directory, "spud.lock"), directory)
+            self.server.reset_counters()
+
+            output = self.run_cli("-j", "4", "sync", directory=directory)
+            self.assertIn("10 downloaded, 0 failed, 0 already matched", output)
+
+            # Exactly the locked versions are downloaded, without searching
+            self.assertEqual(
+                sorted(self.server.requests),
+                sorted(
+                    f"/resources/{plugin_id}/versions/{plugin_id % 3}/download"
+                    for plugin_id in range(10)
+                ),
+            )
+            for filename, locked in lock.items():
+                metadata = Utils.load_metadata_file(os.path.join(directory, filename))
+                self.assertEqual(
+                    metadata["plugin_version_id"], locked["plugin_version_id"]
+                )
+
+            # Synced jars are left alone
+            output = self.run_cli("sync", directory=directory)
+            self.assertIn("0 downloaded, 0 failed, 10 already matched", output)
+
+            # Downloads must match the hashes of locked jars that have them
+            self.run_cli("lock", directory=directory)
+            with open(os.path.join(directory, "spud.lock"), encoding="UTF-8") as file:
+                lock = json.load(file)
+            lock["plugins"]["P0.jar"]["file_hash"] = "0" * 64
+            with open(
+                os.path.join(directory, "spud.lock"), "w", encoding="UTF-8"
+            ) as file:
+                json.dump(lock, file)
+            os.remove(os.path.join(directory, "P0.jar"))
+
+            output = self.run_cli("sync", directory=directory)
+            self.assertIn("P0.jar doesn't match the hash in the lockfile", output)
+            self.assertIn("0 downloaded, 1 failed, 9 already matched", output)
+
+    def test_timings(self):
+        timings_file = os.path.join(self.directory, "timings.json")
+        output = self.run_cli(
+            "-n", "--timings", "--timings-json", timings_file, "update"
+        )
+        self.assertIn("Endpoint /resources/{id}: 10 requests", output)
+
+        with open(timings_file, encoding="UTF-8") as file:
+            report = json.load(file)
+
+        self.assertEqual(report["endpoints"]["/resources/{id}/download"]["requests"], 7)
+        self.assertEqual(
+            report["endpoints"]["/resources/{id}/download"]["bytes"],
+            7 * len(plugin_jar()),
+        )
+        self.assertEqual(report["phases"]["download"]["calls"], 7)
+        self.assertEqual(report["phases"]["load_metadata"]["calls"], 10)
+        self.assertEqual(len(report["slowest_plugins"]), 5)
@@ -0,0 +1,129 @@
+# pylint: disable=missing-module-docstring, missing-class-docstring, missing-function-docstring
+import json
+import os
+import unittest
+
+from spud import api
+from spud.dependencies import DependencyResolver
+from tests.stub_server import (
+    StubSpigetServer,
+    enter_context,
+    plugin_jar,
+    temporary_directory,
+)
+
+# Plugin names to the plugins they depend on, on the stub server
+PLUGINS = {
+    "Alpha": ["Beta", "Gamma"],
+    "Beta": ["Delta"],
+    "Gamma": ["Delta", "Vault"],
+    "Delta": [],
+    "Epsilon": ["Zeta"],
+    "Zeta": ["Epsilon"],
+    "Eta": ["Missing"],
+}
+NAMES = list(PLUGINS)
+
+
+def dependency_jar(name):
+    return plugin_jar(name, version="1.0", main="a.B", depend=json.dumps(PLUGINS[name]))
+
+
+class TestDependencyResolver(unittest.TestCase):
+    def setUp(self):
+        self.server = enter_context(self, StubSpigetServer())
+        self.server.route(r"/search/resources/(.+)", self.search)
+        self.server.route(
+            r"/resources/(\d+)",
+            lambda _request, match: (
+                200,
+                {"id": int(match[1]), "version": {"id": 2}, "file": {}},
+                {},
+            ),
+        )
+        self.server.route(
+            r"/resources/(\d+)/download",
+            lambda _request, match: (200, dependency_jar(NAMES[int(match[1])]), {}),
+        )
+        self.spiget = api.SpigetAPI(base_api_url=self.server.url)
+
+        self.directory = temporary_directory(self)
+        self.resolver = DependencyResolver(self.spiget, self.directory, jobs=4)
+
+    def tearDown(self):
+        self.spiget.close()
+
+    @staticmethod
+    def search(_request, match):
+        if match[1] not in PLUGINS:
+            return 404, {"error": "resource not found"}, {}
+        return (
+            200,
+            [
+                {
+                    "id": NAMES.index(match[1]),
+                    "name": f"[1.17] {match[1]} | The best",
+                    "tag": "",
+                    "downloads": 1,
+                    "version": {"id": 1},
+                    "file": {},
+                    "author": {"id": 1},
+                }
+            ],
+            {},
+        )
+
+    def install(self, name):
+        with open(os.path.join(self.directory, f"{name}.jar"), "wb") as file:
+            file.write(dependency_jar(name))
+        return f"{name}.jar"
+
+    def test_resolve(self):
+        # Vault is already installed, under a different filename
+        with open(os.path.join(self.directory, "Vault-1.7.jar"), "wb") as file:
+            file.write(plugin_jar("Vault", version="1.7"))
+
+        messages = self.resolver.resolve([self.install("Alpha")])
+
+        self.assertEqual(
+            sorted(os.listdir(self.directory)),
+            ["Alpha.jar", "Beta.jar", "Delta.jar", "Gamma.jar", "Vault-1.7.jar"],
+        )
+        # Delta is depended on twice, but only downloaded once
+        self.assertEqual(self.server.requests.count("/resources/3/download"), 1)
+        self.assertNotIn("/search/resources/Vault", self.server.requests)
+        self.assertEqual(
+            sorted(text.split(",")[0] for text, _ in messages),
+            ["Installed Beta", "Installed Delta", "Installed Gamma"],
+        )
+
+    def test_cycles_and_missing(self):
+        messages = [
+            text
+            for text, _ in self.resolver.resolve(
+                [self.install("Epsilon"), self.install("Eta")]
+            )
+        ]
+
+        self.assertIn(
+            "Couldn't find Missing, which Eta depends on. Install it yourself", messages
+        )
+        self.assertIn(
+            "Circular dependency: Epsilon -> Zeta -> Epsilon. "
+            "The server won't load these plugins",
+            messages,
+        )
+        self.assertIn("Zeta.jar", os.listdir(self.directory))
+
+    def test_find_cycles(self):
+        self.assertEqual(
+            DependencyResolver.find_cycles(
+                {"A": ["B", "C"], "B": ["C"], "C": ["D"], "D": ["B"], "E": ["E"]}
+            ),
+            [["B", "C", "D", "B"], ["E", "E"]],
+        )
+        self.assertEqual(DependencyResolver.find_cycles({"A": ["B"], "B": []}), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
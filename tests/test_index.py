@@ -0,0 +1,64 @@
+# pylint: disable=missing-module-docstring, missing-class-docstring, missing-function-docstring
+import os
+import unittest
+import zipfile
+from unittest import mock
+
+from spud import settings
+from spud.index import MetadataIndex
+from spud.utils import Utils
+from tests.stub_server import temporary_directory
+
+
+class TestMetadataIndex(unittest.TestCase):
+    def setUp(self):
+        self.directory = temporary_directory(self)
+        self.jar = os.path.join(self.directory, "Test.jar")
+        self.write_jar(version_id=1)
+
+    def write_jar(self, version_id):
+        with zipfile.ZipFile(self.jar, "w") as jar:
+            jar.writestr("plugin.yml", "name: Test\n")
+        Utils.inject_metadata_file(
+            {"name": "Test", "id": 1, "version": {"id": version_id}}, self.jar
+        )
+
+    def load(self, filename="Test.jar"):
+        index = MetadataIndex(self.directory)
+        with mock.patch.object(
+            Utils, "load_metadata_file", wraps=Utils.load_metadata_file
+        ) as load_metadata_file:
+            metadata = index.load_metadata(filename)
+        index.save()
+        return metadata, load_metadata_file.call_count
+
+    def test_unchanged_jar_is_not_reopened(self):
+        self.assertEqual(
+            self.load(),
+            ({"search_name": "Test", "plugin_id": 1, "plugin_version_id": 1}, 1),
+        )
+        self.assertEqual(self.load()[1], 0)
+
+    def test_changed_jar_is_reread(self):
+        self.load()
+        self.write_jar(version_id=2)
+        metadata, reads = self.load()
+        self.assertEqual(metadata["plugin_version_id"], 2)
+        self.assertEqual(reads, 1)
+
+    def test_corrupt_index_is_rebuilt(self):
+        self.load()
+        with open(os.path.join(self.directory, settings.INDEX_FILENAME), "w") as file:
+            file.write("{not json")
+
+        metadata, reads = self.load()
+        self.assertEqual(metadata["plugin_id"], 1)
+        self.assertEqual(reads, 1)
+        self.assertEqual(self.load()[1], 0)
+
+    def test_missing_jar(self):
+        self.assertEqual(self.load("Missing.jar"), (None, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
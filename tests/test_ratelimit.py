@@ -0,0 +1,98 @@
+# pylint: disable=missing-module-docstring, missing-class-docstring, missing-function-docstring
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import formatdate
+from unittest import mock
+
+from requests import HTTPError
+
+from spud import api, settings
+from spud.ratelimit import RateLimiter
+from spud.timings import TIMINGS
+from tests.stub_server import StubSpigetServer, enter_context
+
+
+class TestRateLimiter(unittest.TestCase):
+    def test_token_bucket(self):
+        limiter = RateLimiter(rate=200, burst=5)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(lambda _: limiter.acquire(), range(45)))
+
+        # The burst is free, then 40 requests at 200 per second
+        self.assertGreaterEqual(time.perf_counter() - start, 0.19)
+
+    def test_unlimited(self):
+        limiter = RateLimiter(rate=0, burst=1)
+        self.assertEqual(sum(limiter.acquire() for _ in range(100)), 0)
+
+    def test_throttle(self):
+        limiter = RateLimiter(rate=100, burst=10, backoff_factor=0.1)
+        self.assertEqual(limiter.throttle(), 0.1)
+        self.assertEqual(limiter.throttle(), 0.2)
+        self.assertEqual(limiter.rate, 25)
+
+        limiter.succeed()
+        self.assertEqual(limiter.rate, 35)
+        self.assertGreaterEqual(limiter.acquire(), 0.15)
+
+    def test_parse_retry_after(self):
+        self.assertEqual(RateLimiter.parse_retry_after("3"), 3)
+        self.assertIsNone(RateLimiter.parse_retry_after(None))
+        self.assertIsNone(RateLimiter.parse_retry_after("soon"))
+        self.assertAlmostEqual(
+            RateLimiter.parse_retry_after(formatdate(time.time() + 60, usegmt=True)),
+            60,
+            delta=2,
+        )
+
+
+class TestRateLimitedAPI(unittest.TestCase):
+    def setUp(self):
+        self.server = enter_context(self, StubSpigetServer())
+        self.limited = 0
+
+        def resource(_request, _match):
+            if self.limited:
+                self.limited -= 1
+                return 429, {"error": "rate limited"}, {"Retry-After": "0.2"}
+            return 200, {"id": 1, "version": {"id": 2}}, {}
+
+        self.server.route(r"/resources/\d+", resource)
+        self.spiget = api.SpigetAPI(
+            base_api_url=self.server.url,
+            rate_limiter=RateLimiter(backoff_factor=0),
+        )
+        TIMINGS.reset(enabled=True)
+
+    def tearDown(self):
+        TIMINGS.reset(enabled=False)
+        self.spiget.close()
+
+    def test_retry_after(self):
+        self.limited = 1
+
+        start = time.perf_counter()
+        self.assertEqual(self.spiget.get_plugin_by_id(1)["version"]["id"], 2)
+        self.assertGreaterEqual(time.perf_counter() - start, 0.2)
+
+        self.assertEqual(self.server.request_count, 2)
+        report = TIMINGS.report()
+        self.assertEqual(report["rate_limited"], 1)
+        self.assertGreaterEqual(report["throttled_seconds"], 0.2)
+
+    def test_rate_limited_too_often(self):
+        self.limited = 10
+
+        with mock.patch.object(settings, "RATE_LIMIT_RETRIES", 2), mock.patch.object(
+            self.spiget.rate_limiter, "throttle"
+        ):
+            with self.assertRaises(HTTPError):
+                self.spiget.call_api("/resources/1")
+        self.assertEqual(self.server.request_count, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
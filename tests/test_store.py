@@ -0,0 +1,79 @@
+# pylint: disable=missing-module-docstring, missing-class-docstring, missing-function-docstring
+import os
+import unittest
+
+from spud import api
+from spud.store import JarStore
+from spud.utils import Utils
+from tests.stub_server import SyntheticSpigetServer, enter_context, temporary_directory
+
+
+class TestJarStore(unittest.TestCase):
+    def setUp(self):
+        self.server = enter_context(self, SyntheticSpigetServer(3, jar_size=1024))
+        self.root = temporary_directory(self)
+        self.store = JarStore(os.path.join(self.root, "store"))
+        self.spiget = api.SpigetAPI(base_api_url=self.server.url, store=self.store)
+
+        self.directories = []
+        for name in ("a", "b"):
+            directory = os.path.join(self.root, name)
+            os.mkdir(directory)
+            self.directories.append(directory)
+
+    def tearDown(self):
+        self.spiget.close()
+
+    def download(self, directory, plugin_id=1):
+        plugin = self.spiget.get_plugin_by_id(plugin_id)
+        filename = os.path.join(directory, "Plugin.jar")
+        self.assertTrue(self.spiget.download_plugin(plugin, filename)["status"])
+        return filename
+
+    def test_download_once(self):
+        first, second = (self.download(directory) for directory in self.directories)
+
+        self.assertEqual(self.server.requests.count("/resources/1/download"), 1)
+        self.assertTrue(os.path.samefile(first, second))
+        self.assertTrue(
+            os.path.samefile(first, self.store.find({"id": 1, "version": {"id": 1}}))
+        )
+
+    def test_locked_hash(self):
+        first = self.download(self.directories[0])
+        plugin = self.spiget.get_plugin_by_id(1)
+        locked = Utils.load_metadata_file(first)
+        filename = os.path.join(self.directories[1], "Plugin.jar")
+
+        # A stored jar without the locked hash isn't used, and the download is checked too
+        result = self.spiget.download_plugin(
+            plugin, filename, locked={**locked, "file_hash": "0" * 64}
+        )
+        self.assertFalse(result["status"])
+        self.assertFalse(os.path.exists(filename))
+
+        self.server.reset_counters()
+        self.assertTrue(
+            self.spiget.download_plugin(plugin, filename, locked=locked)["status"]
+        )
+        self.assertEqual(self.server.request_count, 0)
+        self.assertTrue(os.path.samefile(first, filename))
+
+    def test_collect_garbage(self):
+        first, _ = (self.download(directory) for directory in self.directories)
+        self.assertEqual(self.store.collect_garbage(), (0, 0))
+
+        # One directory moves to a new version, and the other stops using the plugin
+        self.server.version_id = 2
+        self.download(self.directories[1])
+        os.remove(first)
+
+        removed, freed = self.store.collect_garbage()
+        self.assertEqual(removed, 1)
+        self.assertGreater(freed, 1024)
+        self.assertIsNone(self.store.find({"id": 1, "version": {"id": 1}}))
+        self.assertIsNotNone(self.store.find({"id": 1, "version": {"id": 2}}))
+
+
+if __name__ == "__main__":
+    unittest.main()
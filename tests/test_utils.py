@@ -1,5 +1,9 @@
 # pylint: disable=missing-module-docstring, missing-class-docstring, missing-function-docstring
+import os
+import tempfile
 import unittest
+import zipfile
+
 from spud.utils import Utils
 
 
@@ -11,6 +15,48 @@ class MyTestCase(unittest.TestCase):
             Utils.split_title_case(title_case_words), "Testing This Method"
         )
 
+    def test_tokenize_name(self):
+        self.assertEqual(
+            Utils.tokenize_name("[1.17] LuckPerms | An advanced permissions plugin"),
+            {
+                "1",
+                "17",
+                "luckperms",
+                "luck",
+                "perms",
+                "an",
+                "advanced",
+                "permissions",
+                "plugin",
+            },
+        )
+
+    def test_load_plugin_description(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "Test.jar")
+            with zipfile.ZipFile(filename, "w") as jar:
+                jar.writestr(
+                    "plugin.yml",
+                    "name: Test\nversion: 1.0\nauthor: Ann\nauthors: [Bob, Ann]\n"
+                    "depend: [Vault]\nsoftdepend: PlaceholderAPI\n",
+                )
+
+            self.assertEqual(
+                Utils.load_plugin_description(filename),
+                {
+                    "name": "Test",
+                    "version": "1.0",
+                    "authors": ["Ann", "Bob"],
+                    "depend": ["Vault"],
+                    "softdepend": ["PlaceholderAPI"],
+                    "provides": [],
+                },
+            )
+
+            with zipfile.ZipFile(filename, "w") as jar:
+                jar.writestr("plugin.yml", "name: [unclosed\n")
+            self.assertIsNone(Utils.load_plugin_description(filename))
+
     def test_sanitise_api_plugin(self):
         name = "1.13-1.17 😃| Plugin Name 😃| 😃The Greatest plugin in the universe!!!!"
         final_name = "Plugin Name"
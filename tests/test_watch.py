@@ -0,0 +1,117 @@
+# pylint: disable=missing-module-docstring, missing-class-docstring, missing-function-docstring
+import io
+import os
+import threading
+import time
+import unittest
+from contextlib import redirect_stdout
+from unittest import mock
+
+from spud import api
+from spud.utils import Utils
+from spud.watch import Watcher
+from tests.stub_server import SyntheticSpigetServer, enter_context, temporary_directory
+
+
+class TestWatcher(unittest.TestCase):
+    def setUp(self):
+        self.server = enter_context(self, SyntheticSpigetServer(3, jar_size=1024))
+        self.directory = temporary_directory(self)
+        self.spiget = api.SpigetAPI(base_api_url=self.server.url)
+
+        for plugin_id in range(3):
+            plugin = self.spiget.get_plugin_by_id(plugin_id)
+            filename = os.path.join(self.directory, f"Plugin{plugin_id}.jar")
+            self.assertTrue(self.spiget.download_plugin(plugin, filename)["status"])
+
+        self.watcher = Watcher(self.spiget, self.directory, interval=60, jobs=2)
+
+    def tearDown(self):
+        self.spiget.close()
+
+    def downloads(self):
+        return [path for path in self.server.requests if path.endswith("/download")]
+
+    def test_poll(self):
+        self.watcher.poll()
+        self.assertFalse(os.path.exists(os.path.join(self.directory, "update")))
+
+        # Updates are staged without touching the installed jars
+        self.server.version_id = 2
+        self.server.reset_counters()
+        self.watcher.poll()
+        self.assertEqual(len(self.downloads()), 3)
+        for plugin_id in range(3):
+            filename = f"Plugin{plugin_id}.jar"
+            installed = Utils.load_metadata_file(os.path.join(self.directory, filename))
+            staged = Utils.load_metadata_file(
+                os.path.join(self.directory, "update", filename)
+            )
+            self.assertEqual(installed["plugin_version_id"], 1)
+            self.assertEqual(staged["plugin_version_id"], 2)
+
+        # Staged updates aren't downloaded again
+        self.server.reset_counters()
+        self.watcher.poll()
+        self.assertEqual(self.downloads(), [])
+        self.assertEqual(self.watcher.polls, 3)
+
+    def test_deleted_resource(self):
+        self.server.version_id = 2
+        # Plugin2 was removed from Spiget
+        self.server.plugin_count = 2
+
+        messages = [text for text, _ in self.watcher.poll()]
+
+        self.assertEqual(
+            sorted(os.listdir(os.path.join(self.directory, "update"))),
+            [".spud_index.json", "Plugin0.jar", "Plugin1.jar"],
+        )
+        self.assertTrue(
+            any(text.startswith("Couldn't check Plugin2.jar") for text in messages)
+        )
+
+    def test_run_survives_failed_poll(self):
+        poll = self.watcher.poll
+        calls = []
+
+        def failing_poll():
+            calls.append(None)
+            if len(calls) == 1:
+                raise OSError("disk full")
+            self.watcher.stop()
+            return poll()
+
+        self.watcher.interval = 0
+        with mock.patch.object(self.watcher, "poll", failing_poll), redirect_stdout(
+            io.StringIO()
+        ) as output:
+            self.watcher.run()
+
+        self.assertEqual(len(calls), 2)
+        self.assertIn("Checking for updates failed", output.getvalue())
+
+    def test_check_now_and_stop(self):
+        thread = threading.Thread(target=self.watcher.run)
+        thread.start()
+        try:
+            self.server.version_id = 2
+            # The first poll happens straight away, the next only when woken
+            while self.watcher.polls < 1:
+                time.sleep(0.01)
+            self.watcher.check_now()
+            while self.watcher.polls < 2:
+                time.sleep(0.01)
+        finally:
+            self.watcher.stop()
+            thread.join(5)
+
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(
+            sorted(os.listdir(os.path.join(self.directory, "update"))),
+            [".spud_index.json", "Plugin0.jar", "Plugin1.jar", "Plugin2.jar"],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()